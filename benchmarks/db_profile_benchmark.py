@@ -0,0 +1,69 @@
+"""
+Benchmark of the SQLite connection profile (see pycom.interface.connection_pool.DEFAULT_PROFILE).
+
+Runs a set of representative find() / count() queries against pycom.db, once with SQLite's stock settings
+and once with each profile below, and prints the first (cold) and median (warm) time of every query.
+
+The OS page cache has a large influence on the cold timings; for comparable numbers, drop it between runs
+(e.g. `sync; echo 3 > /proc/sys/vm/drop_caches` on Linux) or only compare the warm timings.
+
+Usage:
+    python -m benchmarks.db_profile_benchmark ~/docs/pycom.db [--repeat 5]   (from the repository root)
+"""
+import argparse
+import statistics
+import time
+import warnings
+
+from pycom.interface import PyComLocal
+
+# SQLite's own defaults: no mmap, ~2 MB page cache, temporary data on disk
+_STOCK_PROFILE = {'immutable': False, 'mmap_size': 0, 'cache_size': -2000, 'temp_store': 'DEFAULT'}
+
+_PROFILES = {
+    'stock': _STOCK_PROFILE,
+    'default': {},  # DEFAULT_PROFILE
+    'immutable': {'immutable': True},
+    'immutable+8G mmap': {'immutable': True, 'mmap_size': 8 << 30},
+}
+
+_QUERIES = {
+    'has_pdb page 1': lambda pyc: pyc.find(has_pdb=True, page=1, per_page=10),
+    'has_pdb count': lambda pyc: pyc.count(has_pdb=True),
+    'disease=cancer': lambda pyc: pyc.find(disease='cancer'),
+    'cath=3.40.*.*': lambda pyc: pyc.find(cath='3.40.*.*'),
+    'organism=Homo sapiens, page 100': lambda pyc: pyc.find(organism='Homo sapiens', page=100, per_page=100),
+    'length 100-200, has_ptm': lambda pyc: pyc.find(min_length=100, max_length=200, has_ptm=True),
+    'biological_process=apoptosis': lambda pyc: pyc.find(biological_process='apoptosis'),
+    'uniprot_id': lambda pyc: pyc.find(uniprot_id='P01308'),
+}
+
+
+def _time(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('db_path', help='path to pycom.db')
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs per query (default 5)')
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+
+    print(f'{"profile":<20} {"query":<36} {"cold [ms]":>10} {"warm [ms]":>10}')
+    for profile_name, profile in _PROFILES.items():
+        with PyComLocal(db_path=args.db_path, db_profile=profile, result_cache_size=0) as pyc:
+            for query_name, query in _QUERIES.items():
+                timings = _time(lambda: query(pyc), args.repeat)
+                warm = statistics.median(timings[1:]) if len(timings) > 1 else timings[0]
+                print(f'{profile_name:<20} {query_name:<36} {timings[0] * 1000:>10.2f} {warm * 1000:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Latency benchmark of point lookups: PyComLocal.get() against find(uniprot_id=...).
+
+Looks up the same random sample of UniProt IDs with both, one at a time, and prints the median, 99th percentile
+and mean latency per lookup. The result cache of find() is disabled, so both paths query SQLite every time.
+get_many() is timed for the whole sample as a single call.
+
+Usage:
+    python -m benchmarks.get_benchmark ~/docs/pycom.db [--lookups 2000]   (from the repository root)
+"""
+import argparse
+import random
+import sqlite3
+import statistics
+import time
+
+from pycom.interface import PyComLocal
+
+_LOOKUPS = {
+    'find(uniprot_id=...)': lambda pyc, uniprot_id: pyc.find(uniprot_id=uniprot_id),
+    'get()': lambda pyc, uniprot_id: pyc.get(uniprot_id),
+}
+
+
+def _sample_ids(db_path: str, n: int) -> list:
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        uniprot_ids = [row[0] for row in conn.execute('SELECT entryId FROM entry')]
+    finally:
+        conn.close()
+    return random.Random(0).sample(uniprot_ids, min(n, len(uniprot_ids)))
+
+
+def _percentile(values: list, percentile: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percentile))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('db_path', help='path to pycom.db')
+    parser.add_argument('--lookups', type=int, default=2000, help='number of lookups (default 2000)')
+    args = parser.parse_args()
+
+    uniprot_ids = _sample_ids(args.db_path, args.lookups)
+
+    print(f'{len(uniprot_ids)} lookups')
+    print(f'{"lookup":<24} {"median [us]":>12} {"p99 [us]":>10} {"mean [us]":>10}')
+    with PyComLocal(db_path=args.db_path, result_cache_size=0) as pyc:
+        pyc.get(uniprot_ids[0])  # open the connection
+
+        for name, lookup in _LOOKUPS.items():
+            timings = []
+            for uniprot_id in uniprot_ids:
+                start = time.perf_counter()
+                lookup(pyc, uniprot_id)
+                timings.append((time.perf_counter() - start) * 1e6)
+            print(f'{name:<24} {statistics.median(timings):>12.1f} {_percentile(timings, 0.99):>10.1f} '
+                  f'{statistics.mean(timings):>10.1f}')
+
+        start = time.perf_counter()
+        pyc.get_many(uniprot_ids)
+        elapsed = (time.perf_counter() - start) * 1e6
+        print(f'{"get_many() (per ID)":<24} {"":>12} {"":>10} {elapsed / len(uniprot_ids):>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Throughput benchmark of PyComLocal.load_matrices() with thread and process workers.
+
+Loads the matrices of the same page of entries with every executor and number of workers, and prints the matrices
+and decompressed megabytes per second. The matrix cache is disabled, so every call reads pycom.mat. The workers are
+started by an untimed first call, and are reused by the timed calls. The page cache of the operating system is not
+dropped: run it on a cold cache, or with more rows than fit into memory, to include the disk.
+
+Usage:
+    python -m benchmarks.matrix_loading_benchmark ~/docs/pycom.db ~/docs/pycom.mat [--rows 1000] [--workers 1 2 4 8]
+    (from the repository root)
+"""
+import argparse
+import time
+
+from pycom.interface import PyComLocal
+from pycom.interface._find_helper import MATRIX_EXECUTORS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('db_path', help='path to pycom.db')
+    parser.add_argument('mat_path', help='path to pycom.mat')
+    parser.add_argument('--rows', type=int, default=1000, help='number of entries to load the matrices of')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='numbers of workers to test')
+    parser.add_argument('--repeat', type=int, default=3, help='timed calls per setting (default 3)')
+    args = parser.parse_args()
+
+    with PyComLocal(db_path=args.db_path, mat_path=args.mat_path, matrix_cache_size=0) as pyc:
+        df = pyc.find(has_pdb=True, page=1, per_page=args.rows, columns=['uniprot_id', 'sequence'])
+
+        print(f'{len(df)} rows')
+        print(f'{"executor":<10} {"workers":>8} {"matrices/s":>12} {"MB/s":>10} {"speedup":>8}')
+        for executor in MATRIX_EXECUTORS:
+            baseline = None
+            for workers in args.workers:
+                loaded = pyc.load_matrices(df.copy(), max_load=len(df), workers=workers, executor=executor)
+                megabytes = sum(m.nbytes for m in loaded['matrix'] if m is not None) / 1e6
+
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    pyc.load_matrices(df.copy(), max_load=len(df), workers=workers, executor=executor)
+                elapsed = (time.perf_counter() - start) / args.repeat
+
+                baseline = baseline or elapsed
+                print(f'{executor:<10} {workers:>8} {len(df) / elapsed:>12.1f} {megabytes / elapsed:>10.1f} '
+                      f'{baseline / elapsed:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark of reading the matrices of a page in the order of pycom.mat, against reading them row by row.
+
+Loads the matrices of the same (shuffled) page of entries with DataFrame.apply() of
+CoevolutionMatrixLoader.load_coevolution_matrix(), which reads them in the order of the rows, and with
+CoevolutionMatrixLoader.load_coevolution_matrices(), which reads them in the order of their position in the file.
+The matrix cache is disabled, so every call reads pycom.mat. The page cache of the operating system is not dropped:
+run it on a cold cache (e.g. sync; echo 3 > /proc/sys/vm/drop_caches before every run), or with more rows than fit
+into memory, to include the seeks of the disk.
+
+Usage:
+    python -m benchmarks.matrix_read_order_benchmark ~/docs/pycom.db ~/docs/pycom.mat [--rows 1000] [--repeat 3]
+    (from the repository root)
+"""
+import argparse
+import time
+
+from pycom.interface import PyComLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('db_path', help='path to pycom.db')
+    parser.add_argument('mat_path', help='path to pycom.mat')
+    parser.add_argument('--rows', type=int, default=1000, help='number of entries to load the matrices of')
+    parser.add_argument('--repeat', type=int, default=3, help='timed calls per method (default 3)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the shuffle of the rows')
+    args = parser.parse_args()
+
+    with PyComLocal(db_path=args.db_path, mat_path=args.mat_path, matrix_cache_size=0) as pyc:
+        df = pyc.find(has_pdb=True, page=1, per_page=args.rows, columns=['uniprot_id', 'sequence'])
+        df = df.sample(frac=1, random_state=args.seed)
+        loader = pyc.matrix_loader
+
+        methods = {
+            'apply': lambda: df['sequence'].apply(loader.load_coevolution_matrix),
+            'storage order': lambda: loader.load_coevolution_matrices(df['sequence']),
+        }
+
+        print(f'{len(df)} rows')
+        print(f'{"method":<15} {"matrices/s":>12} {"speedup":>8}')
+        baseline = None
+        for name, method in methods.items():
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                method()
+            elapsed = (time.perf_counter() - start) / args.repeat
+
+            baseline = baseline or elapsed
+            print(f'{name:<15} {len(df) / elapsed:>12.1f} {baseline / elapsed:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
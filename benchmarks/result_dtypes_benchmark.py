@@ -0,0 +1,78 @@
+"""
+Benchmark of the memory used by find() results, with the default and the compact dtypes
+(see pycom.interface._find_helper.rows_to_df).
+
+Builds the result frame of every variant from the same rows, and prints its memory use per million rows
+(DataFrame.memory_usage(deep=True), which includes the contents of string columns) and the time it took to build.
+Without a database, synthetic rows with the value distribution of pycom.db are used.
+
+Usage:
+    python -m benchmarks.result_dtypes_benchmark [--db ~/docs/pycom.db] [--rows 1000000]   (from the repository root)
+"""
+import argparse
+import random
+import sqlite3
+import time
+
+from pycom.interface._find_helper import rows_to_df
+from pycom.sql.query_builder import PyComSQLQueryBuilder
+
+_VARIANTS = {
+    'default': {},
+    'compact': {'compact_dtypes': True},
+    'compact+string': {'compact_dtypes': True, 'string_dtype': True},
+}
+
+_AMINO_ACIDS = 'ACDEFGHIKLMNPQRSTVWY'
+_ORGANISMS = [9606, 10090, 10116, 559292, 83333, 3702, 7227, 6239]
+
+
+def _synthetic_rows(n: int) -> list:
+    """Rows in the column order of PyComSQLQueryBuilder.columns"""
+    rnd = random.Random(0)
+    rows = []
+    for i in range(n):
+        length = rnd.randint(50, 600)
+        rows.append((
+            f'P{i:05d}', rnd.uniform(1, 1000), length, ''.join(rnd.choices(_AMINO_ACIDS, k=length)),
+            rnd.choice(_ORGANISMS), rnd.random(), rnd.random(), rnd.random(),
+            rnd.randint(0, 1), rnd.randint(0, 1), rnd.randint(0, 1),
+        ))
+    return rows
+
+
+def _db_rows(db_path: str, n: int) -> list:
+    columns = ', '.join(PyComSQLQueryBuilder._db_columns)
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        return conn.execute(f'SELECT {columns} FROM entry LIMIT ?', [n]).fetchall()
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='path to pycom.db (default: synthetic rows)')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='number of rows (default 1000000)')
+    args = parser.parse_args()
+
+    rows = _db_rows(args.db, args.rows) if args.db else _synthetic_rows(args.rows)
+    columns = PyComSQLQueryBuilder.columns
+    without_sequence = [c for c in columns if c != 'sequence']
+    per_million = 1_000_000 / max(len(rows), 1)
+
+    print(f'{len(rows)} rows')
+    print(f'{"dtypes":<16} {"MB/M rows":>10} {"w/o sequence":>13} {"build [s]":>10}')
+    for name, options in _VARIANTS.items():
+        start = time.perf_counter()
+        df = rows_to_df(rows, columns, **options)
+        elapsed = time.perf_counter() - start
+
+        total = df.memory_usage(index=True, deep=True).sum()
+        no_sequence = df[without_sequence].memory_usage(index=True, deep=True).sum()
+        print(f'{name:<16} {total * per_million / 1e6:>10.1f} {no_sequence * per_million / 1e6:>13.1f} '
+              f'{elapsed:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,22 @@
-import sqlite3
-from typing import Optional, Callable
+import json
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Callable, Tuple, List, FrozenSet, Iterator, Dict, Iterable
 
 import h5py
+import numpy as np
 import pandas as pd
 
 from warnings import warn
 
+from pycom.interface.connection_pool import PyComConnectionPool
 from pycom.selector import ProteinParams, MatrixFormat
 from pycom.sql.query_builder import PyComSQLQueryBuilder
-from pycom.util.format_util import md5_hash
+from pycom.sql.query_constraints import constraints_template as template
+from pycom.sql.vocabulary import VocabularyResolver
+from pycom.util.format_util import md5_hash, encode_cursor
+from pycom.util.lru_cache import ByteLRUCache
 
 _unconstrained_find_warning = True
 
@@ -29,8 +37,8 @@ def get_valid_find_params(
     Validate that the parameters passed to find() are valid and return a dictionary of the parameters
     """
     if not remote:
-        assert {'page', 'per_page', 'matrix', 'matrix_format'}.isdisjoint(kwargs.keys()), \
-            'page, per_page, matrix and matrix_format are invalid for local queries (only valid for remote queries)'
+        assert {'matrix', 'matrix_format'}.isdisjoint(kwargs.keys()), \
+            'matrix and matrix_format are invalid for local queries (only valid for remote queries)'
 
     # if no arguments are passed, return all proteins
     assert not (constraint_dict is not None and kwargs != {}), 'Use either a dictionary or keywords, not both'
@@ -48,59 +56,540 @@ def get_valid_find_params(
     return constraint_dict
 
 
-def build_query_from_constraints(**constraint_dict):
+def get_canonical_constraints(constraint_dict: dict) -> tuple:
+    """
+    A hashable key of the constraints, identical for constraints that select the same entries
+
+    The param functions of the constraints are applied (e.g. cath='1.*' and cath='1.*.*.*' both become [1],
+    substring constraints are lower-cased), and the constraints are sorted, so the order they are passed in
+    does not matter.
+    """
+    canonical = []
+    for constraint, param in constraint_dict.items():
+        constraint = ProteinParams(constraint)
+        param = template[constraint]['param'](param)
+        canonical.append((constraint.value, tuple(param) if isinstance(param, list) else param))
+    return tuple(sorted(canonical, key=lambda x: (x[0], repr(x[1]))))
+
+
+def get_valid_columns(columns) -> Optional[List[str]]:
+    """
+    Validate the columns passed to find() and return them as a list (None selects all columns)
+
+    Accepts a list of column names, or a comma-separated string (as passed to the API).
+    """
+    if columns is None:
+        return None
+
+    if isinstance(columns, str):
+        columns = [x.strip() for x in columns.split(',') if x.strip()]
+
+    columns = list(columns)
+    assert len(columns) > 0, 'At least one column has to be selected'
+
+    valid_columns = set(PyComSQLQueryBuilder.columns)
+    for column in columns:
+        assert column in valid_columns, f'"{column}" is not a valid column, ' \
+                                        f'valid columns are: {", ".join(PyComSQLQueryBuilder.columns)}'
+
+    return columns
+
+
+def get_page_bounds(page: Optional[int], per_page: Optional[int]) -> Tuple[Optional[int], int]:
+    """
+    Convert page / per_page into a (limit, offset) pair. Returns (None, 0) if neither is set (no pagination).
+
+    First page is 1. If only one of the two is set, page defaults to 1 and per_page to 100.
+    """
+    if page is None and per_page is None:
+        return None, 0
+
+    page = 1 if page is None else page
+    per_page = 100 if per_page is None else per_page
+
+    if 1 > page:
+        raise ValueError(f'Pagination starts at 1, not {page}')
+    if 1 > per_page:
+        raise ValueError(f'per_page must be at least 1, not {per_page}')
+
+    return per_page, (page - 1) * per_page
+
+
+def get_next_cursor(df: pd.DataFrame, limit: int) -> Tuple[pd.DataFrame, Optional[str]]:
+    """
+    Splits a page that was selected with one row more than limit (limit + 1) into the page of limit rows, and the
+    cursor pointing to the page after it, or None if df is the last page
+
+    The extra row tells whether there is a next page, so a result that ends exactly on a page boundary does not
+    return a cursor to an empty page.
+    """
+    if len(df) <= limit:
+        return df, None
+    assert 'uniprot_id' in df, 'uniprot_id has to be selected to continue from a cursor'
+    df = df.iloc[:limit].copy()
+    return df, encode_cursor(df['uniprot_id'].iloc[-1])
+
+
+def build_query_from_constraints(
+        *,
+        columns: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        after: Optional[str] = None,
+        rowids: Optional[Iterable[int]] = None,
+        features: FrozenSet[str] = frozenset(),
+        resolver: Optional[VocabularyResolver] = None,
+        **constraint_dict
+):
     """
     Build a query from a dictionary of constraints
+
+    If columns is set, only those columns are selected, otherwise all columns are.
+    If limit is set, only that many rows are selected, starting at offset.
+    If after is set, only entries with a UniProt ID after it are selected.
+    If rowids is set, only the entries with these rowids are selected (see pycom.sql.bitmap_index).
+    features are the optional side indexes that exist in the database (see pycom.sql.features).
+    If resolver is set, substring constraints are resolved into ID lists first (see pycom.sql.vocabulary).
     """
-    builder = PyComSQLQueryBuilder()
+    builder = PyComSQLQueryBuilder(features=features, resolver=resolver)
     for key, value in constraint_dict.items():
         builder.add_constraint(key, value)
+    if columns is not None:
+        builder.add_columns(columns)
+    if limit is not None:
+        builder.set_limit(limit, offset)
+    if after is not None:
+        builder.set_after(after)
+    if rowids is not None:
+        builder.set_rowids(rowids)
     return builder.build()
 
 
-def query_db(db_path, query, params):
+def build_count_query_from_constraints(
+        *,
+        rowids: Optional[Iterable[int]] = None,
+        features: FrozenSet[str] = frozenset(),
+        resolver: Optional[VocabularyResolver] = None,
+        **constraint_dict
+):
+    """
+    Build a query that counts the entries matching a dictionary of constraints
+    """
+    builder = PyComSQLQueryBuilder(features=features, resolver=resolver)
+    for key, value in constraint_dict.items():
+        builder.add_constraint(key, value)
+    if rowids is not None:
+        builder.set_rowids(rowids)
+    return builder.build_count()
+
+
+def build_rowid_query_from_constraints(
+        *,
+        features: FrozenSet[str] = frozenset(),
+        resolver: Optional[VocabularyResolver] = None,
+        **constraint_dict
+):
+    """
+    Build a query that selects the rowids of the entries matching a dictionary of constraints (for bitmap indexes)
+    """
+    builder = PyComSQLQueryBuilder(features=features, resolver=resolver)
+    for key, value in constraint_dict.items():
+        builder.add_constraint(key, value)
+    return builder.build_rowids()
+
+
+# compact dtypes of the result columns, and the nullable dtypes used instead if a column contains NULL values
+# (text columns are not listed, and stored as Python strings, or as pandas' string dtype with string_dtype=True)
+_COMPACT_DTYPES = {
+    'neff': ('float32', 'float32'),
+    'sequence_length': ('int32', 'Int32'),
+    'organism_id': ('category', 'category'),
+    'helix_frac': ('float32', 'float32'),
+    'turn_frac': ('float32', 'float32'),
+    'strand_frac': ('float32', 'float32'),
+    'has_ptm': ('bool', 'boolean'),
+    'has_pdb': ('bool', 'boolean'),
+    'has_substrate': ('bool', 'boolean'),
+}
+
+
+def rows_to_df(rows: list, columns: List[str], compact_dtypes: bool = False, string_dtype: bool = False) -> pd.DataFrame:
+    """
+    Builds the DataFrame of a query result from its rows
+
+    With compact_dtypes, the frame is built column by column, with the dtypes in _COMPACT_DTYPES (bool, float32,
+    int32, and a categorical organism_id) instead of the default 64-bit and object dtypes. With string_dtype,
+    text columns (uniprot_id, sequence) use pandas' string dtype.
+    """
+    if not compact_dtypes:
+        return pd.DataFrame(rows, columns=columns)
+
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+
+    data = {}
+    for column, column_values in zip(columns, values):
+        dtype, nullable_dtype = _COMPACT_DTYPES.get(column, ('string' if string_dtype else None, None))
+        if nullable_dtype is not None and None in column_values:
+            dtype = nullable_dtype
+        data[column] = pd.Series(column_values, dtype=dtype)
+
+    return pd.DataFrame(data, columns=columns)
+
+
+def query_db(pool: PyComConnectionPool, query, params, compact_dtypes: bool = False, string_dtype: bool = False):
     """
     Takes in a query generated by PyComSQLQueryBuilder and returns a pandas DataFrame
 
+    The query runs on the connection of the current thread, taken from the pool.
+    See rows_to_df() for compact_dtypes and string_dtype.
+
     It is possible to wrap this function in a memoize decorator to cache the results of queries
 
     e.g. when using flask-caching:
         query_db = cache.memoize(timeout=360, cache_none=True)(query_db)
     """
-    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
-    c = conn.cursor()
+    c = pool.connection().cursor()
     c.execute(query, params)
 
+    columns = [PyComSQLQueryBuilder.column_map[d[0]] for d in c.description]
+
     result: list = c.fetchall()
-    result: pd.DataFrame = pd.DataFrame(result, columns=PyComSQLQueryBuilder.columns)
+    result: pd.DataFrame = rows_to_df(result, columns, compact_dtypes=compact_dtypes, string_dtype=string_dtype)
+
+    c.close()
+
+    return result
+
+
+def iter_query_db(
+        pool: PyComConnectionPool,
+        query,
+        params,
+        chunk_size: int,
+        compact_dtypes: bool = False,
+        string_dtype: bool = False
+) -> Iterator[pd.DataFrame]:
+    """
+    Like query_db, but yields the result in DataFrames of at most chunk_size rows
+
+    Rows are fetched from SQLite chunk by chunk (fetchmany), so only one chunk is held in memory at a time.
+    """
+    assert chunk_size >= 1, 'chunk_size must be at least 1'
+
+    c = pool.connection().cursor()
+    try:
+        c.execute(query, params)
+        columns = [PyComSQLQueryBuilder.column_map[d[0]] for d in c.description]
+
+        while True:
+            result: list = c.fetchmany(chunk_size)
+            if not result:
+                return
+            yield rows_to_df(result, columns, compact_dtypes=compact_dtypes, string_dtype=string_dtype)
+    finally:
+        c.close()
 
-    conn.close()
+
+# point lookups by UniProt ID (see get_records()), fixed SQL text so the prepared statements are reused
+_RECORD_COLUMNS = [PyComSQLQueryBuilder.column_map[c] for c in PyComSQLQueryBuilder._db_columns]
+_FLAG_COLUMNS = [c for c in _RECORD_COLUMNS if _COMPACT_DTYPES.get(c, (None,))[0] == 'bool']  # stored as 0 / 1
+_GET_QUERY = f'SELECT {", ".join(PyComSQLQueryBuilder._db_columns)} FROM entry WHERE entry.entryId = ?'
+_GET_MANY_QUERY = f'SELECT {", ".join(PyComSQLQueryBuilder._db_columns)} FROM entry ' \
+                  f'WHERE entry.entryId IN (SELECT value FROM json_each(?))'
+
+
+def get_records(pool: PyComConnectionPool, uniprot_ids: List[str]) -> Dict[str, dict]:
+    """
+    Looks up entries by UniProt ID, without building a query or a DataFrame
+
+    Returns {uniprot_id: {column: value}} for the IDs that exist, with the same column names as find(), and the
+    flags (has_ptm, has_pdb, has_substrate) as bool like find() (None if NULL).
+    """
+    conn = pool.connection()
+    if len(uniprot_ids) == 1:
+        rows = conn.execute(_GET_QUERY, [str(uniprot_ids[0])])
+    else:
+        rows = conn.execute(_GET_MANY_QUERY, [json.dumps([str(x) for x in uniprot_ids])])
+
+    records = {}
+    for row in rows:
+        record = dict(zip(_RECORD_COLUMNS, row))
+        for column in _FLAG_COLUMNS:
+            if record[column] is not None:
+                record[column] = bool(record[column])
+        records[record['uniprot_id']] = record
+    return records
+
+
+def count_db(pool: PyComConnectionPool, query, params) -> int:
+    """
+    Takes in a count query generated by PyComSQLQueryBuilder.build_count() and returns the number of matches
+
+    Like query_db, this function can be wrapped in a memoize decorator.
+    """
+    c = pool.connection().cursor()
+    c.execute(query, params)
+
+    result: int = c.fetchone()[0]
+
+    c.close()
 
     return result
 
 
+# executors of CoevolutionMatrixLoader.load_coevolution_matrices()
+MATRIX_EXECUTORS = ('thread', 'process')
+
+# the HDF5 file of a worker process of CoevolutionMatrixLoader.load_coevolution_matrices(executor='process')
+_worker_mat_db: Optional[h5py.File] = None
+
+
+def _open_worker_matrix_file(matrix_path, rdcc_nbytes: Optional[int], rdcc_nslots: Optional[int]):
+    """Initializer of the worker processes, opens a read-only handle of the HDF5 file per process"""
+    global _worker_mat_db
+    _worker_mat_db = h5py.File(matrix_path, 'r', rdcc_nbytes=rdcc_nbytes, rdcc_nslots=rdcc_nslots)
+
+
+def _storage_offset(dataset: Optional[h5py.Dataset]) -> int:
+    """
+    Position of the data of a dataset in the file (of its first chunk if chunked), -1 if unknown
+
+    The chunk offsets need h5py >= 2.10 built against HDF5 >= 1.10.5, older installs get -1 for chunked datasets,
+    which keep their order (the sort is stable).
+    """
+    if dataset is None:
+        return -1
+    try:
+        if dataset.chunks is not None:
+            offset = dataset.id.get_chunk_info(0).byte_offset if dataset.id.get_num_chunks() > 0 else None
+        else:
+            offset = dataset.id.get_offset()
+    except AttributeError:  # not available in this build of h5py
+        return -1
+    return offset if offset is not None else -1
+
+
+def _read_dataset(item: Tuple[str, Optional[h5py.Dataset]]) -> Optional[np.ndarray]:
+    """Reads a matrix from a (md5, dataset) pair of CoevolutionMatrixLoader._storage_order(), None if not found"""
+    _, dataset = item
+    return dataset[:] if dataset is not None else None
+
+
+def _read_worker_matrix(md5: str) -> Optional[np.ndarray]:
+    """Reads a matrix in a worker process, None if it does not exist"""
+    try:
+        return _worker_mat_db[md5][:]
+    except KeyError:
+        return None
+
+
 class CoevolutionMatrixLoader:
     """
     A class that loads coevolution matrices from an HDF5 file
+
+    The file is opened on first use and kept open until close(), so the HDF5 metadata is only read once for any
+    number of load_matrices() calls. The loader can be shared between threads (h5py serialises all calls to the
+    HDF5 library). After a fork (e.g. in a pre-forking server or a multiprocessing worker), the child process opens
+    the file again instead of using the handle inherited from the parent.
+
+    With a cache, decoded matrices are kept in memory by the md5 hash of their sequence, and popular matrices are
+    only read from the file once. The same cache can be passed to several loaders (e.g. of different PyComLocal
+    instances in a server process), callers always get their own copy of a cached matrix.
+
+    Usage:
+        >>> with CoevolutionMatrixLoader('/path/on/disk/pycom.mat', rdcc_nbytes=4 << 20) as cml:
+        ...     cml.load_coevolution_matrix('MALWMRLLPLL...')
     """
     def __init__(
             self,
             matrix_path,
-            mat_format: MatrixFormat = MatrixFormat.NUMPY
+            mat_format: MatrixFormat = MatrixFormat.NUMPY,
+            rdcc_nbytes: Optional[int] = None,
+            rdcc_nslots: Optional[int] = None,
+            cache: Optional[ByteLRUCache] = None
     ):
+        """
+        :param matrix_path: Path to the coevolution matrix file (pycom.mat)
+        :param mat_format: The default format of the loaded matrices
+        :param rdcc_nbytes: Size of the HDF5 chunk cache of every dataset in bytes (default: h5py's default, 1 MiB)
+        :param rdcc_nslots: Number of hash table slots of the chunk cache, ideally a prime around 100 times the
+                            number of chunks that fit into it (default: h5py's default)
+        :param cache: Cache for the decoded matrices (see matrix_cache()), default not cached
+        """
         self.matrix_path = matrix_path
-        self.mat_db: h5py.File = h5py.File(matrix_path, 'r')
+        self.rdcc_nbytes = rdcc_nbytes
+        self.rdcc_nslots = rdcc_nslots
+        self.cache = cache
         # noinspection PyTypeChecker
         self.mat_formatter: Callable = mat_format
 
-    def load_coevolution_matrix(self, sequence: str) -> Optional[pd.DataFrame]:
+        self._mat_db: Optional[h5py.File] = None
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+        # pools of workers by (executor, workers), kept until close(), as other threads may still be using them
+        self._executors: Dict[Tuple[str, int], Executor] = {}
+        self._executors_pid = os.getpid()
+
+    @property
+    def mat_db(self) -> h5py.File:
+        """The open HDF5 file, opened on first use (and again in a forked process)"""
+        if self._mat_db is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():  # forked, the handle of the parent process must not be used
+                    self._mat_db = None
+                    self._pid = os.getpid()
+                if self._mat_db is None:
+                    self._mat_db = h5py.File(self.matrix_path, 'r', rdcc_nbytes=self.rdcc_nbytes,
+                                             rdcc_nslots=self.rdcc_nslots)
+        return self._mat_db
+
+    def load_coevolution_matrix(
+            self,
+            sequence: str,
+            mat_format: Optional[MatrixFormat] = None
+    ) -> Optional[pd.DataFrame]:
         """
-        Load a coevolution matrix from an HDF5 file
+        Load a coevolution matrix from an HDF5 file, in mat_format (default: the format of the loader)
         """
         md5 = md5_hash(sequence)
+        formatter: Callable = mat_format if mat_format is not None else self.mat_formatter
+
+        if self.cache is None:
+            try:
+                # noinspection PyCallingNonCallable
+                return formatter(self.mat_db[md5][:])
+            except KeyError:
+                return None
+
+        matrix = self.cache.get(md5)
+        if matrix is None:
+            try:
+                matrix = self.mat_db[md5][:]
+            except KeyError:
+                return None
+            matrix.flags.writeable = False  # shared by all callers, each gets a copy
+            self.cache.put(md5, matrix)
+
+        # noinspection PyCallingNonCallable
+        return formatter(matrix.copy())
+
+    def load_coevolution_matrices(
+            self,
+            sequences: Iterable[str],
+            mat_format: Optional[MatrixFormat] = None,
+            workers: int = 1,
+            executor: str = 'thread'
+    ) -> list:
+        """
+        Load the coevolution matrices of several sequences, in the order of the sequences (None if not found)
+
+        The matrices are read in the order of their position in the file, instead of the order of the sequences,
+        which turns the random reads of a large file into (mostly) sequential ones. Matrices in the cache are not
+        read again, and the matrices that are read are added to it.
+
+        With workers > 1, the matrices are read by a pool of workers, which is kept until close(), one pool per
+        executor and number of workers. 'thread' workers share the open file, but h5py only lets one of
+        them into the HDF5 library (which also decompresses the matrices) at a time. 'process' workers open their
+        own read-only handle of the file, and read and decompress in parallel.
+        """
+        assert workers >= 1, 'workers must be at least 1'
+        assert executor in MATRIX_EXECUTORS, f'Invalid executor: {executor}, valid executors are: ' \
+                                             f'{", ".join(MATRIX_EXECUTORS)}'
+
+        formatter: Callable = mat_format if mat_format is not None else self.mat_formatter
+        md5s = [md5_hash(sequence) for sequence in sequences]
+        unique_md5s = list(dict.fromkeys(md5s))
+
+        matrices = {}
+        if self.cache is not None:
+            matrices = {md5: self.cache.get(md5) for md5 in unique_md5s}
+            matrices = {md5: matrix for md5, matrix in matrices.items() if matrix is not None}
 
-        try:
+        datasets = self._storage_order([md5 for md5 in unique_md5s if md5 not in matrices])
+        ordered_md5s = [md5 for md5, _ in datasets]
+
+        if workers == 1:
+            read = map(_read_dataset, datasets)
+        elif executor == 'thread':
+            read = self._get_executor(executor, workers).map(_read_dataset, datasets)
+        else:  # consecutive matrices go to the same worker, so every worker still reads in the order of the file
+            chunk_size = max(1, len(ordered_md5s) // (workers * 4))
+            read = self._get_executor(executor, workers).map(_read_worker_matrix, ordered_md5s, chunksize=chunk_size)
+
+        for md5, matrix in zip(ordered_md5s, read):
+            if matrix is not None:
+                if self.cache is not None:
+                    matrix.flags.writeable = False  # shared by all callers, each gets a copy
+                    self.cache.put(md5, matrix)
+                matrices[md5] = matrix
+
+        result = []
+        returned = set()
+        for md5 in md5s:
+            matrix = matrices.get(md5)
+            if matrix is not None and (not matrix.flags.writeable or md5 in returned):  # cached, or a repeated row
+                matrix = matrix.copy()
+            returned.add(md5)
             # noinspection PyCallingNonCallable
-            return self.mat_formatter(self.mat_db[md5][:])
-        except KeyError:
-            return None
+            result.append(formatter(matrix) if matrix is not None else None)
+        return result
+
+    def _storage_order(self, md5s: List[str]) -> List[Tuple[str, Optional[h5py.Dataset]]]:
+        """The datasets of the matrices (None if not found), ordered by the position of their data in the file"""
+        datasets = []
+        for md5 in md5s:
+            try:
+                dataset = self.mat_db[md5]
+            except KeyError:
+                dataset = None
+            datasets.append((_storage_offset(dataset), md5, dataset))
+
+        datasets.sort(key=lambda x: x[0])
+        return [(md5, dataset) for _, md5, dataset in datasets]
+
+    def _get_executor(self, executor: str, workers: int) -> Executor:
+        """
+        The pool of workers of an executor and number of workers, created on first use
+
+        Pools are not replaced when called with other settings, another thread may still be mapping over them.
+        """
+        with self._lock:
+            if self._executors_pid != os.getpid():  # forked, the pools of the parent process cannot be used
+                self._executors = {}
+                self._executors_pid = os.getpid()
+
+            pool = self._executors.get((executor, workers))
+            if pool is None:
+                if executor == 'thread':
+                    pool = ThreadPoolExecutor(workers)
+                else:
+                    pool = ProcessPoolExecutor(workers, initializer=_open_worker_matrix_file,
+                                               initargs=(self.matrix_path, self.rdcc_nbytes, self.rdcc_nslots))
+                self._executors[(executor, workers)] = pool
+            return pool
+
+    def close(self):
+        """Close the HDF5 file and stop the workers. The loader can still be used afterwards, and will reopen it."""
+        with self._lock:
+            if self._mat_db is not None and self._pid == os.getpid():
+                self._mat_db.close()
+            self._mat_db = None
+            self._pid = os.getpid()
+
+            if self._executors_pid == os.getpid():
+                for pool in self._executors.values():
+                    pool.shutdown()
+            self._executors = {}
+            self._executors_pid = os.getpid()
+
+    def __enter__(self) -> 'CoevolutionMatrixLoader':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def matrix_cache(max_bytes: int) -> ByteLRUCache:
+    """A cache for CoevolutionMatrixLoader, bounded by the size of the decoded matrices in bytes"""
+    return ByteLRUCache(max_bytes, size_function=lambda matrix: matrix.nbytes)
@@ -0,0 +1,153 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, Tuple, Optional, Mapping
+
+from pycom.sql.constraints_utils import to_bool, to_int
+
+# SQLite settings applied to every connection of the pool, can be overridden per PyComLocal (db_profile=...)
+DEFAULT_PROFILE = {
+    'immutable': False,  # open with immutable=1, only safe if pycom.db is never modified while in use
+    'mmap_size': 1 << 30,  # bytes of the database file that are memory-mapped (PRAGMA mmap_size)
+    'cache_size': -65536,  # page cache of each connection, negative values are in KiB (PRAGMA cache_size)
+    'temp_store': 'MEMORY',  # where temporary tables and indices are kept (PRAGMA temp_store)
+}
+
+# environment variables that override the profile, used by the server
+_PROFILE_ENV = {
+    'immutable': 'PYCOM_DB_IMMUTABLE',
+    'mmap_size': 'PYCOM_DB_MMAP_SIZE',
+    'cache_size': 'PYCOM_DB_CACHE_SIZE',
+    'temp_store': 'PYCOM_DB_TEMP_STORE',
+}
+
+_TEMP_STORE_VALUES = {'DEFAULT', 'FILE', 'MEMORY'}
+
+
+def get_valid_profile(profile: Optional[Mapping] = None) -> dict:
+    """
+    Validate a connection profile and return it, merged with DEFAULT_PROFILE
+
+    Example:
+        get_valid_profile({'immutable': True, 'mmap_size': 8 << 30})
+    """
+    profile = {**DEFAULT_PROFILE, **(profile or {})}
+
+    invalid_keys = set(profile) - set(DEFAULT_PROFILE)
+    assert not invalid_keys, f'Invalid connection profile settings: {", ".join(invalid_keys)}, ' \
+                             f'valid settings are: {", ".join(DEFAULT_PROFILE)}'
+
+    profile['immutable'] = bool(profile['immutable'])
+    profile['mmap_size'] = to_int(profile['mmap_size'], entry='mmap_size')
+    profile['cache_size'] = to_int(profile['cache_size'], entry='cache_size')
+    profile['temp_store'] = str(profile['temp_store']).upper()
+
+    assert profile['mmap_size'] >= 0, 'mmap_size cannot be negative'
+    assert profile['temp_store'] in _TEMP_STORE_VALUES, f'temp_store must be one of: {", ".join(_TEMP_STORE_VALUES)}'
+
+    return profile
+
+
+def profile_from_env(environ: Mapping = os.environ) -> dict:
+    """
+    Read a connection profile from the environment (PYCOM_DB_IMMUTABLE, PYCOM_DB_MMAP_SIZE, PYCOM_DB_CACHE_SIZE,
+    PYCOM_DB_TEMP_STORE). Settings that are not set keep their default value.
+    """
+    profile = {}
+    for key, env in _PROFILE_ENV.items():
+        if env in environ:
+            profile[key] = to_bool(environ[env], entry=env) if key == 'immutable' else environ[env]
+    return get_valid_profile(profile)
+
+
+class PyComConnectionPool:
+    """
+    A pool of read-only SQLite connections to the PyCom database, with one connection per thread.
+
+    Connections are opened on first use and kept open, so the SQLite page cache and the prepared statement
+    cache of the sqlite3 module survive between queries. Each thread gets its own connection, which makes the
+    pool safe to share between the threads of a multi-threaded WSGI server. Connections of threads that have
+    exited are closed the next time a connection is opened.
+
+    After a fork (e.g. in a pre-forking server or a multiprocessing worker), the child process opens new
+    connections instead of reusing the ones inherited from the parent.
+
+    Usage:
+        >>> pool = PyComConnectionPool('/path/on/disk/pycom.db')
+        >>> conn = pool.connection()
+        >>> conn.execute('SELECT COUNT(*) FROM entry').fetchone()
+        >>> pool.close()
+    """
+
+    def __init__(self, db_path: str, profile: Optional[Mapping] = None, cached_statements: int = 256):
+        """
+        :param db_path: Path to the PyCom database (pycom.db)
+        :param profile: SQLite settings applied to every connection, merged with DEFAULT_PROFILE
+        :param cached_statements: Number of prepared statements cached per connection
+        """
+        self.db_path = db_path
+        self.profile = get_valid_profile(profile)
+        self.cached_statements = cached_statements
+
+        self._lock = threading.Lock()
+        self._reset()
+
+    def __repr__(self):
+        # stable across instances, so that memoized functions taking a pool produce the same cache key
+        return f'PyComConnectionPool({self.db_path!r})'
+
+    def _reset(self):
+        """Forget all connections, without closing them"""
+        self._local = threading.local()
+        self._connections: Dict[int, Tuple[threading.Thread, sqlite3.Connection]] = {}
+        self._pid = os.getpid()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new read-only connection to the database, and apply the profile to it"""
+        uri = f'file:{self.db_path}?mode=ro'
+        if self.profile['immutable']:  # no locking or change detection, the file is assumed to never change
+            uri += '&immutable=1'
+
+        # check_same_thread is disabled so close() can be called from any thread,
+        # each connection is still only used by the thread that opened it
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=self.cached_statements)
+
+        conn.execute(f'PRAGMA mmap_size = {self.profile["mmap_size"]}')
+        conn.execute(f'PRAGMA cache_size = {self.profile["cache_size"]}')
+        conn.execute(f'PRAGMA temp_store = {self.profile["temp_store"]}')
+
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Returns the connection of the current thread, opening it if necessary"""
+        if self._pid != os.getpid():  # forked, connections of the parent process must not be used
+            with self._lock:
+                self._reset()
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+
+        conn = self._connect()
+        self._local.conn = conn
+
+        with self._lock:
+            self._close_dead_threads()
+            current = threading.current_thread()
+            self._connections[current.ident] = (current, conn)
+
+        return conn
+
+    def _close_dead_threads(self):
+        """Close the connections of threads that have exited (must hold the lock)"""
+        for ident, (thread, conn) in list(self._connections.items()):
+            if not thread.is_alive():
+                conn.close()
+                del self._connections[ident]
+
+    def close(self):
+        """Close all connections of the pool. The pool can still be used afterwards, and will reconnect."""
+        with self._lock:
+            for _, conn in self._connections.values():
+                conn.close()
+            self._reset()
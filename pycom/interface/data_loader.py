@@ -1,6 +1,10 @@
-import sqlite3
+from typing import Optional
+
 import pandas as pd
 
+from pycom.interface.connection_pool import PyComConnectionPool
+from pycom.sql.taxonomy import TaxonomyIndex
+
 
 class PyComDataLoader:
     """
@@ -16,6 +20,10 @@ class PyComDataLoader:
     ----------
     db_path : str
         a string path to the SQLite database
+    pool : PyComConnectionPool
+        the read-only connection pool used for all queries
+    taxonomy : TaxonomyIndex
+        the parsed lineages of all organisms, used by add_organism_taxonomy
 
     Methods
     -------
@@ -53,19 +61,29 @@ class PyComDataLoader:
         Adds post-translational modification data to the DataFrame.
     """
 
-    def __init__(self, db_path: str):
+    def __init__(
+            self,
+            db_path: str,
+            pool: Optional[PyComConnectionPool] = None,
+            taxonomy: Optional[TaxonomyIndex] = None
+    ):
         """
         Parameters
         ----------
         db_path : str
             a string path to the SQLite database
+        pool : PyComConnectionPool, optional
+            the connection pool to run the queries on, a new pool is created if not set
+        taxonomy : TaxonomyIndex, optional
+            the taxonomy index to look up lineages in, a new index is created if not set
         """
         self.db_path = db_path
+        self.pool = pool if pool is not None else PyComConnectionPool(db_path)
+        self.taxonomy = taxonomy if taxonomy is not None else TaxonomyIndex(self.pool.connection)
 
     def _execute_query(self, query: str) -> pd.DataFrame:
         """Helper method to execute a query and return a DataFrame."""
-        with sqlite3.connect(self.db_path) as conn:
-            return pd.read_sql_query(query, conn)
+        return pd.read_sql_query(query, self.pool.connection())
 
     def _add_data(self, df: pd.DataFrame, query: str, force_single_entry: bool) -> pd.DataFrame:
         """Helper method to add data to the DataFrame."""
@@ -116,12 +134,19 @@ class PyComDataLoader:
         return self._add_data(df, query, force_single_entry=True)
 
     def add_organism_taxonomy(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Adds organism taxonomy data to the DataFrame."""
-        query = _build_query(["entry", "organism"], ["entry.entryId", "organism.taxonomy as taxonomy"],
-                             ["entry.organismId = organism.organismId"])
-        taxonomy_df = self._execute_query(query)
-        taxonomy_df['taxonomy'] = taxonomy_df['taxonomy'].apply(_extract_taxonomy)
-        return df.merge(taxonomy_df, left_on='uniprot_id', right_on='entryId', how='left').drop(columns=['entryId'])
+        """Adds organism taxonomy data to the DataFrame.
+
+        The lineages are taken from the taxonomy index, by the organism_id column if the DataFrame has it."""
+        if 'organism_id' in df:
+            organism_ids = df['organism_id']
+        else:
+            query = _build_query(["entry"], ["entryId", "organismId"])
+            organism_df = self._execute_query(query)
+            organism_ids = df[['uniprot_id']].merge(
+                organism_df, left_on='uniprot_id', right_on='entryId', how='left')['organismId']
+
+        taxonomy = [self.taxonomy.lineage(organism_id) for organism_id in organism_ids]
+        return df.assign(taxonomy=pd.Series(taxonomy, index=df.index, dtype='object'))
 
     def add_substrates(self, df: pd.DataFrame, force_single_entry: bool = False) -> pd.DataFrame:
         """Adds substrate data to the DataFrame."""
@@ -186,12 +211,6 @@ class PyComDataLoader:
         return self._add_data(df, query, force_single_entry)
 
 
-def _extract_taxonomy(string):
-    string = string.strip(':')  # Remove the leading and trailing colons, if any
-    taxonomy_list = string.split(':')
-    return taxonomy_list
-
-
 def _build_query(tables: list, columns: list, join_conditions: list = None, filter_condition: str = "") -> str:
     """Builds a SQL query for given tables, columns, join conditions and filter condition."""
     query = f"SELECT {', '.join(columns)} FROM {tables[0]}"
@@ -1,5 +1,5 @@
 from abc import abstractmethod
-from typing import Optional
+from typing import Optional, List, Union, Iterable
 
 import pandas as pd
 
@@ -17,6 +17,7 @@ class PyCom(object):
             db_path: Optional[str] = None,
             mat_path: Optional[str] = None,
             remote: bool = False,
+            **kwargs
     ) -> 'PyCom':
         """
         PyCom is a class that functions as the main interface for querying the PyCom database.
@@ -33,7 +34,7 @@ class PyCom(object):
                 - Matrices are loaded by setting the `matrix` parameter to True
                 - `paginate` and `load_matrices` are not implemented
             Local:
-                - `find` returns all results in a single DataFrame.
+                - `find` returns all results in a single DataFrame, unless `page` / `per_page` are set.
                 - Results can be paginated using `paginate(df, page, per_page)`
                 - Matrices are loaded using `load_matrices(df)`
                 - Local PyCom requires the `db_path` and `mat_path` parameters to be set to the location of the \
@@ -62,12 +63,15 @@ class PyCom(object):
             db_path: Path to the PyCom database (pycom.db)
             mat_path: Path to the coevolution matrix file (pycom.mat)
             remote: Whether to use the remote API. Defaults to False.
+            kwargs: Additional options for local use, passed to PyComLocal (e.g. db_profile)
         """
         if cls is PyCom:
             if remote:
                 assert db_path is None, 'Cannot specify db_path when using remote API, remove param or set remote=False'
                 assert mat_path is None, 'Cannot specify mat_path when using remote API, remove param or set ' \
                                          'remote=False'
+                assert not kwargs, f'Cannot specify {", ".join(kwargs)} when using remote API, remove params or set ' \
+                                   f'remote=False'
 
                 from pycom.interface.interface_remote import PyComRemote
                 return PyComRemote()
@@ -77,7 +81,7 @@ class PyCom(object):
                                             'https://pycom.brunel.ac.uk/downloads/'
 
                 from pycom.interface.interface_local import PyComLocal
-                return PyComLocal(db_path=db_path, mat_path=mat_path)
+                return PyComLocal(db_path=db_path, mat_path=mat_path, **kwargs)
         else:
             return super(PyCom, cls).__new__(cls)
 
@@ -87,8 +91,8 @@ class PyCom(object):
             constraint_dict: Optional[dict] = None,
             /,  # force positional arguments
             *,  # force keyword arguments
-            uniprot_id: Optional[str] = None,
-            sequence: Optional[str] = None,
+            uniprot_id: Optional[Union[str, Iterable[str]]] = None,
+            sequence: Optional[Union[str, Iterable[str]]] = None,
             min_length: Optional[int] = None,
             max_length: Optional[int] = None,
             min_helix: Optional[float] = None,
@@ -119,6 +123,7 @@ class PyCom(object):
 
             page: Optional[int] = None,
             per_page: Optional[int] = None,
+            columns: Optional[List[str]] = None,
             matrix: Optional[bool] = None,
             matrix_format: Optional[MatrixFormat] = None,
     ) -> pd.DataFrame:
@@ -137,10 +142,12 @@ class PyCom(object):
             >>> pyc = pyc.find(disease='cancer')
             or (equivalent):
             >>> pyc = pyc.find({ProteinParams.DISEASE: 'cancer'})
+            look up a list of UniProt IDs at once:
+            >>> pyc = pyc.find(uniprot_id=['P01308', 'P68871', 'P69905'])
 
         :param constraint_dict: A dictionary of constraints to apply to the search {ProteinParams: value}.
-        :param uniprot_id: The UniProt ID of the protein.
-        :param sequence: The amino acid sequence of protein to search for. (full match)
+        :param uniprot_id: The UniProt ID of the protein, or a list of UniProt IDs.
+        :param sequence: The amino acid sequence of protein to search for, or a list of sequences. (full match)
         :param min_length: Minimum number of residues.
         :param max_length: Maximum number of residues.
         :param min_helix: Min percentage of helical structure in the protein.
@@ -176,9 +183,11 @@ class PyCom(object):
         :param ptm: The post-translational modification associated with the protein.
                (name of ptm, case-insensitive, get_ptm_list())
 
-        (specific to PyComRemote)
         :param page: The page number of results to return. (1-i)
-        :param per_page: The number of results per page. (1-100)
+        :param per_page: The number of results per page. (1-100 for PyComRemote)
+        :param columns: Only return these columns, e.g. ['uniprot_id', 'sequence_length']. (default: all columns)
+
+        (specific to PyComRemote)
         :param matrix: Whether to return the coevolution matrix with the results.
         :param matrix_format: The format of the coevolution matrix. (MatrixFormat.NUMPY or MatrixFormat.PANDAS)
 
@@ -187,12 +196,72 @@ class PyCom(object):
         """
         pass
 
+    @abstractmethod
+    def find_many(
+            self,
+            constraint_dicts: List[dict],
+            /,
+            *,
+            per_page: Optional[int] = None,
+            columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Run a batch of find() queries, e.g. one per disease ID, and return all results in a single DataFrame.
+
+        Every query takes the same constraints as PyCom.find(). The results are labelled with the position of their
+        query in constraint_dicts, in the 'query_idx' column.
+
+        Usage:
+            >>> df = pyc.find_many([{'cath': '3.40.50.300'}, {'cath': '3.30.70.330'}], per_page=10)
+
+        :param constraint_dicts: The constraints of each query. [{ProteinParams: value}]
+        :param per_page: Only return the first per_page results of each query. (1-100 for PyComRemote)
+        :param columns: Only return these columns, e.g. ['uniprot_id', 'sequence_length']. (default: all columns)
+        """
+        pass
+
+    @abstractmethod
+    def find_similar(
+            self,
+            sequence: str,
+            top_k: int = 10,
+            min_similarity: float = 0.0,
+            columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Find the proteins in the database with the sequences most similar to a sequence.
+
+        Sequences are compared by the estimated Jaccard similarity of their sets of 3-mers (MinHash), a fast
+        pre-filter for homologs, not an alignment. The results are ordered by the 'similarity' column, most similar
+        first.
+
+        Usage:
+            >>> df = pyc.find_similar('MALWMRLLPLLALLALWGPDPAAAFVNQHLCGSHLVEALYLVCGERGFFYTPKT', top_k=5)
+
+        :param sequence: The amino acid sequence to compare to.
+        :param top_k: The maximum number of proteins to return. (1-100 for PyComRemote)
+        :param min_similarity: Only return proteins with at least this estimated similarity. (0-1)
+        :param columns: Only return these columns, e.g. ['uniprot_id', 'sequence_length']. (default: all columns)
+        """
+        pass
+
+    @abstractmethod
+    def count(self, constraint_dict: Optional[dict] = None, /, **kwargs) -> int:
+        """
+        Count the proteins in the database that match the given criteria.
+
+        Takes the same constraints as PyCom.find(), and returns the number of matches instead of the matches.
+        """
+        pass
+
     @abstractmethod
     def load_matrices(
             self,
             df: pd.DataFrame,
             max_load: int = 1000,
-            mat_format: MatrixFormat = MatrixFormat.NUMPY
+            mat_format: MatrixFormat = MatrixFormat.NUMPY,
+            workers: int = 1,
+            executor: str = 'thread'
     ) -> pd.DataFrame:
         """
         Only for PyComLocal:
@@ -204,6 +273,8 @@ class PyCom(object):
         Requires the coevolution matrix file (pycom.mat) to be downloaded from https://pycom.brunel.ac.uk/downloads/
 
         By default, this function will only load the first 1000 matrices. This can be changed by setting max_load.
+
+        With workers > 1, the matrices are read in parallel, by threads or processes (executor='thread'/'process').
         """
         pass
 
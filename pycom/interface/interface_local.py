@@ -1,14 +1,33 @@
-from typing import Optional
+import os
+from functools import partial
+from typing import Optional, List, Dict, FrozenSet, Iterator, Tuple
 
+import numpy as np
 import pandas as pd
 
 from pycom.interface import PyCom
 
 import pycom.interface._find_helper as fh
+from pycom.interface.connection_pool import PyComConnectionPool
 from pycom.interface.data_loader import PyComDataLoader
-from pycom.selector import MatrixFormat
+from pycom.selector import MatrixFormat, ProteinParams
+from pycom.sql.bitmap_index import BitmapIndex, BITMAP_CONSTRAINTS
+from pycom.sql.class_code import class_counts_query, decode_class
+from pycom.sql.column_store import EntryColumnStore, COLUMN_CONSTRAINTS
+from pycom.sql.constraints_utils import class_param
+from pycom.sql.features import detect_features, CLASS_CODE
+from pycom.sql.query_builder import PyComSQLQueryBuilder
+from pycom.sql.similarity_index import MinHashIndex
+from pycom.sql.taxonomy import TaxonomyIndex
+from pycom.sql.vocabulary import VocabularyResolver
 from pycom.interface.query_helper import query_database
-from pycom.util.format_util import user_path
+from pycom.util.format_util import user_path, decode_cursor
+from pycom.util.lru_cache import ByteLRUCache
+
+_INDEX_MODES = (None, 'bitmap')
+
+# in-memory indexes matching more entries than this fraction are not used by find(), see _apply_indexes()
+_MAX_INDEXED_FRACTION = 0.25
 
 # supress SettingWithCopyWarning from pandas
 pd.options.mode.chained_assignment = None  # default='warn'
@@ -46,12 +65,46 @@ class PyComLocal(PyCom):
     Parameters:
         :param db_path: Path to the PyCom database (pycom.db)
         :param mat_path: Path to the coevolution matrix file (pycom.mat)
+        :param db_profile: SQLite settings for the connections to pycom.db, e.g. {'immutable': True, 'mmap_size': 8 << 30}
+                           (see connection_pool.DEFAULT_PROFILE for the settings and their defaults)
+        :param result_cache_size: Memory budget in bytes for caching the results of find() and count(), 0 disables it
+        :param compact_dtypes: Return find() results with compact dtypes (bool flags, float32 fractions, int32 lengths,
+                               categorical organism_id) instead of 64-bit and object dtypes
+        :param string_dtype: Store uniprot_id and sequence with pandas' string dtype (requires compact_dtypes)
+        :param index: Set to 'bitmap' to evaluate boolean, CATH/EC and keyword constraints with in-memory bitmaps
+                      (see pycom.sql.bitmap_index), which makes filters combining several of them much faster
+        :param columnar: Evaluate the length, structure fraction and organism_id constraints on an in-memory copy of
+                         the numeric entry columns (see pycom.sql.column_store)
+        :param columnar_path: Memory-map the numeric entry columns from this sidecar file (e.g. pycom.columns.npy),
+                              which is created if it does not exist, or is older than pycom.db (requires columnar)
+        :param similarity_path: Store the sequence similarity index of find_similar() in this sidecar file
+                                (e.g. pycom.minhash.npz), which is created if it does not exist, or is older than
+                                pycom.db. Without it, the index is built in memory on the first find_similar() call
+        :param mat_rdcc_nbytes: Size of the HDF5 chunk cache per matrix in bytes, for reading pycom.mat
+                                (see h5py.File, default h5py's default)
+        :param mat_rdcc_nslots: Number of slots of the HDF5 chunk cache (see h5py.File, default h5py's default)
+        :param matrix_cache_size: Memory budget in bytes for caching decoded matrices of load_matrices() and get(),
+                                  0 disables it
+        :param matrix_cache: Use this matrix cache instead, e.g. to share one between several instances
+                             (see pycom.interface._find_helper.matrix_cache(), overrides matrix_cache_size)
     """
 
     def __init__(
             self,
             db_path: str,
-            mat_path: Optional[str] = None
+            mat_path: Optional[str] = None,
+            db_profile: Optional[dict] = None,
+            result_cache_size: int = 128 << 20,
+            compact_dtypes: bool = True,
+            string_dtype: bool = False,
+            index: Optional[str] = None,
+            columnar: bool = False,
+            columnar_path: Optional[str] = None,
+            similarity_path: Optional[str] = None,
+            mat_rdcc_nbytes: Optional[int] = None,
+            mat_rdcc_nslots: Optional[int] = None,
+            matrix_cache_size: int = 256 << 20,
+            matrix_cache: Optional[ByteLRUCache] = None,
     ):
         self.db_path = user_path(db_path)
         assert self.db_path is not None, 'db_path has to be set. `pycom.db` can be downloaded from ' \
@@ -59,11 +112,155 @@ class PyComLocal(PyCom):
 
         self.mat_path = user_path(mat_path)
 
+        # decoded matrices by the md5 hash of their sequence
+        self.matrix_cache = matrix_cache if matrix_cache is not None else fh.matrix_cache(matrix_cache_size)
+
+        # pycom.mat, opened on the first load_matrices() call and kept open until close()
+        self.matrix_loader = fh.CoevolutionMatrixLoader(self.mat_path, rdcc_nbytes=mat_rdcc_nbytes,
+                                                        rdcc_nslots=mat_rdcc_nslots,
+                                                        cache=self.matrix_cache) if self.mat_path else None
+
+        # read-only connections to pycom.db, shared by all queries of this instance
+        self.pool = PyComConnectionPool(self.db_path, profile=db_profile)
+        self._features: Optional[FrozenSet[str]] = None
+
+        # lineages of all organisms, resolves the organism constraint and backs PyComDataLoader.add_organism_taxonomy
+        self.taxonomy = TaxonomyIndex(self.pool.connection)
+
+        # resolves substring constraints (disease, cofactor, keywords, organism) into IDs before the main query
+        self.resolver = VocabularyResolver(self.pool.connection, lookups={'taxonomy': self.taxonomy.resolve})
+
+        # results of find() and count(), keyed on the canonical constraints, invalidated when pycom.db changes
+        self.result_cache = ByteLRUCache(result_cache_size)
+        self._db_mtime = None
+
+        # dtypes of the find() results, see _find_helper.rows_to_df()
+        self.compact_dtypes = compact_dtypes
+        self.string_dtype = string_dtype
+
+        assert index in _INDEX_MODES, f'Invalid index mode: {index}, valid modes are: None, ' \
+                                      f'{", ".join(mode for mode in _INDEX_MODES if mode is not None)}'
+        self.bitmap_index = BitmapIndex(self.pool.connection) if index == 'bitmap' else None
+
+        assert columnar or columnar_path is None, 'columnar_path requires columnar=True'
+        self.column_store = EntryColumnStore(self.pool.connection, path=user_path(columnar_path),
+                                             db_path=self.db_path) if columnar else None
+
+        # MinHash signatures of all sequences, used by find_similar()
+        self.similarity_index = MinHashIndex(self.pool.connection, path=user_path(similarity_path),
+                                             db_path=self.db_path)
+
+    @property
+    def features(self) -> FrozenSet[str]:
+        """The optional side indexes that exist in pycom.db, and are used by find() (see PyComLocal.optimize())"""
+        if self._features is None:
+            self._features = detect_features(self.pool.connection())
+        return self._features
+
+    def _check_db_changed(self):
+        """Drop everything that was cached about pycom.db if the file has been modified since"""
+        mtime = os.stat(self.db_path).st_mtime_ns
+        if mtime != self._db_mtime:
+            self.result_cache.clear()
+            self.resolver.clear()
+            self.taxonomy.clear()
+            if self.bitmap_index is not None:
+                self.bitmap_index.clear()
+            if self.column_store is not None:
+                self.column_store.clear()
+            self.similarity_index.clear()
+            self._features = None
+            self._db_mtime = mtime
+
+    def _apply_indexes(self, constraints: dict, count: bool = False) -> Tuple[dict, Optional[np.ndarray]]:
+        """
+        Evaluates the constraints supported by the enabled in-memory indexes: the bitmap index (BITMAP_CONSTRAINTS)
+        and the column store (COLUMN_CONSTRAINTS)
+
+        Returns the remaining constraints, and the rowids of the entries matching the evaluated constraints
+        (None if no constraint was evaluated). The indexes are not used if they match more than _MAX_INDEXED_FRACTION
+        of all entries, as selecting that many entries by rowid is slower than a scan, unless only counting and
+        they evaluated all constraints (the count is then the number of rowids, no query is needed).
+        """
+        remaining = dict(constraints)
+        masks = []
+        rowids = None
+
+        if self.bitmap_index is not None:
+            bitmap_rowids = self.bitmap_index.rowids  # one snapshot, clear() may replace them meanwhile
+            bitmaps = []
+            for constraint, param in constraints.items():
+                if ProteinParams(constraint) in BITMAP_CONSTRAINTS:
+                    key = fh.get_canonical_constraints({constraint: param})
+                    bitmaps.append(self.bitmap_index.bitmap(key, partial(
+                        fh.build_rowid_query_from_constraints, features=self.features, resolver=self.resolver,
+                        **{constraint: param}), rowids=bitmap_rowids))
+                    del remaining[constraint]
+            if bitmaps:
+                masks.append(self.bitmap_index.to_mask(self.bitmap_index.intersect(bitmaps), bitmap_rowids))
+                rowids = bitmap_rowids
+
+        if self.column_store is not None:
+            columns = {c: p for c, p in constraints.items() if ProteinParams(c) in COLUMN_CONSTRAINTS}
+            if columns:
+                column_data, column_rowids = self.column_store.snapshot()  # the mask refers to these rowids
+                masks.append(self.column_store.mask(columns, column_data))
+                for constraint in columns:
+                    del remaining[constraint]
+
+                if rowids is not None and not np.array_equal(rowids, column_rowids):
+                    return constraints, None  # loaded before and after pycom.db changed, the masks do not align
+                rowids = column_rowids
+
+        if not masks:
+            return constraints, None
+
+        assert all(len(mask) == len(rowids) for mask in masks), 'The in-memory indexes are out of date'
+        mask = masks[0] if len(masks) == 1 else np.logical_and.reduce(masks)
+
+        if (not count or remaining) and mask.sum() > _MAX_INDEXED_FRACTION * len(mask):
+            return constraints, None
+        return remaining, rowids[mask]
+
+    def cache_stats(self) -> dict:
+        """Statistics of the result cache of find() and count() (hits, misses, evictions, entries, bytes)"""
+        return self.result_cache.stats()
+
+    def matrix_cache_stats(self) -> dict:
+        """Statistics of the matrix cache of load_matrices() and get() (hits, misses, evictions, entries, bytes)"""
+        return self.matrix_cache.stats()
+
+    def close(self):
+        """Close all open database connections and pycom.mat. Can still be used afterwards, they are reopened."""
+        self.pool.close()
+        if self.matrix_loader is not None:
+            self.matrix_loader.close()
+        self.resolver.clear()
+        self.taxonomy.clear()
+        self.result_cache.clear()
+        if self.bitmap_index is not None:
+            self.bitmap_index.clear()
+        if self.column_store is not None:
+            self.column_store.clear()
+        self.similarity_index.clear()
+        self._features = None
+        self._db_mtime = None
+
+    def __enter__(self) -> 'PyComLocal':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
     def find(
             self,
             constraint_dict: dict = None,
             /,
             *_,
+            page: Optional[int] = None,
+            per_page: Optional[int] = None,
+            cursor: Optional[str] = None,
+            columns: Optional[List[str]] = None,
             **kwargs
     ) -> pd.DataFrame:
         """
@@ -82,7 +279,15 @@ class PyComLocal(PyCom):
             >>> # or
             >>> pyc = pyc.find({ProteinParams.DISEASE: 'cancer'})
 
+        Pagination is done by the database, so only the requested page is loaded into memory:
+            >>> page = pyc.find(has_pdb=True, page=1, per_page=10)
+            >>> total = pyc.count(has_pdb=True)
+
         :param constraint_dict: A dictionary of constraints to apply to the search {ProteinParams: value}.
+        :param page: The page number of results to return. (1-i, optional)
+        :param per_page: The number of results per page. (optional, defaults to 100 if page is set)
+        :param cursor: Return the page after this cursor, instead of using page. (see fh.get_next_cursor())
+        :param columns: Only select these columns, e.g. ['uniprot_id', 'sequence_length']. (optional, default all)
 
         See pycom.PyCom.find() for a list of valid parameters.
 
@@ -90,20 +295,282 @@ class PyComLocal(PyCom):
         """
         # validate the parameters
         constraints = fh.get_valid_find_params(remote=False, constraint_dict=constraint_dict, **kwargs)
+        columns = fh.get_valid_columns(columns)
 
-        # build the query
-        query, params = fh.build_query_from_constraints(**constraints)
+        after = None
+        if cursor is not None:  # keyset pagination, continues after the last entry of the previous page
+            assert page is None, 'Use either page or cursor, not both'
+            after = decode_cursor(cursor)
+            page = 1
+
+        limit, offset = fh.get_page_bounds(page, per_page)
+
+        query_result = self._find(constraints, columns=columns, limit=limit, offset=offset, after=after)
+        if 'sequence' in query_result:  # matrices can only be loaded if the sequence is known
+            query_result['matrix'] = pd.Series([None] * len(query_result), dtype='object')
+
+        return query_result
+
+    def iter_find(
+            self,
+            constraint_dict: dict = None,
+            /,
+            *_,
+            chunk_size: int = 10000,
+            columns: Optional[List[str]] = None,
+            **kwargs
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Iterate over the proteins that match the given criteria, in DataFrames of at most chunk_size rows.
+
+        Takes the same constraints as find(). Rows are streamed from the database, so only a single chunk is
+        held in memory at a time, which allows processing the whole database in constant memory.
+        Results are not cached.
+
+        Usage:
+            >>> for chunk in pyc.iter_find(has_pdb=True, chunk_size=5000, columns=['uniprot_id', 'sequence']):
+            ...     chunk.to_csv('export.csv', mode='a', header=False)
+
+        :param constraint_dict: A dictionary of constraints to apply to the search {ProteinParams: value}.
+        :param chunk_size: The maximum number of rows per DataFrame.
+        :param columns: Only select these columns, e.g. ['uniprot_id', 'sequence_length']. (optional, default all)
+
+        :return: An iterator over DataFrames containing the proteins that match the given criteria.
+        """
+        constraints = fh.get_valid_find_params(remote=False, constraint_dict=constraint_dict, **kwargs)
+        columns = fh.get_valid_columns(columns)
+        assert chunk_size >= 1, 'chunk_size must be at least 1'
+
+        self._check_db_changed()
+        constraints, rowids = self._apply_indexes(constraints)
+
+        query, params = fh.build_query_from_constraints(columns=columns, rowids=rowids, features=self.features,
+                                                        resolver=self.resolver, **constraints)
+
+        # not a generator itself, so invalid constraints raise here instead of on the first chunk
+        return _with_matrix_column(fh.iter_query_db(pool=self.pool, query=query, params=params, chunk_size=chunk_size,
+                                                    compact_dtypes=self.compact_dtypes, string_dtype=self.string_dtype))
+
+    def find_many(
+            self,
+            constraint_dicts: List[dict],
+            /,
+            *,
+            per_page: Optional[int] = None,
+            columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Run a batch of find() queries, and return all results in a single DataFrame.
+
+        The results of every query are labelled with the position of its constraints in constraint_dicts,
+        in the 'query_idx' column. All constraints are validated before any query runs. The queries share the
+        connection, the compiled SQL of queries with the same shape (e.g. one query per disease ID),
+        and the result cache.
+
+        Usage:
+            >>> df = pyc.find_many([{'disease_id': 'DI-00001'}, {'disease_id': 'DI-00002'}], columns=['uniprot_id'])
+            >>> df.groupby('query_idx').size()
+
+        :param constraint_dicts: The constraints of each query, as passed to find(). [{ProteinParams: value}]
+        :param per_page: Only return the first per_page results of each query. (optional, default all)
+        :param columns: Only select these columns, e.g. ['uniprot_id', 'sequence_length']. (optional, default all)
+
+        :return: A pandas DataFrame containing the results of all queries, with a 'query_idx' column.
+        """
+        batch = [fh.get_valid_find_params(remote=False, constraint_dict=constraints)
+                 for constraints in constraint_dicts]
+        columns = fh.get_valid_columns(columns)
+        limit, offset = fh.get_page_bounds(1 if per_page is not None else None, per_page)
+
+        results = []
+        for query_idx, constraints in enumerate(batch):
+            query_result = self._find(constraints, columns=columns, limit=limit, offset=offset)
+            query_result.insert(0, 'query_idx', query_idx)
+            results.append(query_result)
+
+        if not results:
+            return pd.DataFrame(columns=['query_idx'])
+
+        query_result = pd.concat(results, ignore_index=True)
+        if self.compact_dtypes and 'organism_id' in query_result:  # concat drops categories that differ between frames
+            query_result['organism_id'] = query_result['organism_id'].astype('category')
+        if 'sequence' in query_result:  # matrices can only be loaded if the sequence is known
+            query_result['matrix'] = pd.Series([None] * len(query_result), dtype='object')
+
+        return query_result
+
+    def find_similar(
+            self,
+            sequence: str,
+            top_k: int = 10,
+            min_similarity: float = 0.0,
+            columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Find the proteins in the database with the sequences most similar to a sequence, e.g. to find proteins
+        with coevolution data for a homolog of a new sequence.
+
+        Sequences are compared by the Jaccard similarity of their sets of 3-mers, estimated from MinHash signatures
+        (see pycom.sql.similarity_index). This is a fast pre-filter for candidates, not an alignment: the similarity
+        is not the sequence identity, and distant homologs with few shared 3-mers are not found.
+
+        Usage:
+            >>> pyc.find_similar('MALWMRLLPLLALLALWGPDPAAAFVNQHLCGSHLVEALYLVCGERGFFYTPKT', top_k=5)
+
+        :param sequence: The amino acid sequence to compare to
+        :param top_k: The maximum number of proteins to return
+        :param min_similarity: Only return proteins with at least this estimated similarity (0-1)
+        :param columns: Only select these columns, e.g. ['sequence_length']. (optional, default all, uniprot_id is
+                        always selected)
+
+        :return: A pandas DataFrame of the proteins, most similar first, with the similarity in the 'similarity'
+                 column.
+        """
+        assert isinstance(sequence, str), 'sequence must be a string'
+        assert top_k >= 1, 'top_k must be at least 1'
+        assert 0 <= min_similarity <= 1, 'min_similarity must be between 0 and 1'
+        columns = fh.get_valid_columns(columns)
+        if columns is not None:
+            columns = ['uniprot_id'] + [c for c in columns if c != 'uniprot_id']
+
+        self._check_db_changed()
+        similar = dict(self.similarity_index.query(sequence, top_k=top_k, min_similarity=min_similarity))
+
+        if similar:
+            query_result = self._find({ProteinParams.ID: list(similar)}, columns=columns)
+        else:
+            query_result = fh.rows_to_df([], columns or PyComSQLQueryBuilder.columns,
+                                         compact_dtypes=self.compact_dtypes, string_dtype=self.string_dtype)
+
+        query_result['similarity'] = query_result['uniprot_id'].map(similar).astype('float64')
+        query_result = query_result.sort_values(['similarity', 'uniprot_id'], ascending=[False, True],
+                                                ignore_index=True)
+        if 'sequence' in query_result:  # matrices can only be loaded if the sequence is known
+            query_result['matrix'] = pd.Series([None] * len(query_result), dtype='object')
+
+        return query_result
+
+    def _find(
+            self,
+            constraints: dict,
+            columns: Optional[List[str]] = None,
+            limit: Optional[int] = None,
+            offset: int = 0,
+            after: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Runs a validated find() query, or takes its result from the result cache. Cached results are copied."""
+        self._check_db_changed()
+        cache_key = ('find', fh.get_canonical_constraints(constraints), tuple(columns or ()), limit, offset, after)
+        query_result: Optional[pd.DataFrame] = self.result_cache.get(cache_key)
 
-        query_result: pd.DataFrame = fh.query_db(db_path=self.db_path, query=query, params=params)
-        query_result['matrix'] = pd.Series([None] * len(query_result), dtype='object')
+        if query_result is not None:
+            return query_result.copy()  # the cached result must not be modified by the caller
 
+        constraints, rowids = self._apply_indexes(constraints)
+
+        # build the query
+        query, params = fh.build_query_from_constraints(columns=columns, limit=limit, offset=offset, after=after,
+                                                        rowids=rowids, features=self.features,
+                                                        resolver=self.resolver, **constraints)
+
+        query_result = fh.query_db(pool=self.pool, query=query, params=params,
+                                   compact_dtypes=self.compact_dtypes, string_dtype=self.string_dtype)
+        if self.result_cache.put(cache_key, query_result):
+            return query_result.copy()  # the cached result must not be modified by the caller
         return query_result
 
+    def count(
+            self,
+            constraint_dict: dict = None,
+            /,
+            *_,
+            **kwargs
+    ) -> int:
+        """
+        Count the proteins in the database that match the given criteria, without loading them.
+
+        Takes the same constraints as PyCom.find().
+
+        Usage:
+            >>> pyc.count(disease='cancer')
+
+        :return: The number of proteins that match the given criteria.
+        """
+        constraints = fh.get_valid_find_params(remote=False, constraint_dict=constraint_dict, **kwargs)
+
+        self._check_db_changed()
+        cache_key = ('count', fh.get_canonical_constraints(constraints))
+        result_count = self.result_cache.get(cache_key)
+
+        if result_count is None:
+            constraints, rowids = self._apply_indexes(constraints, count=True)
+
+            if rowids is not None and not constraints:  # all constraints were evaluated by the in-memory indexes
+                result_count = len(rowids)
+            else:
+                query, params = fh.build_count_query_from_constraints(rowids=rowids, features=self.features,
+                                                                      resolver=self.resolver, **constraints)
+                result_count = fh.count_db(pool=self.pool, query=query, params=params)
+            self.result_cache.put(cache_key, result_count)
+
+        return result_count
+
+    def get(
+            self,
+            uniprot_id: str,
+            matrix: bool = False,
+            mat_format: MatrixFormat = MatrixFormat.NUMPY
+    ) -> Optional[dict]:
+        """
+        Look up a single protein by UniProt ID.
+
+        A fast path for point lookups: skips the constraint validation, the query builder and the DataFrame of find(),
+        and runs a prepared statement on the pooled connection instead.
+
+        Usage:
+            >>> pyc.get('P01308')
+            {'uniprot_id': 'P01308', 'neff': ..., 'sequence_length': 110, 'sequence': 'MALWMRLLPLL...', ...}
+
+        :param uniprot_id: The UniProt ID of the protein.
+        :param matrix: Whether to load the coevolution matrix into the 'matrix' field (requires mat_path).
+        :param mat_format: The format of the coevolution matrix.
+        :return: The protein as a dict {column: value}, with the columns of find(), or None if it does not exist.
+        """
+        return self.get_many([uniprot_id], matrix=matrix, mat_format=mat_format)[0]
+
+    def get_many(
+            self,
+            uniprot_ids: List[str],
+            matrix: bool = False,
+            mat_format: MatrixFormat = MatrixFormat.NUMPY
+    ) -> List[Optional[dict]]:
+        """
+        Look up a list of proteins by UniProt ID, with a single query. See get().
+
+        :return: The proteins as dicts, in the order of uniprot_ids, with None for IDs that do not exist.
+        """
+        if not uniprot_ids:
+            return []
+
+        self._check_db_changed()
+        records = fh.get_records(self.pool, uniprot_ids)
+        result = [records.get(str(uniprot_id)) for uniprot_id in uniprot_ids]
+
+        if matrix:
+            assert self.mat_path is not None, 'mat_path has to be set. `pycom.mat` can be downloaded from ' \
+                                              'https://pycom.brunel.ac.uk/downloads/'
+            for record in records.values():
+                record['matrix'] = self.matrix_loader.load_coevolution_matrix(record['sequence'], mat_format)
+
+        return result
+
     def load_matrices(
             self,
             df: pd.DataFrame,
             max_load: int = 1000,
-            mat_format: MatrixFormat = MatrixFormat.NUMPY
+            mat_format: MatrixFormat = MatrixFormat.NUMPY,
+            workers: int = 1,
+            executor: str = 'thread'
     ) -> pd.DataFrame:
         """
         Load the coevolution matrices into memory
@@ -114,16 +581,32 @@ class PyComLocal(PyCom):
         Requires the coevolution matrix file (pycom.mat) to be downloaded from https://pycom.brunel.ac.uk/downloads/
 
         By default, this function will only load the first 1000 matrices. This can be changed by setting max_load.
+
+        The matrices are read in the order of their position in pycom.mat (not the order of the rows), which keeps the
+        reads of a large page mostly sequential, and are put back into the rows they belong to.
+
+        With workers > 1, the matrices are read in parallel. executor='process' reads and decompresses them in
+        separate processes, each with its own handle of pycom.mat, and is the one that scales with the number of
+        workers. executor='thread' shares the handle of this instance, but h5py lets only one thread into the
+        HDF5 library at a time. The workers are kept for later calls with the same settings, until close().
+
+        :param df: The DataFrame to load the matrices of, requires the sequence column
+        :param max_load: The maximum number of matrices to load
+        :param mat_format: The format of the loaded matrices
+        :param workers: The number of workers reading the matrices
+        :param executor: The kind of workers, 'thread' or 'process'
         """
         assert self.mat_path is not None, 'mat_path has to be set. `pycom.mat` can be downloaded from ' \
                                           'https://pycom.brunel.ac.uk/downloads/'
 
+        assert 'sequence' in df, 'The sequence column is required to load matrices, select it in find(columns=...)'
+
         assert len(df) <= max_load, f'Attempting to load {len(df)} matrices, max_load is {max_load}. ' \
                                     f'Consider using PyCom.paginate(), or increasing max_load parameter'
 
-        cml = fh.CoevolutionMatrixLoader(self.mat_path, mat_format=mat_format)
-
-        df['matrix'] = df['sequence'].apply(lambda x: cml.load_coevolution_matrix(x))
+        matrices = self.matrix_loader.load_coevolution_matrices(df['sequence'], mat_format, workers=workers,
+                                                                executor=executor)
+        df['matrix'] = pd.Series(matrices, index=df.index, dtype='object')
 
         return df
 
@@ -140,10 +623,74 @@ class PyComLocal(PyCom):
         :param page: The page number to return
         :param per_page: The number of results to return per page
         """
+        limit, offset = fh.get_page_bounds(page, per_page)
+        return df.iloc[offset:offset + limit]
+
+    def optimize(
+            self,
+            output_path: Optional[str] = None,
+            fts: bool = True,
+            class_codes: bool = True,
+            sequence_md5: bool = True
+    ) -> Dict[ProteinParams, List[str]]:
+        """
+        Builds the indexes used by find() constraints, runs ANALYZE and checks the query plans.
+
+        With fts=True, trigram full-text indexes are built for the substring constraints (organism, disease,
+        cofactor and keywords), which find() then uses automatically. With class_codes=True, the CATH / Enzyme
+        classes are stored as prefix codes, so cath / enzyme constraints at any wildcard depth, and class_counts(),
+        are a single range scan. With sequence_md5=True, the sequences are indexed by their md5 hash, so sequence
+        constraints are a lookup per sequence.
+
+        Modifies pycom.db in place (requires write access), unless output_path is set, in which case the optimized
+        database is written there and can then be used with PyCom(db_path=output_path).
+        Only needs to be run once per database file. Can also be run as `python -m pycom.sql.optimize`.
+
+        :param output_path: Path to write the optimized database to (optional, default in place)
+        :param fts: Whether to build the trigram full-text indexes
+        :param class_codes: Whether to build the CATH / Enzyme prefix code tables
+        :param sequence_md5: Whether to build the sequence hash table
+        :return: The constraints whose query plan still contains a full table scan {constraint: [scans]}
+        """
+        from pycom.sql.optimize import optimize_database
 
-        if 1 > page:
-            raise ValueError(f'Pagination starts at 1, not {page}')
-        return df.iloc[(page - 1) * per_page:page * per_page]
+        full_scans = optimize_database(self.db_path, output_path, fts=fts, class_codes=class_codes,
+                                       sequence_md5=sequence_md5)
+        self.close()  # reconnect, so the new statistics and indexes are picked up
+        return full_scans
+
+    def class_counts(self, cath: Optional[str] = None, enzyme: Optional[str] = None) -> pd.DataFrame:
+        """
+        Counts the entries in every CATH or Enzyme class one level below a class, for browsing the hierarchy.
+
+        Exactly one of cath and enzyme has to be set, in the format of the cath / enzyme constraints of find().
+        '*' lists the top level classes, '3.40.*.*' the classes 3.40.1.*, 3.40.5.*, ..., a full class (3.40.50.300)
+        only counts itself. The listed classes can be passed to find() as they are. Entries with multiple domains
+        in a class are counted once.
+
+        Example:
+            >>> pycom.class_counts(cath='3.40.*.*')
+                   class  count
+            0   3.40.1.*     12
+            1   3.40.5.*    103
+
+        :param cath: The CATH class to list the subclasses of
+        :param enzyme: The Enzyme class (EC number) to list the subclasses of
+        :return: A DataFrame with the columns class and count, ordered by class
+        """
+        assert (cath is None) != (enzyme is None), 'Exactly one of cath and enzyme has to be set'
+        entry_type, prefix = ('cath', cath) if cath is not None else ('enzyme', enzyme)
+        levels = class_param(prefix)
+
+        self._check_db_changed()
+        query, params = class_counts_query(levels, entry_type, class_code=CLASS_CODE in self.features)
+        rows = self.pool.connection().execute(query, params).fetchall()
+
+        depth = min(len(levels) + 1, 4)
+        classes = [(decode_class(code), count) for code, count in rows]
+        classes = [('.'.join(map(str, class_levels)) + ('.*' if depth < 4 else ''), count)
+                   for class_levels, count in classes if len(class_levels) == depth]  # skip unknown levels
+        return pd.DataFrame(classes, columns=['class', 'count'])
 
     def get_data_loader(self) -> PyComDataLoader:
         """
@@ -151,50 +698,58 @@ class PyComLocal(PyCom):
 
         :return: PyComDataLoader
         """
-        return PyComDataLoader(self.db_path)
+        return PyComDataLoader(self.db_path, pool=self.pool, taxonomy=self.taxonomy)
 
     def get_disease_list(self) -> pd.DataFrame:
         """Retrieves the list of all diseases in the database."""
         query = "SELECT diseaseId, diseaseName FROM disease"
-        return query_database(query, self.db_path)
+        return query_database(query, self.pool)
 
     def get_cofactor_list(self) -> pd.DataFrame:
         """Retrieves the list of all cofactors in the database."""
         query = "SELECT cofactorId, cofactorName FROM cofactor"
-        return query_database(query, self.db_path)
+        return query_database(query, self.pool)
 
     def get_organism_list(self) -> pd.DataFrame:
         """Retrieves the list of all organisms in the database."""
         query = "SELECT organismId, nameScientific, nameCommon, taxonomy FROM organism"
-        return query_database(query, self.db_path)
+        return query_database(query, self.pool)
 
     def get_biological_process_list(self) -> pd.DataFrame:
         query = "SELECT keywordName as name FROM keyword WHERE keywordCategory = 'Biological process'"
-        return query_database(query, self.db_path)
+        return query_database(query, self.pool)
 
     def get_cellular_component_list(self) -> pd.DataFrame:
         query = "SELECT keywordName as name FROM keyword WHERE keywordCategory = 'Cellular component'"
-        return query_database(query, self.db_path)
+        return query_database(query, self.pool)
 
     def get_developmental_stage_list(self) -> pd.DataFrame:
         query = "SELECT keywordName as name FROM keyword WHERE keywordCategory = 'Developmental stage'"
-        return query_database(query, self.db_path)
+        return query_database(query, self.pool)
 
     def get_domain_list(self) -> pd.DataFrame:
         query = "SELECT keywordName as name FROM keyword WHERE keywordCategory = 'Domain'"
-        return query_database(query, self.db_path)
+        return query_database(query, self.pool)
 
     def get_ligand_list(self) -> pd.DataFrame:
         query = "SELECT keywordName as name FROM keyword WHERE keywordCategory = 'Ligand'"
-        return query_database(query, self.db_path)
+        return query_database(query, self.pool)
 
     def get_molecular_function_list(self) -> pd.DataFrame:
         query = "SELECT keywordName as name FROM keyword WHERE keywordCategory = 'Molecular function'"
-        return query_database(query, self.db_path)
+        return query_database(query, self.pool)
 
     def get_ptm_list(self) -> pd.DataFrame:
         query = "SELECT keywordName as name FROM keyword WHERE keywordCategory = 'PTM'"
-        return query_database(query, self.db_path)
+        return query_database(query, self.pool)
+
+
+def _with_matrix_column(chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """Adds the empty matrix column to every chunk of iter_find() that has the sequence column"""
+    for chunk in chunks:
+        if 'sequence' in chunk:  # matrices can only be loaded if the sequence is known
+            chunk['matrix'] = pd.Series([None] * len(chunk), dtype='object')
+        yield chunk
 
 
 if __name__ == '__main__':
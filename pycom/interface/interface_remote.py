@@ -5,7 +5,7 @@ import pandas as pd
 from pycom.interface import PyCom
 from pycom.interface.data_loader import PyComDataLoader
 from pycom.selector import MatrixFormat
-from typing import Dict
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 import pycom.interface._find_helper as fh
 
@@ -38,12 +38,17 @@ class PyComRemote(PyCom):
         """
         return f'{self.base_url}/{endpoint}'
 
-    def _make_request(self, endpoint: str, params: Dict = None) -> Dict:
+    def _make_request(self, endpoint: str, params: Dict = None, post: bool = False) -> Dict:
         """
         Helper method that sends a GET request to the provided endpoint with optional parameters
         and returns the JSON response.
+
+        With post=True, the parameters are sent as a JSON body instead (e.g. for lists of UniProt IDs).
         """
-        response = requests.get(self._get_url(endpoint), params=params)
+        if post:
+            response = requests.post(self._get_url(endpoint), json=params)
+        else:
+            response = requests.get(self._get_url(endpoint), params=params)
         try:
             response.raise_for_status()
         except requests.exceptions.HTTPError as e:
@@ -61,6 +66,8 @@ class PyComRemote(PyCom):
             *,
             page: int = None,
             per_page: int = 10,
+            cursor: str = None,
+            columns: List[str] = None,
             matrix: bool = False,
             mat_format: MatrixFormat = MatrixFormat.NUMPY,
             **kwargs
@@ -72,6 +79,8 @@ class PyComRemote(PyCom):
             constraint_dict (dict): A dictionary of constraints for the protein data.
             page (int): The page number to request. Defaults to 1.
             per_page (int): The number of results per page. Defaults to 10.
+            cursor (str): Request the page after this cursor instead of a page number (see iter_find()).
+            columns (list): Only return these columns, e.g. ['uniprot_id', 'sequence_length']. Defaults to all.
             matrix (bool): Whether to include the matrices in the results. Defaults to False.
             mat_format (MatrixFormat): The format of the matrices. Defaults to MatrixFormat.NUMPY.
 
@@ -79,30 +88,167 @@ class PyComRemote(PyCom):
             pandas.DataFrame: DataFrame containing the protein data.
 
         """
-        assert page is not None, 'page must be specified for remote queries (pycom.find(..., page=1))'
+        assert page is not None or cursor is not None, \
+            'page must be specified for remote queries (pycom.find(..., page=1))'
+
+        response = self._find_request(constraint_dict, page=page, per_page=per_page, cursor=cursor, columns=columns,
+                                      matrix=matrix, **kwargs)
+
+        return _find_response_to_df(response, matrix=matrix, mat_format=mat_format)
+
+    def iter_find(
+            self,
+            constraint_dict: dict = None,
+            /,
+            *,
+            per_page: int = 100,
+            columns: List[str] = None,
+            matrix: bool = False,
+            mat_format: MatrixFormat = MatrixFormat.NUMPY,
+            **kwargs
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Iterates over all pages of results from the 'find' endpoint, yielding one DataFrame per page.
+
+        Pages are requested by following the cursor returned by the API, so every page is as fast as the first one.
+
+        Example Usage:
+
+            for page in pyc.iter_find(disease='cancer', per_page=100):
+                ...
+
+        Parameters:
+            constraint_dict (dict): A dictionary of constraints for the protein data.
+            per_page (int): The number of results per page. Defaults to 100.
+            columns (list): Only return these columns, e.g. ['uniprot_id', 'sequence_length']. Defaults to all.
+            matrix (bool): Whether to include the matrices in the results. Defaults to False.
+            mat_format (MatrixFormat): The format of the matrices. Defaults to MatrixFormat.NUMPY.
+
+        Returns:
+            Iterator[pandas.DataFrame]: DataFrames containing the protein data, one per page.
+        """
+        response = self._find_request(constraint_dict, page=1, per_page=per_page, columns=columns, matrix=matrix,
+                                      **kwargs)
+
+        while True:
+            res = _find_response_to_df(response, matrix=matrix, mat_format=mat_format)
+            if not res.empty:
+                yield res
+
+            cursor = response.get('next_cursor')
+            if cursor is None:
+                return
+
+            response = self._find_request(constraint_dict, per_page=per_page, cursor=cursor, columns=columns,
+                                          matrix=matrix, **kwargs)
+
+    def _find_request(
+            self,
+            constraint_dict: dict = None,
+            /,
+            *,
+            page: int = None,
+            per_page: int = 10,
+            cursor: str = None,
+            columns: List[str] = None,
+            matrix: bool = False,
+            **kwargs
+    ) -> Dict:
+        """
+        Helper method that validates the parameters and sends a request to the 'find' endpoint.
+        """
         assert per_page <= 100, 'per_page must be <= 100 for remote queries (pycom.find(..., per_page=100))'
         if matrix:
             assert per_page <= 10, \
                 'per_page must be <= 10 for remote queries with matrices (pycom.find(..., per_page=10, matrix=True))'
 
         params = fh.get_valid_find_params(remote=True, constraint_dict=constraint_dict, **kwargs)
-        params.update({'page': page, 'per_page': per_page, 'matrix': matrix})
+        params.update({'per_page': per_page, 'matrix': matrix})
+        if columns is not None:
+            params['columns'] = ','.join(fh.get_valid_columns(columns))
+        if cursor is not None:
+            params['cursor'] = cursor
+        else:
+            params['page'] = page
 
-        response = self._make_request('find', params)
+        return self._make_request('find', *_list_params_as_json(params))
 
-        if 'results' not in response:
-            return pd.DataFrame()  # Return empty DataFrame if there are no results.
+    def find_many(  # noqa: Different defaults of named parameters
+            self,
+            constraint_dicts: List[dict],
+            /,
+            *,
+            per_page: int = 10,
+            columns: List[str] = None,
+    ) -> pd.DataFrame:
+        """
+        Runs a batch of queries with a single request to the 'find/batch' endpoint.
 
-        res = pd.DataFrame(response['results'])
+        Parameters:
+            constraint_dicts (list): The constraints of each query, as passed to find().
+            per_page (int): The number of results returned per query. Defaults to 10.
+            columns (list): Only return these columns, e.g. ['uniprot_id', 'sequence_length']. Defaults to all.
 
-        if res.empty:
-            return res
+        Returns:
+            pandas.DataFrame: DataFrame containing the results of all queries, with a 'query_idx' column.
+        """
+        assert per_page <= 100, 'per_page must be <= 100 for remote queries (pycom.find_many(..., per_page=100))'
 
-        if matrix:
-            res['matrix'] = res['matrix'].apply(np.array)  # MatrixFormat assumes numpy array
-            res['matrix'] = res['matrix'].apply(mat_format)  # Convert to desired format
+        queries = [_list_params_as_json(fh.get_valid_find_params(remote=True, constraint_dict=constraints))[0]
+                   for constraints in constraint_dicts]
+        params = {'queries': queries, 'per_page': per_page}
+        if columns is not None:
+            params['columns'] = fh.get_valid_columns(columns)
 
-        return res
+        response = self._make_request('find/batch', params, post=True)
+
+        return _return_non_empty_df(response.get('results', []))
+
+    def find_similar(
+            self,
+            sequence: str,
+            top_k: int = 10,
+            min_similarity: float = 0.0,
+            columns: List[str] = None,
+    ) -> pd.DataFrame:
+        """
+        Fetches the proteins with the sequences most similar to a sequence from the 'find-similar' endpoint.
+
+        Parameters:
+            sequence (str): The amino acid sequence to compare to.
+            top_k (int): The maximum number of proteins to return. Defaults to 10.
+            min_similarity (float): Only return proteins with at least this estimated similarity. Defaults to 0.
+            columns (list): Only return these columns, e.g. ['uniprot_id', 'sequence_length']. Defaults to all.
+
+        Returns:
+            pandas.DataFrame: DataFrame containing the protein data, with a 'similarity' column.
+        """
+        assert top_k <= 100, 'top_k must be <= 100 for remote queries (pycom.find_similar(..., top_k=100))'
+
+        params = {'sequence': sequence, 'top_k': top_k, 'min_similarity': min_similarity}
+        if columns is not None:
+            params['columns'] = fh.get_valid_columns(columns)
+
+        response = self._make_request('find-similar', params, post=True)  # sequences can be too long for a URL
+
+        return _return_non_empty_df(response.get('results', []))
+
+    def count(self, constraint_dict: dict = None, /, **kwargs) -> int:
+        """
+        Fetches the number of proteins matching the constraints from the 'find' endpoint.
+
+        Parameters:
+            constraint_dict (dict): A dictionary of constraints for the protein data.
+
+        Returns:
+            int: The number of matching proteins.
+        """
+        params = fh.get_valid_find_params(remote=True, constraint_dict=constraint_dict, **kwargs)
+        params.update({'page': 1, 'per_page': 1, 'matrix': False})
+
+        response = self._make_request('find', *_list_params_as_json(params))
+
+        return response.get('result_count', 0)
 
     def get_disease_list(self) -> pd.DataFrame:
         """Fetches disease data from the 'get-disease-list' endpoint as a pandas DataFrame."""
@@ -167,6 +313,34 @@ class PyComRemote(PyCom):
         raise NotImplementedError('Loading additional data is not supported for the remote API, use local instead.')
 
 
+def _list_params_as_json(params: Dict) -> Tuple[Dict, bool]:
+    """
+    Lists of values (e.g. uniprot_id=[...]) cannot be sent as query parameters, if there are any,
+    the request is sent as a JSON body instead. Returns the parameters and whether to POST them.
+    """
+    lists = {k: list(v) for k, v in params.items() if not isinstance(v, str) and isinstance(v, Iterable)}
+    if not lists:
+        return params, False
+    return {**params, **lists}, True
+
+
+def _find_response_to_df(response: Dict, matrix: bool, mat_format: MatrixFormat) -> pd.DataFrame:
+    """Helper function that converts a response from the 'find' endpoint into a DataFrame."""
+    if 'results' not in response:
+        return pd.DataFrame()  # Return empty DataFrame if there are no results.
+
+    res = pd.DataFrame(response['results'])
+
+    if res.empty:
+        return res
+
+    if matrix:
+        res['matrix'] = res['matrix'].apply(np.array)  # MatrixFormat assumes numpy array
+        res['matrix'] = res['matrix'].apply(mat_format)  # Convert to desired format
+
+    return res
+
+
 def _return_non_empty_df(response) -> pd.DataFrame:
     """Helper function that returns an empty DataFrame if the response is empty."""
     if len(response) == 0:
@@ -1,9 +1,7 @@
 import pandas as pd
-import sqlite3
 
+from pycom.interface.connection_pool import PyComConnectionPool
 
-def query_database(query, db_path):
-    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
+
+def query_database(query, pool: PyComConnectionPool):
+    return pd.read_sql_query(query, pool.connection())
@@ -0,0 +1,131 @@
+import sqlite3
+import threading
+from functools import reduce
+from typing import Callable, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from pycom.selector import ProteinParams
+from pycom.util.lru_cache import ByteLRUCache
+
+# constraints that select stable sets of entries, evaluated with bitmaps in bitmap mode (PyComLocal(index='bitmap'))
+BITMAP_CONSTRAINTS = frozenset({
+    ProteinParams.HAS_PTM,
+    ProteinParams.HAS_PDB,
+    ProteinParams.HAS_SUBSTRATE,
+    ProteinParams.HAS_DISEASE,
+    ProteinParams.CATH,
+    ProteinParams.ENZYME,
+    ProteinParams.BIOLOGICAL_PROCESS,
+    ProteinParams.CELLULAR_COMPONENT,
+    ProteinParams.DEVELOPMENTAL_STAGE,
+    ProteinParams.DOMAIN,
+    ProteinParams.LIGAND,
+    ProteinParams.MOLECULAR_FUNCTION,
+    ProteinParams.PTM,
+})
+
+
+class BitmapIndex:
+    """An in-memory index of packed bitsets, one bit per entry, for the constraints in BITMAP_CONSTRAINTS
+
+    Every entry gets a dense ordinal, its position among the rowids of the entry table. The bitmap of a
+    constraint value (e.g. has_pdb=True, or cath=[3, 40]) has the bits of the entries it matches set. Bitmaps
+    are built on first use, with a single query selecting the rowids of the matching entries, and then cached
+    (least recently used bitmaps are evicted once max_bytes is exceeded).
+
+    A conjunction of constraints is a bitwise AND of their bitmaps, and the remaining bits are mapped back to
+    rowids, which the main query selects directly (see PyComSQLQueryBuilder.set_rowids()).
+
+    Usage:
+        >>> index = BitmapIndex(pool.connection)
+        >>> bitmap = index.intersect([index.bitmap(key, build_query) for key, build_query in lookups])
+        >>> index.count(bitmap), index.to_rowids(bitmap)
+    """
+
+    def __init__(self, connection: Callable[[], sqlite3.Connection], max_bytes: int = 256 << 20):
+        """
+        :param connection: Returns the connection to build the bitmaps on (e.g. PyComConnectionPool.connection)
+        :param max_bytes: Maximum size of all cached bitmaps in bytes
+        """
+        self.connection = connection
+        self._bitmaps = ByteLRUCache(max_bytes, size_function=lambda bitmap: bitmap.nbytes)
+
+        self._rowids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @property
+    def rowids(self) -> np.ndarray:
+        """
+        The sorted rowids of all entries, the position of a rowid is the ordinal of its entry
+
+        Callers that use the rowids several times must keep the returned array and pass it on (rowids=...),
+        clear() may replace it in between.
+        """
+        rowids = self._rowids
+        if rowids is None:
+            with self._lock:
+                if self._rowids is None:
+                    rows = self.connection().execute('SELECT rowid FROM entry ORDER BY rowid')
+                    self._rowids = np.fromiter((row[0] for row in rows), dtype=np.int64)
+                rowids = self._rowids
+        return rowids
+
+    def bitmap(
+            self,
+            key: Hashable,
+            build_query: Callable[[], Tuple[str, list]],
+            rowids: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Returns the bitmap of a constraint value, building it if it is not cached
+
+        :param key: Identifies the constraint value (e.g. its canonical form, see get_canonical_constraints())
+        :param build_query: Returns the query selecting the rowids of the entries matching the constraint value
+                            (see PyComSQLQueryBuilder.build_rowids()) and its parameters, only called if not cached
+        :param rowids: The rowids to build the bitmap over (optional, default the current rowids)
+        """
+        bitmap = self._bitmaps.get(key)
+        if bitmap is None:
+            if rowids is None:
+                rowids = self.rowids
+            rows = self.connection().execute(*build_query())
+            matched = np.fromiter((row[0] for row in rows), dtype=np.int64)
+
+            bits = np.zeros(len(rowids), dtype=bool)
+            bits[np.searchsorted(rowids, matched)] = True
+
+            bitmap = np.packbits(bits)
+            self._bitmaps.put(key, bitmap)
+        return bitmap
+
+    @staticmethod
+    def intersect(bitmaps: List[np.ndarray]) -> np.ndarray:
+        """The entries matched by all bitmaps (bitwise AND)"""
+        return reduce(np.bitwise_and, bitmaps)
+
+    def count(self, bitmap: np.ndarray, rowids: Optional[np.ndarray] = None) -> int:
+        """The number of entries matched by a bitmap"""
+        return int(self.to_mask(bitmap, rowids).sum())
+
+    def to_mask(self, bitmap: np.ndarray, rowids: Optional[np.ndarray] = None) -> np.ndarray:
+        """Unpacks a bitmap into a boolean mask, with one value per entry (of rowids, default the current rowids)"""
+        if rowids is None:
+            rowids = self.rowids
+        return np.unpackbits(bitmap, count=len(rowids)).astype(bool)
+
+    def to_rowids(self, bitmap: np.ndarray, rowids: Optional[np.ndarray] = None) -> np.ndarray:
+        """The rowids of the entries matched by a bitmap"""
+        if rowids is None:
+            rowids = self.rowids
+        return rowids[self.to_mask(bitmap, rowids)]
+
+    def stats(self) -> dict:
+        """Statistics of the bitmap cache (see ByteLRUCache.stats())"""
+        return self._bitmaps.stats()
+
+    def clear(self):
+        """Forget all bitmaps and rowids, e.g. after the database has changed"""
+        with self._lock:
+            self._rowids = None
+        self._bitmaps.clear()
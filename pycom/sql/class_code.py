@@ -0,0 +1,127 @@
+"""Prefix codes of the CATH and Enzyme (EC) classes, for wildcard class queries and per-class counts.
+
+The four levels of a class (e.g. 3.40.50.300) are packed into a single integer, 16 bits per level, with the first
+level in the highest bits. Every level is stored as its value + 1, so an unknown (NULL) level is 0. All classes
+below a prefix (e.g. 3.40.*.*) then have codes in a single contiguous range, and a query at any wildcard depth is
+one range scan over the (code, entryId) primary key of the sidecar tables, instead of an index lookup on exactly
+the given level columns.
+"""
+import sqlite3
+from typing import List, Tuple
+
+_LEVELS = 4
+_LEVEL_BITS = 16
+
+# the largest value of every level that can be encoded, the first level keeps the code a positive 64-bit integer
+_MAX_LEVEL = [(1 << (_LEVEL_BITS - 1)) - 2] + [(1 << _LEVEL_BITS) - 2] * (_LEVELS - 1)
+
+# name of the sidecar table per class table
+_CODE_TABLES = {
+    'cath': 'pycom_cath_code',
+    'enzyme': 'pycom_enzyme_code',
+}
+
+
+def _shift(level: int) -> int:
+    """Position of a level (1-4) in the code"""
+    return _LEVEL_BITS * (_LEVELS - level)
+
+
+def class_range(levels: List[int]) -> Tuple[int, int]:
+    """The range of the codes (inclusive) of all classes below a prefix, e.g. [3, 40] for 3.40.*.*"""
+    assert len(levels) <= _LEVELS, f'A class has at most {_LEVELS} levels'
+    assert all(0 <= level <= max_level for level, max_level in zip(levels, _MAX_LEVEL)), 'Class level out of range'
+
+    low = sum((level + 1) << _shift(i) for i, level in enumerate(levels, start=1))
+    return low, min(low + (1 << _shift(len(levels))) - 1, (1 << 63) - 1)  # all codes, for an empty prefix
+
+
+def decode_class(code: int) -> List[int]:
+    """The levels of a code, up to the first unknown level"""
+    levels = []
+    for i in range(1, _LEVELS + 1):
+        level = (code >> _shift(i)) & ((1 << _LEVEL_BITS) - 1)
+        if level == 0:
+            break
+        levels.append(level - 1)
+    return levels
+
+
+def create_class_code_indexes(conn: sqlite3.Connection):
+    """(Re)build the prefix code tables from the current contents of cath_class and enzyme_class"""
+    for entry_type, table in _CODE_TABLES.items():
+        columns = [f'{entry_type}_{i}' for i in range(1, _LEVELS + 1)]
+
+        out_of_range = ' OR '.join(f'{column} NOT BETWEEN 0 AND {max_level}'
+                                   for column, max_level in zip(columns, _MAX_LEVEL))
+        invalid = conn.execute(f'SELECT COUNT(*) FROM {entry_type}_class WHERE {out_of_range}').fetchone()[0]
+        assert invalid == 0, f'{invalid} rows of {entry_type}_class cannot be encoded in {_LEVEL_BITS} bits per level'
+
+        code = ' + '.join(f'(coalesce({column} + 1, 0) << {_shift(i)})' for i, column in enumerate(columns, start=1))
+
+        conn.execute(f'DROP TABLE IF EXISTS {table}')
+        conn.execute(f'CREATE TABLE {table} (code INTEGER, entryId TEXT, PRIMARY KEY (code, entryId)) WITHOUT ROWID')
+        conn.execute(f'INSERT OR IGNORE INTO {table} (code, entryId) SELECT {code}, entryId FROM {entry_type}_class')
+    conn.commit()
+
+
+def class_code_constraint(arg, entry_type):
+    """Variant of class_constraint that selects the range of the prefix code (features.CLASS_CODE)
+
+    Takes the same parameters as class_constraint (one per given level), the range is computed in SQL so the query
+    text only depends on the number of levels. Levels that cannot be encoded match nothing, as in class_constraint.
+    """
+    assert entry_type in _CODE_TABLES, 'Entry type must be either cath or enzyme'
+    assert type(arg) == list, 'Param should be pre-processed by _class_param'
+
+    if len(arg) == 0:
+        return '0=0'
+
+    table = _CODE_TABLES[entry_type]
+    levels = range(1, len(arg) + 1)
+
+    given = ', '.join(f'? AS level_{i}' for i in levels)
+    in_range = ' AND '.join(f'level_{i} BETWEEN 0 AND {_MAX_LEVEL[i - 1]}' for i in levels)
+    low = ' + '.join(f'((level_{i} + 1) << {_shift(i)})' for i in levels)
+
+    return f'''entry.entryId IN (
+        SELECT  {table}.entryId
+        FROM    (SELECT {low} AS low FROM (SELECT {given}) WHERE {in_range}) AS prefix
+        JOIN    {table} ON {table}.code BETWEEN prefix.low AND prefix.low + {(1 << _shift(len(arg))) - 1}
+    )'''
+
+
+def class_counts_query(levels: List[int], entry_type: str, class_code: bool) -> Tuple[str, list]:
+    """
+    Query counting the entries in every class one level below a prefix (or in the class itself, for 4 levels)
+
+    Returns rows of (code, number of entries), codes are the prefix codes of the counted classes (see decode_class).
+
+    :param levels: The levels of the prefix, as returned by class_param (e.g. [3, 40] for 3.40.*.*)
+    :param entry_type: 'cath' or 'enzyme'
+    :param class_code: Whether the prefix code tables exist (features.CLASS_CODE), otherwise the class table is read
+    """
+    assert entry_type in _CODE_TABLES, 'Entry type must be either cath or enzyme'
+    depth = min(len(levels) + 1, _LEVELS)
+    low, high = class_range(levels)
+
+    if class_code:
+        query = f'''
+            SELECT  (code >> {_shift(depth)}) << {_shift(depth)} AS class, COUNT(DISTINCT entryId)
+            FROM    {_CODE_TABLES[entry_type]}
+            WHERE   code BETWEEN ? AND ?
+            GROUP BY class
+            ORDER BY class'''
+        return query, [low, high]
+
+    columns = [f'{entry_type}_{i}' for i in range(1, depth + 1)]
+    code = ' + '.join(f'(coalesce({column} + 1, 0) << {_shift(i)})' for i, column in enumerate(columns, start=1))
+    where = ' AND '.join([f'{column} = ?' for column in columns[:len(levels)]] or ['1=1'])
+
+    query = f'''
+        SELECT  {code} AS class, COUNT(DISTINCT entryId)
+        FROM    {entry_type}_class
+        WHERE   {where}
+        GROUP BY class
+        ORDER BY class'''
+    return query, list(levels)
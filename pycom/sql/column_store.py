@@ -0,0 +1,132 @@
+import operator
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from pycom.selector import ProteinParams
+from pycom.sql.query_constraints import constraints_template as template
+
+# numeric entry columns held by the column store, in the order of the rows of the array
+_COLUMNS = ['rowid', 'sequenceLength', 'structHelix', 'structTurn', 'structStrand', 'organismId']
+_COLUMN_INDEX = {column: i for i, column in enumerate(_COLUMNS)}
+
+# constraints evaluated by the column store: (column, comparison), matching their SQL in query_constraints.py
+COLUMN_CONSTRAINTS = {
+    ProteinParams.MIN_LENGTH: ('sequenceLength', operator.ge),
+    ProteinParams.MAX_LENGTH: ('sequenceLength', operator.le),
+    ProteinParams.MIN_HELIX: ('structHelix', operator.ge),
+    ProteinParams.MAX_HELIX: ('structHelix', operator.le),
+    ProteinParams.MIN_TURN: ('structTurn', operator.ge),
+    ProteinParams.MAX_TURN: ('structTurn', operator.le),
+    ProteinParams.MIN_STRAND: ('structStrand', operator.ge),
+    ProteinParams.MAX_STRAND: ('structStrand', operator.le),
+    ProteinParams.ORGANISM_ID: ('organismId', operator.eq),
+}
+
+
+class EntryColumnStore:
+    """The numeric columns of the entry table, held in memory as contiguous numpy arrays
+
+    Range and equality constraints on these columns (COLUMN_CONSTRAINTS) are evaluated as vectorized masks,
+    instead of reading the entry table through SQLite. Entries are ordered by rowid, the same ordinals as
+    the bitmap index (see bitmap_index.py).
+
+    All columns are stored as float64, with NaN for NULL, so comparisons give the same results as in SQLite
+    (comparisons with NULL never match).
+
+    If path is set, the columns are stored in a sidecar file (a .npy array), which is memory-mapped instead of
+    loaded, so the operating system shares its pages between processes. The sidecar is rebuilt if it is older
+    than pycom.db.
+
+    Usage:
+        >>> store = EntryColumnStore(pool.connection, path='/path/on/disk/pycom.columns.npy', db_path='pycom.db')
+        >>> mask = store.mask({ProteinParams.MIN_LENGTH: 100, ProteinParams.ORGANISM_ID: 9606})
+        >>> store.rowids[mask]
+    """
+
+    def __init__(
+            self,
+            connection: Callable[[], sqlite3.Connection],
+            path: Optional[str] = None,
+            db_path: Optional[str] = None
+    ):
+        """
+        :param connection: Returns the connection to load the columns with (e.g. PyComConnectionPool.connection)
+        :param path: Path of the sidecar file to memory-map the columns from (optional, default in memory)
+        :param db_path: Path to pycom.db, the sidecar file is rebuilt if it is older (required if path is set)
+        """
+        assert path is None or db_path is not None, 'db_path is required to check if the sidecar file is up to date'
+
+        self.connection = connection
+        self.path = path
+        self.db_path = db_path
+
+        self._data: Optional[Tuple[np.ndarray, np.ndarray]] = None  # (columns, rowids), replaced as a whole
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The columns and the rowids they belong to, loaded on first use
+
+        Callers that use both must take them from the same snapshot, clear() may unload them in between.
+        """
+        data = self._data
+        if data is None:
+            with self._lock:
+                if self._data is None:
+                    columns = self._load()
+                    self._data = (columns, columns[_COLUMN_INDEX['rowid']].astype(np.int64))
+                data = self._data
+        return data
+
+    @property
+    def columns(self) -> np.ndarray:
+        """The columns as a single array, one row per column (see _COLUMNS), loaded on first use"""
+        return self.snapshot()[0]
+
+    @property
+    def rowids(self) -> np.ndarray:
+        """The sorted rowids of all entries, the position of a rowid is the ordinal of its entry"""
+        return self.snapshot()[1]
+
+    def _read_columns(self) -> np.ndarray:
+        query = f'SELECT {", ".join(_COLUMNS)} FROM entry ORDER BY rowid'
+        rows = self.connection().execute(query).fetchall()
+        return np.array(rows, dtype=np.float64).reshape(-1, len(_COLUMNS)).T.copy()  # NULL -> NaN
+
+    def _load(self) -> np.ndarray:
+        if self.path is None:
+            return self._read_columns()
+
+        if not os.path.exists(self.path) or os.path.getmtime(self.path) < os.path.getmtime(self.db_path):
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:  # a file object, np.save would append .npy to the path
+                np.save(f, self._read_columns())
+            os.replace(tmp_path, self.path)  # other processes never see a partially written file
+
+        return np.load(self.path, mmap_mode='r')
+
+    def mask(self, constraints: Dict[ProteinParams, object], columns: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Evaluates constraints from COLUMN_CONSTRAINTS, returns a boolean mask of the matching entries
+
+        :param columns: The columns of a snapshot() to evaluate them on (optional, default the current columns)
+        """
+        if columns is None:
+            columns = self.columns
+
+        mask = np.ones(columns.shape[1], dtype=bool)
+        for constraint, param in constraints.items():
+            constraint = ProteinParams(constraint)
+            column, compare = COLUMN_CONSTRAINTS[constraint]
+            param = template[constraint]['param'](param)  # validates the param, as in the SQL query
+            mask &= compare(columns[_COLUMN_INDEX[column]], param)
+        return mask
+
+    def clear(self):
+        """Unload the columns, e.g. after the database has changed"""
+        with self._lock:
+            self._data = None
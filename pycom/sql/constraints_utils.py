@@ -1,3 +1,8 @@
+import json
+from collections.abc import Iterable
+
+from pycom.sql.features import FTS5
+
 
 organism_constraint = lambda _: '''
     entry.organismId IN (
@@ -63,6 +68,164 @@ keyword_constraint = lambda _, keyword_category: f'''
         AND keyword_entry.keywordCategory = '{keyword_category}'
     )'''
 
+# variants of the substring constraints that use the trigram indexes (features.FTS5, see fts_index.py)
+
+organism_fts_constraint = lambda _: '''
+    entry.organismId IN (
+        SELECT  pycom_fts_organism.organismId
+        FROM    pycom_fts_organism
+        WHERE   pycom_fts_organism.taxonomyFull LIKE ?
+    )'''
+
+
+disease_fts_constraint = lambda _: '''
+    entry.entryId IN (
+        SELECT  disease_entry.entryId
+        FROM    disease_entry
+        WHERE   disease_entry.diseaseId IN (
+            SELECT  pycom_fts_disease.diseaseId
+            FROM    pycom_fts_disease
+            WHERE   pycom_fts_disease.diseaseName LIKE ?
+        )
+    )'''
+
+
+cofactor_fts_constraint = lambda _: '''
+    entry.entryId IN (
+        SELECT  cofactor_entry.entryId
+        FROM    cofactor_entry
+        WHERE   cofactor_entry.cofactorId IN (
+            SELECT  pycom_fts_cofactor.cofactorId
+            FROM    pycom_fts_cofactor
+            WHERE   pycom_fts_cofactor.cofactorName LIKE ?
+        )
+    )'''
+
+
+keyword_fts_constraint = lambda _, keyword_category: f'''
+    entry.entryId IN (
+        SELECT keyword_entry.entryId
+        FROM keyword_entry
+        WHERE keyword_entry.keywordCategory = '{keyword_category}'
+        AND keyword_entry.keywordName IN (
+            SELECT pycom_fts_keyword.keywordName
+            FROM pycom_fts_keyword
+            WHERE pycom_fts_keyword.keywordName LIKE ?
+            AND pycom_fts_keyword.keywordCategory = '{keyword_category}'
+        )
+    )'''
+
+# two-phase variants of the substring constraints (see vocabulary.py):
+# first the name pattern is resolved against the small vocabulary table (*_resolve), then
+# the main query filters the large link tables with the resulting IDs (*_ids_constraint)
+
+def organism_resolve(features):
+    """Query that resolves an organism name pattern into organism IDs"""
+    if FTS5 in features:
+        return 'SELECT organismId FROM pycom_fts_organism WHERE taxonomyFull LIKE ?'
+    return 'SELECT organismId FROM organism WHERE taxonomyFull LIKE ?'
+
+
+def disease_resolve(features):
+    """Query that resolves a disease name pattern into disease IDs"""
+    if FTS5 in features:
+        return 'SELECT diseaseId FROM pycom_fts_disease WHERE diseaseName LIKE ?'
+    return 'SELECT diseaseId FROM disease WHERE lower(diseaseName) LIKE lower(?)'
+
+
+def cofactor_resolve(features):
+    """Query that resolves a cofactor name pattern into cofactor IDs"""
+    if FTS5 in features:
+        return 'SELECT cofactorId FROM pycom_fts_cofactor WHERE cofactorName LIKE ?'
+    return 'SELECT cofactorId FROM cofactor WHERE lower(cofactorName) LIKE lower(?)'
+
+
+def keyword_resolve(features, keyword_category):
+    """Query that resolves a keyword name pattern into the matching keyword names of a category"""
+    if FTS5 in features:
+        return f"SELECT keywordName FROM pycom_fts_keyword " \
+               f"WHERE keywordName LIKE ? AND keywordCategory = '{keyword_category}'"
+    return f"SELECT keywordName FROM keyword " \
+           f"WHERE keywordCategory = '{keyword_category}' AND lower(keywordName) LIKE lower(?)"
+
+
+def in_list(ids):
+    """Returns the placeholders for an IN list of the given IDs: (?, ?, ?), or a single JSON array parameter"""
+    if isinstance(ids, JsonList):
+        return '(SELECT value FROM json_each(?))'
+    return f'({", ".join("?" * len(ids))})'
+
+
+organism_ids_constraint = lambda ids: f'''
+    entry.organismId IN {in_list(ids)}'''
+
+
+disease_ids_constraint = lambda ids: f'''
+    entry.entryId IN (
+        SELECT  disease_entry.entryId
+        FROM    disease_entry
+        WHERE   disease_entry.diseaseId IN {in_list(ids)}
+    )'''
+
+
+cofactor_ids_constraint = lambda ids: f'''
+    entry.entryId IN (
+        SELECT  cofactor_entry.entryId
+        FROM    cofactor_entry
+        WHERE   cofactor_entry.cofactorId IN {in_list(ids)}
+    )'''
+
+
+keyword_ids_constraint = lambda ids, keyword_category: f'''
+    entry.entryId IN (
+        SELECT keyword_entry.entryId
+        FROM keyword_entry
+        WHERE keyword_entry.keywordCategory = '{keyword_category}'
+        AND keyword_entry.keywordName IN {in_list(ids)}
+    )'''
+
+# lists of more values than this are bound as a single JSON array, instead of one placeholder per value
+_MAX_IN_LIST = 500
+
+
+class JsonList(str):
+    """A list of values encoded as a JSON array, bound to the query as a single parameter (see value_list_param)"""
+
+
+def value_list_param(arg, entry, convert=str):
+    """Converts a single value, or an iterable of values (e.g. a list of UniProt IDs)
+
+    Returns the converted value, a sorted list of the unique converted values, or a JsonList if there
+    are more than _MAX_IN_LIST values."""
+    if isinstance(arg, str) or not isinstance(arg, Iterable):
+        return convert(arg)
+
+    values = sorted({convert(x) for x in arg})
+    assert len(values) > 0, f'{entry} cannot be an empty list'
+
+    if len(values) > _MAX_IN_LIST:
+        return JsonList(json.dumps(values))
+    return values
+
+
+def value_list_constraint(param, column):
+    """Compares a column to a value_list_param: = ?, IN (?, ?, ?), or IN the values of a JSON array"""
+    if isinstance(param, JsonList):  # one parameter, the query stays the same regardless of the number of values
+        return f'{column} IN (SELECT value FROM json_each(?))'
+    if isinstance(param, list):
+        return f'{column} IN {in_list(param)}'
+    return f'{column} = ?'
+
+
+def value_list_shape(param):
+    """The part of a value_list_param that changes the SQL text of value_list_constraint"""
+    if isinstance(param, JsonList):
+        return 'json'
+    if isinstance(param, list):
+        return len(param)
+    return None
+
+
 _CATH_ENZYME_ERROR = 'CATH/Enzyme class must be in format: 1.2.3.4 or 1.2.*.*'
 
 
@@ -0,0 +1,23 @@
+"""Optional side indexes of pycom.db, which the query builder uses when they exist.
+
+They are not part of the downloaded database, and are built by `python -m pycom.sql.optimize`.
+"""
+import sqlite3
+from typing import FrozenSet
+
+FTS5 = 'fts5'  # trigram full-text indexes for substring constraints (fts_index.py)
+CLASS_CODE = 'class_code'  # prefix codes of the CATH / Enzyme classes (class_code.py)
+SEQUENCE_MD5 = 'sequence_md5'  # hashes of the entry sequences (sequence_index.py)
+
+# tables that have to exist for a feature to be used
+_FEATURE_TABLES = {
+    FTS5: {'pycom_fts_organism', 'pycom_fts_disease', 'pycom_fts_cofactor', 'pycom_fts_keyword'},
+    CLASS_CODE: {'pycom_cath_code', 'pycom_enzyme_code'},
+    SEQUENCE_MD5: {'pycom_sequence_md5'},
+}
+
+
+def detect_features(conn: sqlite3.Connection) -> FrozenSet[str]:
+    """Returns the optional features (side indexes) that exist in the database"""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return frozenset(feature for feature, required in _FEATURE_TABLES.items() if required <= tables)
@@ -0,0 +1,29 @@
+"""Trigram full-text indexes (FTS5) for the substring constraints.
+
+ORGANISM, DISEASE, COFACTOR and the keyword based constraints match `lower(x) LIKE lower('%term%')`, which no
+B-tree index can serve. An FTS5 table with the trigram tokenizer answers the same LIKE pattern from its index
+(case-insensitive, like lower() LIKE lower()), as long as the term is at least 3 characters long. Shorter terms
+still return the same results, through a scan of the (small) FTS table.
+
+The indexes only cover the vocabulary (organism lineages, disease / cofactor / keyword names), the matching
+entries are then found through the indexed link tables (see optimize.py).
+"""
+import sqlite3
+
+# name of the FTS table: (indexed text column, unindexed key column, query that fills the table)
+_FTS_TABLES = {
+    'pycom_fts_organism': ('taxonomyFull', 'organismId', 'SELECT taxonomyFull, organismId FROM organism'),
+    'pycom_fts_disease': ('diseaseName', 'diseaseId', 'SELECT diseaseName, diseaseId FROM disease'),
+    'pycom_fts_cofactor': ('cofactorName', 'cofactorId', 'SELECT cofactorName, cofactorId FROM cofactor'),
+    'pycom_fts_keyword': ('keywordName', 'keywordCategory', 'SELECT keywordName, keywordCategory FROM keyword'),
+}
+
+
+def create_fts_indexes(conn: sqlite3.Connection):
+    """(Re)build the trigram indexes from the current contents of the database"""
+    for table, (text_column, key_column, source_query) in _FTS_TABLES.items():
+        conn.execute(f'DROP TABLE IF EXISTS {table}')
+        conn.execute(f"CREATE VIRTUAL TABLE {table} USING fts5({text_column}, {key_column} UNINDEXED, "
+                     f"tokenize='trigram')")
+        conn.execute(f'INSERT INTO {table} ({text_column}, {key_column}) {source_query}')
+    conn.commit()
@@ -0,0 +1,179 @@
+"""Builds the indexes used by the constraints in query_constraints.py, and checks the resulting query plans.
+
+pycom.db only ships with the indexes that were created while generating it. optimize_database() adds a covering
+or composite index for every constraint template, runs ANALYZE so the query planner has statistics to choose between
+them, and then uses EXPLAIN QUERY PLAN to report constraints that still need a full table scan. Scans that read
+a whole index instead of the table (SCAN organism USING COVERING INDEX ..., for a LIKE '%term%' pattern) are
+reported as well, as they still read every row of the table.
+Optionally, it also builds the trigram full-text indexes for the substring constraints (see fts_index.py), the
+prefix codes of the CATH / Enzyme classes (see class_code.py), and the hashes of the sequences (see sequence_index.py).
+
+Usage:
+    python -m pycom.sql.optimize /path/on/disk/pycom.db [/path/on/disk/pycom_optimized.db]
+        [--no-fts] [--no-class-codes] [--no-sequence-md5]
+"""
+import argparse
+import re
+import shutil
+import sqlite3
+from typing import Dict, List, Optional
+
+from pycom.selector import ProteinParams
+from pycom.sql.class_code import create_class_code_indexes
+from pycom.sql.features import detect_features
+from pycom.sql.fts_index import create_fts_indexes
+from pycom.sql.query_builder import PyComSQLQueryBuilder
+from pycom.sql.sequence_index import create_sequence_index
+
+# (table, columns) of every index, and the constraints they serve
+_INDEXES = [
+    ('entry', ['sequenceLength']),  # MIN_LENGTH, MAX_LENGTH
+    ('entry', ['structHelix']),  # MIN_HELIX, MAX_HELIX
+    ('entry', ['structTurn']),  # MIN_TURN, MAX_TURN
+    ('entry', ['structStrand']),  # MIN_STRAND, MAX_STRAND
+    ('entry', ['organismId']),  # ORGANISM_ID, ORGANISM
+    ('entry', ['hasPTM']),  # HAS_PTM
+    ('entry', ['hasPDB']),  # HAS_PDB
+    ('entry', ['hasSubstrate']),  # HAS_SUBSTRATE
+    ('organism', ['taxonomyFull', 'organismId']),  # ORGANISM (covering, LIKE scans the index instead of the table)
+    ('disease', ['diseaseName', 'diseaseId']),  # DISEASE (covering)
+    ('disease_entry', ['diseaseId', 'entryId']),  # DISEASE, DISEASE_ID, HAS_DISEASE (covering)
+    ('cofactor', ['cofactorName', 'cofactorId']),  # COFACTOR (covering)
+    ('cofactor_entry', ['cofactorId', 'entryId']),  # COFACTOR, COFACTOR_ID (covering)
+    ('keyword_entry', ['keywordCategory', 'keywordName', 'entryId']),  # keyword based constraints (covering)
+    ('cath_class', ['cath_1', 'cath_2', 'cath_3', 'cath_4', 'entryId']),  # CATH, any wildcard depth (covering)
+    ('enzyme_class', ['enzyme_1', 'enzyme_2', 'enzyme_3', 'enzyme_4', 'entryId']),  # ENZYME, any depth (covering)
+]
+
+# a representative value for every constraint, used to check the query plans
+_SAMPLE_PARAMS = {
+    ProteinParams.ID: 'P01308',
+    ProteinParams.SEQUENCE: 'MTTDD',
+    ProteinParams.MIN_LENGTH: 100,
+    ProteinParams.MAX_LENGTH: 100,
+    ProteinParams.MIN_HELIX: 0.5,
+    ProteinParams.MAX_HELIX: 0.5,
+    ProteinParams.MIN_TURN: 0.5,
+    ProteinParams.MAX_TURN: 0.5,
+    ProteinParams.MIN_STRAND: 0.5,
+    ProteinParams.MAX_STRAND: 0.5,
+    ProteinParams.ORGANISM_ID: 9606,
+    ProteinParams.ORGANISM: 'Homo sapiens',
+    ProteinParams.CATH: '3.40.*.*',
+    ProteinParams.ENZYME: '3.*',
+    ProteinParams.HAS_SUBSTRATE: True,
+    ProteinParams.HAS_PDB: True,
+    ProteinParams.DISEASE: 'cancer',
+    ProteinParams.DISEASE_ID: 'DI-00001',
+    ProteinParams.HAS_DISEASE: True,
+    ProteinParams.COFACTOR: 'Zn(2+)',
+    ProteinParams.COFACTOR_ID: 'CHEBI:29105',
+    ProteinParams.HAS_PTM: True,
+    ProteinParams.BIOLOGICAL_PROCESS: 'antiviral defense',
+    ProteinParams.CELLULAR_COMPONENT: 'nucleus',
+    ProteinParams.DEVELOPMENTAL_STAGE: 'early protein',
+    ProteinParams.DOMAIN: 'zinc-finger',
+    ProteinParams.LIGAND: 'zinc',
+    ProteinParams.MOLECULAR_FUNCTION: 'antioxidant activity',
+    ProteinParams.PTM: 'phosphoprotein',
+}
+
+assert set(_SAMPLE_PARAMS.keys()) == set(ProteinParams), 'Sample params missing for some ProteinParams'
+
+# a scan of a whole table, or of a whole index (e.g. LIKE '%term%' on a covering index), SQLite < 3.36: SCAN TABLE
+_FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: USING (?:COVERING )?INDEX \w+)?$')
+
+
+def _index_name(table: str, columns: List[str]) -> str:
+    return f'pycom_idx_{table}_{"_".join(columns)}'
+
+
+def create_indexes(conn: sqlite3.Connection):
+    """Create all indexes that do not exist yet, and update the statistics of the query planner"""
+    for table, columns in _INDEXES:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {_index_name(table, columns)} ON {table} ({", ".join(columns)})')
+    conn.execute('ANALYZE')
+    conn.commit()
+
+
+def explain_constraint(conn: sqlite3.Connection, constraint: ProteinParams, param) -> List[str]:
+    """Returns the query plan (EXPLAIN QUERY PLAN) of a query with a single constraint"""
+    builder = PyComSQLQueryBuilder(features=detect_features(conn))
+    builder.add_constraint(constraint, param)
+    query, params = builder.build()
+
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}', params)]
+
+
+def check_query_plans(conn: sqlite3.Connection) -> Dict[ProteinParams, List[str]]:
+    """
+    Checks the query plan of every constraint, and returns the ones that scan a full table
+
+    :return: {constraint: [full scans in its query plan]}, empty if no constraint needs a full scan
+    """
+    full_scans = {}
+    for constraint, param in _SAMPLE_PARAMS.items():
+        scans = [line for line in explain_constraint(conn, constraint, param) if _FULL_SCAN.match(line)]
+        if scans:
+            full_scans[constraint] = scans
+    return full_scans
+
+
+def optimize_database(
+        db_path: str,
+        output_path: Optional[str] = None,
+        fts: bool = True,
+        class_codes: bool = True,
+        sequence_md5: bool = True
+) -> Dict[ProteinParams, List[str]]:
+    """
+    Creates the indexes for all constraints, runs ANALYZE, and checks the query plans
+
+    pycom.db is modified in place, unless output_path is set, in which case it is copied there first.
+
+    :param db_path: Path to the PyCom database (pycom.db)
+    :param output_path: Path to write the optimized database to (optional, default in place)
+    :param fts: Whether to build the trigram full-text indexes for the substring constraints
+    :param class_codes: Whether to build the prefix code tables for the CATH / Enzyme class constraints
+    :param sequence_md5: Whether to build the hash table for the sequence constraint
+    :return: {constraint: [full scans in its query plan]}, see check_query_plans()
+    """
+    if output_path is not None and output_path != db_path:
+        shutil.copyfile(db_path, output_path)
+        db_path = output_path
+
+    conn = sqlite3.connect(db_path)
+    try:
+        if fts:
+            create_fts_indexes(conn)
+        if class_codes:
+            create_class_code_indexes(conn)
+        if sequence_md5:
+            create_sequence_index(conn)
+        create_indexes(conn)
+        return check_query_plans(conn)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('db_path', help='path to pycom.db')
+    parser.add_argument('output_path', nargs='?', default=None,
+                        help='path to write the optimized database to (default: modify db_path in place)')
+    parser.add_argument('--no-fts', action='store_true', help='do not build the trigram full-text indexes')
+    parser.add_argument('--no-class-codes', action='store_true', help='do not build the CATH / Enzyme prefix codes')
+    parser.add_argument('--no-sequence-md5', action='store_true', help='do not build the sequence hash table')
+    args = parser.parse_args()
+
+    full_scans = optimize_database(args.db_path, args.output_path, fts=not args.no_fts,
+                                    class_codes=not args.no_class_codes, sequence_md5=not args.no_sequence_md5)
+
+    if not full_scans:
+        print('No constraint requires a full table scan')
+    for constraint, scans in full_scans.items():
+        print(f'{constraint.value}: {"; ".join(scans)}')
+
+
+if __name__ == '__main__':
+    main()
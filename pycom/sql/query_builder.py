@@ -1,4 +1,12 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import FrozenSet, Optional
+
+from pycom.selector import ProteinParams
+from pycom.sql.constraints_utils import JsonList
 from pycom.sql.query_constraints import constraints_template as template
+from pycom.sql.vocabulary import VocabularyResolver
 
 _BASE_QUERY = '''
 SELECT
@@ -10,6 +18,34 @@ WHERE (
 )
 '''
 
+_COUNT_QUERY = '''
+SELECT
+    COUNT(*)
+FROM
+    entry
+WHERE (
+    {constraints}
+)
+'''
+
+_ROWID_QUERY = '''
+SELECT
+    entry.rowid
+FROM
+    entry
+WHERE (
+    {constraints}
+)
+'''
+
+# restricts the query to a set of entries, e.g. the result of a bitmap index lookup (see set_rowids())
+_ROWID_CONSTRAINT = 'entry.rowid IN (SELECT value FROM json_each(?))'
+
+_PAGINATION = '''ORDER BY
+    entry.entryId
+LIMIT ? OFFSET ?
+'''
+
 _queried_columns_map = {
     'entryId': 'uniprot_id',
     'neff': 'neff',
@@ -24,6 +60,40 @@ _queried_columns_map = {
     'hasSubstrate': 'has_substrate',
 }
 
+_column_lookup = {v: k for k, v in _queried_columns_map.items()}
+
+# compiled SQL text per query shape, least recently used shapes are evicted first
+_MAX_COMPILED_QUERIES = 1024
+_compiled_queries = OrderedDict()
+_compiled_lock = threading.Lock()
+
+# resolved ID lists longer than this are bound as a single JSON array instead of an IN list
+_MAX_RESOLVED_IDS = 500
+
+# estimated selectivity of the constraints, lower values are expected to match fewer entries,
+# and are evaluated first (unlisted constraints are in between, at 2)
+_SELECTIVITY = {
+    ProteinParams.ID: 0,
+    ProteinParams.SEQUENCE: 0,
+    ProteinParams.DISEASE_ID: 1,
+    ProteinParams.COFACTOR_ID: 1,
+    ProteinParams.DISEASE: 1,
+    ProteinParams.COFACTOR: 1,
+    ProteinParams.ORGANISM_ID: 1,
+    ProteinParams.MIN_HELIX: 3,
+    ProteinParams.MAX_HELIX: 3,
+    ProteinParams.MIN_TURN: 3,
+    ProteinParams.MAX_TURN: 3,
+    ProteinParams.MIN_STRAND: 3,
+    ProteinParams.MAX_STRAND: 3,
+    ProteinParams.MIN_LENGTH: 3,
+    ProteinParams.MAX_LENGTH: 3,
+    ProteinParams.HAS_SUBSTRATE: 4,
+    ProteinParams.HAS_PDB: 4,
+    ProteinParams.HAS_PTM: 4,
+    ProteinParams.HAS_DISEASE: 4,
+}
+
 
 class PyComSQLQueryBuilder:
     """PyCom SQL Query Builder
@@ -33,28 +103,66 @@ class PyComSQLQueryBuilder:
 
     _db_columns = list(_queried_columns_map.keys())
     columns = [x for x in _queried_columns_map.values()]
+    column_map = dict(_queried_columns_map)  # database column -> DataFrame column
+
+    def __init__(self, features: FrozenSet[str] = frozenset(), resolver: Optional[VocabularyResolver] = None):
+        """
+        :param features: Optional side indexes that exist in the database (see features.detect_features()),
+                         constraints use their indexed variant if its feature is available.
+        :param resolver: Resolves substring constraints against the vocabulary tables before the main query
+                         (two-phase constraints, see vocabulary.py). Without it, they are part of the main query.
+        """
+        self.features = features
+        self.resolver = resolver
 
-    def __init__(self):
         # self.columns = ['entry.entryId', 'entry.sequence', 'entry.sequenceLength', 'entry.organismId']
         self.columns = PyComSQLQueryBuilder._db_columns
 
         self.constraint_store = []
         self.param_store = []
 
+        self.limit = None
+        self.offset = 0
+        self.after = None
+        self.rowids = None
+
         self.query = None
         self.params = None
 
         # self.strip_query = False  # Strip whitespace from the query, for debugging purposes
 
     def add_column(self, column):
-        raise NotImplementedError
+        """Add a column to the SELECT list
+
+        By default, all columns are selected. Once a column is added, only the added columns are selected.
+        Columns are named as in the resulting DataFrame (e.g. 'uniprot_id', 'sequence_length').
+        """
+        assert column in _column_lookup, f'Column {column} is not defined, ' \
+                                         f'valid columns are: {", ".join(PyComSQLQueryBuilder.columns)}'
+
+        if self.columns is PyComSQLQueryBuilder._db_columns:  # first added column, stop selecting all columns
+            self.columns = []
+
+        db_column = _column_lookup[column]
+        if db_column not in self.columns:
+            self.columns.append(db_column)
+
+    def add_columns(self, columns):
+        """Add multiple columns to the SELECT list
+
+        Example:
+            add_columns(['uniprot_id', 'sequence_length'])
+        """
+        for column in columns:
+            self.add_column(column)
 
     def add_constraint(self, constraint, param):
         """Add a constraint to the query
         
-        The constraint name is a predefined string """
+        The constraint name is a predefined string, the param is a single value, or a list of values
+        for constraints that accept them (e.g. ProteinParams.ID) """
         self.constraint_store.append(constraint)
-        self.param_store.extend(param) if isinstance(param, list) else self.param_store.append(param)
+        self.param_store.append(param)
 
     def add_constraints(self, constraints: dict):
         """Add multiple constraints to the query
@@ -68,32 +176,181 @@ class PyComSQLQueryBuilder:
         for constraint, param in constraints.items():
             self.add_constraint(constraint, param)
 
-    def build(self):
-        """Build the query"""
+    def set_limit(self, limit: int, offset: int = 0):
+        """Limit the number of rows returned by the query
+
+        The rows are ordered by UniProt ID, so that consecutive pages do not overlap.
+        The limit and offset are passed to SQLite as parameters (LIMIT ? OFFSET ?).
+        """
+        assert limit >= 1, 'Limit must be at least 1'
+        assert offset >= 0, 'Offset cannot be negative'
+        self.limit = limit
+        self.offset = offset
+
+    def set_after(self, entry_id: str):
+        """Only select entries with a UniProt ID after entry_id (keyset pagination)
+
+        Used together with set_limit(), this turns deep pages into a range scan on entry.entryId,
+        instead of skipping over all previous rows with OFFSET.
+        """
+        self.after = str(entry_id)
+
+    def set_rowids(self, rowids):
+        """Only select the entries with these rowids (e.g. the entries matched by a bitmap index)
+
+        The rowids are passed to SQLite as a single JSON array parameter, regardless of their number.
+        """
+        self.rowids = json.dumps([int(rowid) for rowid in rowids])
+
+    def _get_constraint_function(self, constraint):
+        """Returns the constraint function, preferring variants that use an available side index
+
+        Also returns the feature the variant uses (None for the default constraint)"""
+        for feature, constraint_function in template[constraint].get('indexed', {}).items():
+            if feature in self.features:
+                return feature, constraint_function
+        return None, template[constraint]['constraint']
+
+    def _compile_constraints(self):
+        """Validate the constraints and compile them, in canonical order
+
+        Returns the shape of the constraints (what the SQL text depends on), the SQL text of every
+        constraint (as functions, only called if the shape has not been compiled before), and the
+        parameters in the same order.
+        """
         assert len(self.constraint_store) == len(self.param_store), 'Number of constraints and parameters must be equal'
         query_input = zip(self.constraint_store, self.param_store)
 
-        selector_parts = []
-        params = []
+        compiled = []
 
         for constraint, param in query_input:
             assert constraint in template, f'Selector {constraint} is not defined'
+            constraint = ProteinParams(constraint)
             param = template[constraint]['param'](param)  # Apply the param function to the param
-            constraint_query = template[constraint]['constraint'](param)
 
-            selector_parts.append(constraint_query)
+            compiled.append(self._compile_constraint(constraint, param))
+
+        # canonical order: most selective constraints first, then by name and shape,
+        # so the order in which constraints were added does not change the SQL text
+        compiled.sort(key=lambda x: (x[0], x[1].value, repr(x[2])))
+
+        shape = tuple((constraint.value, constraint_shape) for _, constraint, constraint_shape, _, _ in compiled)
+        sql_functions = [sql_function for _, _, _, sql_function, _ in compiled]
+
+        params = []
+        if self.rowids is not None:  # evaluated first, the rowids are usually the most selective constraint
+            shape = (('rowids', None),) + shape
+            sql_functions.insert(0, lambda: _ROWID_CONSTRAINT)
+            params.append(self.rowids)
+
+        for *_, param in compiled:
             params.extend(param) if isinstance(param, list) else params.append(param)
 
-        columns = ', '.join(self.columns)
-        selector = ' AND '.join(selector_parts if selector_parts else ['1=1'])
+        return shape, sql_functions, params
+
+    def _compile_constraint(self, constraint: ProteinParams, param):
+        """Compiles a single constraint
+
+        Returns its estimated selectivity, the constraint, its shape, a function returning its SQL,
+        and its parameters. Two-phase constraints are resolved into a list of IDs first, if the builder
+        has a resolver.
+        """
+        selectivity = _SELECTIVITY.get(constraint, 2)
+
+        if self.resolver is not None and 'resolve' in template[constraint]:
+            ids = list(self.resolver.resolve(template[constraint]['resolve'](self.features), param,
+                                             lookup=template[constraint].get('lookup')))
+
+            if len(ids) == 0:  # matches nothing, evaluated first to skip the rest
+                return -1, constraint, ('empty',), lambda: '0=1', []
+
+            resolved = template[constraint]['resolved']
+            if len(ids) <= _MAX_RESOLVED_IDS:
+                return selectivity, constraint, ('resolved', len(ids)), lambda: resolved(ids), ids
+
+            ids = JsonList(json.dumps(ids))  # bound as a single parameter
+            return selectivity, constraint, ('resolved', 'json'), lambda: resolved(ids), ids
 
-        self.query = _BASE_QUERY.format(columns=columns, constraints=selector)
+        feature, constraint_function = self._get_constraint_function(constraint)
+        param_shape = template[constraint].get('shape', _default_shape)(param)
+
+        params = param
+        if feature in template[constraint].get('indexed_params', {}):  # the indexed variant binds other params
+            params = template[constraint]['indexed_params'][feature](param)
+
+        return selectivity, constraint, (feature, param_shape), lambda: constraint_function(param), params
+
+    def _get_query(self, kind: str, shape: tuple, sql_functions: list, compile_query):
+        """Returns the compiled SQL text of a query shape, compiling it if it is not cached yet"""
+        key = (kind, shape, tuple(self.columns), self.after is not None, self.limit is not None)
+
+        with _compiled_lock:
+            if key in _compiled_queries:
+                _compiled_queries.move_to_end(key)
+                return _compiled_queries[key]
+
+        selector = ' AND '.join([sql_function() for sql_function in sql_functions] or ['1=1'])
+        query = compile_query(selector)
+
+        with _compiled_lock:
+            _compiled_queries[key] = query
+            if len(_compiled_queries) > _MAX_COMPILED_QUERIES:
+                _compiled_queries.popitem(last=False)
+
+        return query
+
+    def _compile_select(self, selector: str) -> str:
+        """Builds the SELECT query around the WHERE clause"""
+        if self.after is not None:
+            selector += ' AND entry.entryId > ?'
+
+        query = _BASE_QUERY.format(columns=', '.join(self.columns), constraints=selector)
         # if self.strip_query:
-        #     self.query = strip_whitespace(self.query)
+        #     query = strip_whitespace(query)
+
+        if self.limit is not None:
+            query += _PAGINATION
+
+        return query
+
+    def build(self):
+        """Build the query
+
+        The SQL text only depends on the shape of the constraints (which constraints, in canonical order,
+        and the number of values in list parameters), not on their values or the order they were added in.
+        Compiled SQL is cached per shape, and identical shapes reuse SQLite's prepared statements.
+        """
+        shape, sql_functions, params = self._compile_constraints()
+
+        self.query = self._get_query('select', shape, sql_functions, self._compile_select)
+
+        if self.after is not None:
+            params.append(self.after)
+        if self.limit is not None:
+            params.extend([self.limit, self.offset])
 
         self.params = params
 
         return self.query, self.params
 
+    def build_count(self):
+        """Build a query that counts the matching entries, without selecting them"""
+        shape, sql_functions, params = self._compile_constraints()
+        query = self._get_query('count', shape, sql_functions, lambda selector: _COUNT_QUERY.format(
+            constraints=selector))
+        return query, params
+
+    def build_rowids(self):
+        """Build a query that selects the rowids of the matching entries, used to build bitmap indexes"""
+        shape, sql_functions, params = self._compile_constraints()
+        query = self._get_query('rowid', shape, sql_functions, lambda selector: _ROWID_QUERY.format(
+            constraints=selector))
+        return query, params
+
+
+def _default_shape(param):
+    """The part of a param that changes the SQL text of a constraint: the number of values in list params"""
+    return len(param) if isinstance(param, list) else None
+
 
 __all__ = ['PyComSQLQueryBuilder']
@@ -1,23 +1,46 @@
 from functools import partial
 
 from pycom.selector.selector_params import ProteinParams
+from pycom.sql.class_code import class_code_constraint
+from pycom.sql.features import CLASS_CODE, FTS5, SEQUENCE_MD5
+from pycom.sql.sequence_index import sequence_md5_constraint, sequence_md5_params
 from pycom.sql.constraints_utils import *
 
 """This class defines the constraints for the query builder
 
 It both defines the constraint to query mapping and validation
 of the parameters.
+
+Constraints can define alternative queries under 'indexed', keyed by the
+optional feature (side index, see features.py) they require. The builder
+uses the first one whose feature exists in the database. Variants that bind
+different params than the default constraint define them under
+'indexed_params', as a function of the param.
+
+Compiled SQL is cached per shape of the constraints. By default, the SQL of a
+constraint only depends on the number of values of list params. Constraints
+whose SQL depends on the value itself define it as their 'shape'.
+
+Substring constraints can be evaluated in two phases, if the builder has a
+vocabulary resolver (see vocabulary.py): the 'resolve' query matches the
+name against the small vocabulary table, and 'resolved' filters the entries
+with the resulting list of IDs. If the resolver has the in-memory index named
+by 'lookup', it resolves the name instead of the 'resolve' query.
 """
 
 _constraints_simple = {
-    ProteinParams.ID: {  # uniprot id
-        'constraint': lambda _: 'entry.entryId = ?',
-        'param': lambda x: str(x),
+    ProteinParams.ID: {  # uniprot id, or a list of them
+        'constraint': partial(value_list_constraint, column='entry.entryId'),
+        'param': partial(value_list_param, entry=ProteinParams.ID),
+        'shape': value_list_shape,
         # 'validate': lambda x: bool(re.match(r'^[\d\w]{6,10}$', x))
     },
-    ProteinParams.SEQUENCE: {  # sequence
-        'constraint': lambda _: 'entry.sequence = ?',
-        'param': lambda x: str(x).upper(),
+    ProteinParams.SEQUENCE: {  # sequence, or a list of them
+        'constraint': partial(value_list_constraint, column='entry.sequence'),
+        'param': partial(value_list_param, entry=ProteinParams.SEQUENCE, convert=lambda x: str(x).upper()),
+        'shape': value_list_shape,
+        'indexed': {SEQUENCE_MD5: sequence_md5_constraint},
+        'indexed_params': {SEQUENCE_MD5: sequence_md5_params},
         # 'validate': lambda x: bool(re.match(r'^[A-Z]+$', x))
     },
     ProteinParams.MIN_LENGTH: {  # minimum sequence length
@@ -78,18 +101,27 @@ _constraints_special = {
     ProteinParams.ORGANISM: {  # protein name
         'constraint': organism_constraint,
         'param': lambda x: f'%{x}%'.lower(),  # add wildcards
+        'indexed': {FTS5: organism_fts_constraint},
+        'resolve': organism_resolve,
+        'resolved': organism_ids_constraint,
+        'lookup': 'taxonomy',  # see taxonomy.py
     },
     ProteinParams.CATH: {  # CATH class
         'constraint': partial(class_constraint, entry_type='cath'),
         'param': lambda x: class_param(x),
+        'indexed': {CLASS_CODE: partial(class_code_constraint, entry_type='cath')},
     },
     ProteinParams.ENZYME: {  # Enzyme class
         'constraint': partial(class_constraint, entry_type='enzyme'),
         'param': lambda x: class_param(x),
+        'indexed': {CLASS_CODE: partial(class_code_constraint, entry_type='enzyme')},
     },
     ProteinParams.DISEASE: {  # disease name
         'constraint': disease_constraint,
         'param': lambda x: f'%{x}%'.lower(),  # add wildcards
+        'indexed': {FTS5: disease_fts_constraint},
+        'resolve': disease_resolve,
+        'resolved': disease_ids_constraint,
     },
     ProteinParams.DISEASE_ID: {  # disease id
         'constraint': disease_id_constraint,
@@ -97,11 +129,15 @@ _constraints_special = {
     },
     ProteinParams.HAS_DISEASE: {  # has disease
         'constraint': has_disease_constraint,
-        'param': partial(to_bool, entry=ProteinParams.HAS_DISEASE)
+        'param': partial(to_bool, entry=ProteinParams.HAS_DISEASE),
+        'shape': lambda x: x,  # the SQL text depends on the value (IN / NOT IN)
     },
     ProteinParams.COFACTOR: {  # cofactor name
         'constraint': cofactor_constraint,
         'param': lambda x: f'%{x}%'.lower(),  # add wildcards
+        'indexed': {FTS5: cofactor_fts_constraint},
+        'resolve': cofactor_resolve,
+        'resolved': cofactor_ids_constraint,
     },
     ProteinParams.COFACTOR_ID: {  # cofactor id
         'constraint': cofactor_id_constraint,
@@ -113,30 +149,51 @@ _constraints_keyword_based = {
     ProteinParams.BIOLOGICAL_PROCESS: {  # biological process
         'constraint': partial(keyword_constraint, keyword_category='Biological process'),
         'param': lambda x: f'%{x}%'.lower(),  # add wildcards
+        'indexed': {FTS5: partial(keyword_fts_constraint, keyword_category='Biological process')},
+        'resolve': partial(keyword_resolve, keyword_category='Biological process'),
+        'resolved': partial(keyword_ids_constraint, keyword_category='Biological process'),
     },
     ProteinParams.CELLULAR_COMPONENT: {  # cellular component
         'constraint': partial(keyword_constraint, keyword_category='Cellular component'),
         'param': lambda x: f'%{x}%'.lower(),  # add wildcards
+        'indexed': {FTS5: partial(keyword_fts_constraint, keyword_category='Cellular component')},
+        'resolve': partial(keyword_resolve, keyword_category='Cellular component'),
+        'resolved': partial(keyword_ids_constraint, keyword_category='Cellular component'),
     },
     ProteinParams.DEVELOPMENTAL_STAGE: {  # developmental stage
         'constraint': partial(keyword_constraint, keyword_category='Developmental stage'),
         'param': lambda x: f'%{x}%'.lower(),  # add wildcards
+        'indexed': {FTS5: partial(keyword_fts_constraint, keyword_category='Developmental stage')},
+        'resolve': partial(keyword_resolve, keyword_category='Developmental stage'),
+        'resolved': partial(keyword_ids_constraint, keyword_category='Developmental stage'),
     },
     ProteinParams.DOMAIN: {  # domain
         'constraint': partial(keyword_constraint, keyword_category='Domain'),
         'param': lambda x: f'%{x}%'.lower(),  # add wildcards
+        'indexed': {FTS5: partial(keyword_fts_constraint, keyword_category='Domain')},
+        'resolve': partial(keyword_resolve, keyword_category='Domain'),
+        'resolved': partial(keyword_ids_constraint, keyword_category='Domain'),
     },
     ProteinParams.LIGAND: {  # ligand
         'constraint': partial(keyword_constraint, keyword_category='Ligand'),
         'param': lambda x: f'%{x}%'.lower(),  # add wildcards
+        'indexed': {FTS5: partial(keyword_fts_constraint, keyword_category='Ligand')},
+        'resolve': partial(keyword_resolve, keyword_category='Ligand'),
+        'resolved': partial(keyword_ids_constraint, keyword_category='Ligand'),
     },
     ProteinParams.MOLECULAR_FUNCTION: {  # molecular function
         'constraint': partial(keyword_constraint, keyword_category='Molecular function'),
         'param': lambda x: f'%{x}%'.lower(),  # add wildcards
+        'indexed': {FTS5: partial(keyword_fts_constraint, keyword_category='Molecular function')},
+        'resolve': partial(keyword_resolve, keyword_category='Molecular function'),
+        'resolved': partial(keyword_ids_constraint, keyword_category='Molecular function'),
     },
     ProteinParams.PTM: {  # post-translational modification
         'constraint': partial(keyword_constraint, keyword_category='PTM'),
         'param': lambda x: f'%{x}%'.lower(),  # add wildcards
+        'indexed': {FTS5: partial(keyword_fts_constraint, keyword_category='PTM')},
+        'resolve': partial(keyword_resolve, keyword_category='PTM'),
+        'resolved': partial(keyword_ids_constraint, keyword_category='PTM'),
     }
 }
 
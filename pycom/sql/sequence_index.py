@@ -0,0 +1,47 @@
+"""Hash index of the entry sequences, for exact sequence lookups.
+
+The SEQUENCE constraint compares whole protein sequences (`entry.sequence = ?`), and an index on the sequence column
+would store a second copy of every sequence. The sidecar table pycom_sequence_md5 maps the md5 hash of every sequence
+(the key of the matrices in pycom.mat, see format_util.md5_hash()) to its entries, so a lookup is one search of a
+short key per sequence. The sequences of the matching entries are still compared, so hash collisions cannot change
+the results.
+"""
+import json
+import sqlite3
+
+from pycom.sql.constraints_utils import JsonList, value_list_constraint
+from pycom.util.format_util import md5_hash
+
+_TABLE = 'pycom_sequence_md5'
+
+
+def create_sequence_index(conn: sqlite3.Connection):
+    """(Re)build the hash table from the current contents of the entry table"""
+    conn.execute(f'DROP TABLE IF EXISTS {_TABLE}')
+    conn.execute(f'CREATE TABLE {_TABLE} (md5 TEXT, entryId TEXT, PRIMARY KEY (md5, entryId)) WITHOUT ROWID')
+
+    rows = conn.execute('SELECT entryId, sequence FROM entry WHERE sequence IS NOT NULL')
+    conn.executemany(f'INSERT INTO {_TABLE} (md5, entryId) VALUES (?, ?)',
+                     ((md5_hash(sequence), entry_id) for entry_id, sequence in rows))
+    conn.commit()
+
+
+def sequence_md5_constraint(param):
+    """Variant of the SEQUENCE constraint that finds the entries through the hash table (features.SEQUENCE_MD5)
+
+    Takes the same param as the SEQUENCE constraint (see value_list_param), and is bound to the params returned
+    by sequence_md5_params()."""
+    return f'''entry.entryId IN (
+        SELECT  {_TABLE}.entryId
+        FROM    {_TABLE}
+        WHERE   {value_list_constraint(param, f'{_TABLE}.md5')}
+    ) AND {value_list_constraint(param, 'entry.sequence')}'''
+
+
+def sequence_md5_params(param):
+    """The params of sequence_md5_constraint: the hashes of the sequences, followed by the sequences"""
+    if isinstance(param, JsonList):
+        return [JsonList(json.dumps([md5_hash(sequence) for sequence in json.loads(param)])), param]
+    if isinstance(param, list):
+        return [md5_hash(sequence) for sequence in param] + param
+    return [md5_hash(param), param]
@@ -0,0 +1,156 @@
+import os
+import sqlite3
+import threading
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+_K = 3  # length of the k-mers (amino acids) the sequences are compared by
+_NUM_PERM = 64  # number of hash functions of a MinHash signature
+_BANDS = 32  # number of LSH bands, of _NUM_PERM // _BANDS hashes each
+_PRIME = (1 << 31) - 1  # modulus of the hash functions, a Mersenne prime
+_SEED = 42
+
+
+class MinHashIndex:
+    """A MinHash LSH index of the entry sequences, for finding entries with sequences similar to a query sequence
+
+    Every sequence is reduced to the set of its k-mers (_K amino acids), and summarised by a MinHash signature: the
+    minimum of _NUM_PERM hash functions over the set. The fraction of equal positions of two signatures estimates
+    the Jaccard similarity of the k-mer sets. The signatures are split into _BANDS bands, and entries whose signature
+    shares a band with the query are the candidates (locality sensitive hashing), so a query only compares the
+    signatures of the candidates instead of all sequences.
+
+    The index is built from the entry table on first use, which reads every sequence. If path is set, it is stored
+    in a sidecar file (.npz) and loaded from there, the sidecar is rebuilt if it is older than pycom.db.
+
+    Usage:
+        >>> index = MinHashIndex(pool.connection, path='/path/on/disk/pycom.minhash.npz', db_path='pycom.db')
+        >>> index.query('MTTDDVLA...', top_k=10, min_similarity=0.3)
+        [('P01308', 0.84), ...]
+    """
+
+    def __init__(
+            self,
+            connection: Callable[[], sqlite3.Connection],
+            path: Optional[str] = None,
+            db_path: Optional[str] = None
+    ):
+        """
+        :param connection: Returns the connection to read the sequences with (e.g. PyComConnectionPool.connection)
+        :param path: Path of the sidecar file to store the index in (optional, default in memory)
+        :param db_path: Path to pycom.db, the sidecar file is rebuilt if it is older (required if path is set)
+        """
+        assert path is None or db_path is not None, 'db_path is required to check if the sidecar file is up to date'
+
+        self.connection = connection
+        self.path = path
+        self.db_path = db_path
+
+        self._index: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    @property
+    def index(self) -> dict:
+        """The arrays of the index (see _build()), loaded on first use"""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._load()
+        return self._index
+
+    def _build(self) -> dict:
+        rng = np.random.default_rng(_SEED)
+        a = rng.integers(1, _PRIME, size=_NUM_PERM, dtype=np.int64)
+        b = rng.integers(0, _PRIME, size=_NUM_PERM, dtype=np.int64)
+
+        entry_ids = []
+        signatures = []
+        for entry_id, sequence in self.connection().execute('SELECT entryId, sequence FROM entry ORDER BY entryId'):
+            if sequence is not None and len(sequence) >= _K:
+                entry_ids.append(entry_id)
+                signatures.append(_signature(sequence, _K, a, b))
+
+        signatures = np.array(signatures, dtype=np.uint32).reshape(-1, _NUM_PERM)
+        band_keys = _band_keys(signatures, _BANDS)
+        band_order = np.argsort(band_keys, axis=1, kind='stable').astype(np.int32)
+
+        return {
+            'k': np.array(_K),
+            'a': a,
+            'b': b,
+            'entry_ids': np.array(entry_ids, dtype=str),
+            'signatures': signatures,
+            'band_keys': np.take_along_axis(band_keys, band_order, axis=1),  # sorted per band
+            'band_order': band_order,
+        }
+
+    def _load(self) -> dict:
+        if self.path is None:
+            return self._build()
+
+        if not os.path.exists(self.path) or os.path.getmtime(self.path) < os.path.getmtime(self.db_path):
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:  # a file object, np.savez would append .npz to the path
+                np.savez(f, **self._build())
+            os.replace(tmp_path, self.path)  # other processes never see a partially written file
+
+        with np.load(self.path) as sidecar:
+            return {name: sidecar[name] for name in sidecar.files}
+
+    def query(self, sequence: str, top_k: int = 10, min_similarity: float = 0.0) -> List[Tuple[str, float]]:
+        """
+        The entries with the sequences most similar to a sequence
+
+        :param sequence: The amino acid sequence to compare to
+        :param top_k: The maximum number of entries to return
+        :param min_similarity: Only return entries with at least this estimated k-mer Jaccard similarity (0-1)
+        :return: [(UniProt ID, estimated similarity)], most similar first
+        """
+        index = self.index
+        k = int(index['k'])
+        sequence = sequence.upper()
+        assert len(sequence) >= k, f'sequence must be at least {k} residues long'
+
+        signature = _signature(sequence, k, index['a'], index['b'])
+        query_keys = _band_keys(signature[np.newaxis, :], index['band_keys'].shape[0])[:, 0]
+
+        candidates = []
+        for keys, order, key in zip(index['band_keys'], index['band_order'], query_keys):
+            start, end = np.searchsorted(keys, key, side='left'), np.searchsorted(keys, key, side='right')
+            candidates.append(order[start:end])
+        candidates = np.unique(np.concatenate(candidates))
+
+        similarity = (index['signatures'][candidates] == signature).mean(axis=1)
+        matched = similarity >= min_similarity
+        candidates, similarity = candidates[matched], similarity[matched]
+
+        best = np.lexsort((candidates, -similarity))[:top_k]  # most similar first, ties in order of UniProt ID
+        return [(str(index['entry_ids'][i]), float(s)) for i, s in zip(candidates[best], similarity[best])]
+
+    def clear(self):
+        """Unload the index, e.g. after the database has changed"""
+        with self._lock:
+            self._index = None
+
+
+def _signature(sequence: str, k: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """The MinHash signature of the k-mers of a sequence, one minimum per hash function (a * x + b) % _PRIME"""
+    residues = np.frombuffer(sequence.encode(), dtype=np.uint8).astype(np.int64) & 31  # letters -> 1-26
+    kmers = np.zeros(len(residues) - k + 1, dtype=np.int64)
+    for i in range(k):
+        kmers |= residues[i:len(residues) - k + 1 + i] << (5 * i)
+    kmers = np.unique(kmers)
+
+    return ((a[:, np.newaxis] * kmers + b[:, np.newaxis]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def _band_keys(signatures: np.ndarray, bands: int) -> np.ndarray:
+    """Combines the hashes of every band of the signatures into a single key, returns an array of (bands, entries)"""
+    rows = signatures.shape[1] // bands
+    banded = signatures.reshape(len(signatures), bands, rows).astype(np.uint64)
+
+    keys = np.zeros(banded.shape[:2], dtype=np.uint64)
+    for row in range(rows):  # FNV-style mixing, overflows wrap around
+        keys = (keys ^ banded[:, :, row]) * np.uint64(0x100000001B3)
+    return keys.T.copy()
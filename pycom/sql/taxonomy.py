@@ -0,0 +1,93 @@
+import sqlite3
+import threading
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+
+class TaxonomyIndex:
+    """The taxonomic lineages of the organisms in the organism table, parsed once and kept in memory
+
+    Maps every taxon name in a full lineage (organism.taxonomyFull, e.g. 'Mammalia') to the IDs of the organisms
+    that descend from it, and every organism ID to its lineage (organism.taxonomy, as a list of taxon names).
+
+    resolve() answers the organism constraint without scanning the organism table, by matching the name against
+    the distinct taxon names instead of every lineage string.
+
+    Usage:
+        >>> taxonomy = TaxonomyIndex(pool.connection)
+        >>> taxonomy.resolve('%mammalia%')  # organism IDs, as organism_resolve() would return them
+        >>> taxonomy.lineage(9606)
+        ['Eukaryota', 'Metazoa', 'Chordata', 'Mammalia', 'Primates']
+    """
+
+    def __init__(self, connection: Callable[[], sqlite3.Connection]):
+        """
+        :param connection: Returns the connection to load the organism table with (e.g. PyComConnectionPool.connection)
+        """
+        self.connection = connection
+
+        # (lower-case taxon name -> organism IDs, organism ID -> lineage), replaced as a whole so readers never see
+        # one without the other
+        self._index: Optional[Tuple[Dict[str, FrozenSet[int]], Dict[int, Tuple[str, ...]]]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Tuple[Dict[str, FrozenSet[int]], Dict[int, Tuple[str, ...]]]:
+        """Returns (descendants, lineages), building them from the organism table on first use
+
+        Callers must use the returned dicts instead of reading the attribute again, clear() may reset it meanwhile."""
+        index = self._index
+        if index is not None:
+            return index
+
+        with self._lock:
+            if self._index is not None:
+                return self._index
+
+            descendants: Dict[str, set] = {}
+            lineages = {}
+            for organism_id, taxonomy, taxonomy_full in self.connection().execute(
+                    'SELECT organismId, taxonomy, taxonomyFull FROM organism'):
+                lineages[organism_id] = tuple(_split_lineage(taxonomy or ''))
+                for taxon in _split_lineage(taxonomy_full or ''):
+                    descendants.setdefault(taxon.lower(), set()).add(organism_id)
+
+            self._index = ({taxon: frozenset(ids) for taxon, ids in descendants.items()}, lineages)
+            return self._index
+
+    def resolve(self, pattern: str) -> Optional[Tuple[int, ...]]:
+        """
+        The IDs of the organisms whose full lineage matches a LIKE pattern of the organism constraint ('%name%')
+
+        Returns None if the pattern cannot be answered from the taxon names alone (wildcards or ':' inside the
+        name), the organism constraint then has to be evaluated in SQL.
+        """
+        term = pattern.lower()
+        if term.startswith('%') and term.endswith('%') and len(term) >= 2:
+            term = term[1:-1]
+        else:
+            return None
+
+        if not term or any(c in term for c in '%_:'):
+            return None
+
+        descendants, _ = self._load()
+
+        # the lineage contains the name if one of its taxa does, as the name cannot span a ':'
+        matches = [ids for taxon, ids in descendants.items() if term in taxon]
+        return tuple(sorted(frozenset().union(*matches)))
+
+    def lineage(self, organism_id: int) -> Optional[List[str]]:
+        """The lineage of an organism (organism.taxonomy) as a list of taxon names, None for unknown organisms"""
+        _, lineages = self._load()
+
+        lineage = lineages.get(organism_id)
+        return list(lineage) if lineage is not None else None
+
+    def clear(self):
+        """Forget the index, e.g. after the database has changed"""
+        with self._lock:
+            self._index = None
+
+
+def _split_lineage(string: str) -> List[str]:
+    string = string.strip(':')  # Remove the leading and trailing colons, if any
+    return string.split(':') if string else []
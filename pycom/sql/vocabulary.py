@@ -0,0 +1,68 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+
+class VocabularyResolver:
+    """Resolves name patterns against the small vocabulary tables (disease, cofactor, keyword, organism) into IDs
+
+    This is the first phase of the two-phase substring constraints: instead of joining the vocabulary
+    to the large link tables inside the main query, the matching IDs are looked up first, and the main
+    query filters the link tables with an indexed IN list of those IDs.
+
+    Lookups are cached (least recently used patterns are evicted first), as the vocabulary does not change.
+
+    Constraints can name an in-memory lookup (the 'lookup' key in query_constraints.py, e.g. the taxonomy index),
+    which is used instead of the resolve query if the resolver has it, and it can answer the param.
+
+    Usage:
+        >>> resolver = VocabularyResolver(pool.connection)
+        >>> resolver.resolve('SELECT diseaseId FROM disease WHERE lower(diseaseName) LIKE lower(?)', '%cancer%')
+    """
+
+    def __init__(
+            self,
+            connection: Callable[[], sqlite3.Connection],
+            max_cached: int = 4096,
+            lookups: Optional[Dict[str, Callable[[object], Optional[Tuple]]]] = None
+    ):
+        """
+        :param connection: Returns the connection to run the lookups on (e.g. PyComConnectionPool.connection)
+        :param max_cached: Maximum number of cached lookups
+        :param lookups: In-memory lookups by name, returning the IDs matching a param, or None if they cannot
+                        answer it (e.g. {'taxonomy': TaxonomyIndex(...).resolve})
+        """
+        self.connection = connection
+        self.max_cached = max_cached
+        self.lookups = lookups or {}
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, query: str, param, lookup: Optional[str] = None) -> Tuple:
+        """Runs a resolve query (see query_constraints.py) and returns the IDs it matches
+
+        If lookup names one of the in-memory lookups of the resolver, it is tried first."""
+        key = (query, param)
+
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        ids = self.lookups[lookup](param) if lookup in self.lookups else None
+        if ids is None:
+            ids = tuple(row[0] for row in self.connection().execute(query, [param]))
+
+        with self._lock:
+            self._cache[key] = ids
+            if len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+
+        return ids
+
+    def clear(self):
+        """Forget all cached lookups, e.g. after the database has changed"""
+        with self._lock:
+            self._cache.clear()
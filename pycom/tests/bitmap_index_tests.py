@@ -0,0 +1,38 @@
+import sqlite3
+
+from pycom.sql.bitmap_index import BitmapIndex
+
+
+def test_bitmap_index():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE entry (entryId TEXT PRIMARY KEY, hasPDB INTEGER, hasPTM INTEGER)')
+    conn.executemany('INSERT INTO entry VALUES (?, ?, ?)', [(f'P{i:05d}', i % 2, i % 3 == 0) for i in range(20)])
+    conn.execute("DELETE FROM entry WHERE entryId = 'P00004'")  # rowids do not have to be contiguous
+
+    index = BitmapIndex(lambda: conn)
+    has_pdb = index.bitmap('has_pdb', lambda: ('SELECT rowid FROM entry WHERE hasPDB = ?', [1]))
+    has_ptm = index.bitmap('has_ptm', lambda: ('SELECT rowid FROM entry WHERE hasPTM = ?', [1]))
+
+    both = index.intersect([has_pdb, has_ptm])
+    expected = [row[0] for row in conn.execute('SELECT rowid FROM entry WHERE hasPDB = 1 AND hasPTM = 1')]
+
+    assert index.to_rowids(both).tolist() == expected
+    assert index.count(both) == len(expected)
+    assert index.count(has_pdb) == 10
+
+    index.bitmap('has_pdb', lambda: ('SELECT rowid FROM entry WHERE 0=1', []))  # cached, the query is not run
+    assert index.stats()['hits'] == 1
+
+
+def test_bitmap_index_rowids_snapshot():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE entry (entryId TEXT PRIMARY KEY, hasPDB INTEGER)')
+    conn.executemany('INSERT INTO entry VALUES (?, ?)', [(f'P{i:05d}', i % 2) for i in range(10)])
+
+    index = BitmapIndex(lambda: conn)
+    rowids = index.rowids
+    index.clear()  # e.g. the database changed, the snapshot stays usable
+
+    has_pdb = index.bitmap('has_pdb', lambda: ('SELECT rowid FROM entry WHERE hasPDB = ?', [1]), rowids=rowids)
+    assert index.to_rowids(has_pdb, rowids).tolist() == [2, 4, 6, 8, 10]
+    assert index.count(has_pdb, rowids) == 5
@@ -0,0 +1,54 @@
+import sqlite3
+
+from pycom import ProteinParams
+from pycom.sql import PyComSQLQueryBuilder
+from pycom.sql.class_code import class_counts_query, create_class_code_indexes, decode_class
+from pycom.sql.features import CLASS_CODE
+
+
+def _create_db():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE entry (entryId TEXT PRIMARY KEY)')
+    for entry_type in ['cath', 'enzyme']:
+        conn.execute(f'CREATE TABLE {entry_type}_class (entryId TEXT, {entry_type}_1 INTEGER, '
+                     f'{entry_type}_2 INTEGER, {entry_type}_3 INTEGER, {entry_type}_4 INTEGER)')
+
+    conn.executemany('INSERT INTO entry VALUES (?)', [('P01111',), ('P02222',), ('P03333',)])
+    conn.executemany('INSERT INTO cath_class VALUES (?, ?, ?, ?, ?)', [
+        ('P01111', 3, 40, 50, 300),
+        ('P01111', 3, 40, 50, 720),  # two domains in 3.40.50.*, counted once
+        ('P02222', 3, 40, 1, 10),
+        ('P03333', 3, 30, 70, 1),
+    ])
+    conn.executemany('INSERT INTO enzyme_class VALUES (?, ?, ?, ?, ?)', [
+        ('P01111', 2, 7, 11, 1),
+        ('P02222', 2, 7, 11, None),  # unknown serial number
+    ])
+    create_class_code_indexes(conn)
+    return conn
+
+
+def test_class_code_constraint():
+    conn = _create_db()
+
+    for constraint, param in [(ProteinParams.CATH, '3.*'), (ProteinParams.CATH, '3.40.*.*'),
+                              (ProteinParams.CATH, '3.40.50.300'), (ProteinParams.ENZYME, '2.7.11.*'),
+                              (ProteinParams.ENZYME, '2.7.11.1'), (ProteinParams.CATH, '70000.*')]:
+        results = []
+        for features in [frozenset(), frozenset({CLASS_CODE})]:
+            builder = PyComSQLQueryBuilder(features=features)
+            builder.add_constraint(constraint, param)
+            builder.add_column('uniprot_id')
+            results.append(conn.execute(*builder.build()).fetchall())
+        assert results[0] == results[1], param
+
+
+def test_class_counts():
+    conn = _create_db()
+
+    for class_code in [False, True]:
+        counts = conn.execute(*class_counts_query([3, 40], 'cath', class_code=class_code)).fetchall()
+        assert [(decode_class(code), count) for code, count in counts] == [([3, 40, 1], 1), ([3, 40, 50], 1)]
+
+        counts = conn.execute(*class_counts_query([2, 7, 11], 'enzyme', class_code=class_code)).fetchall()
+        assert [(decode_class(code), count) for code, count in counts] == [([2, 7, 11], 1), ([2, 7, 11, 1], 1)]
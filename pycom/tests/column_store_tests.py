@@ -0,0 +1,54 @@
+import sqlite3
+
+import numpy as np
+
+from pycom import ProteinParams
+from pycom.sql.column_store import EntryColumnStore
+
+
+def _create_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE entry (entryId TEXT PRIMARY KEY, sequenceLength INTEGER, structHelix REAL, '
+                 'structTurn REAL, structStrand REAL, organismId INTEGER)')
+    conn.executemany('INSERT INTO entry VALUES (?, ?, ?, ?, ?, ?)', [
+        ('P01111', 100, 0.5, 0.1, 0.2, 9606),
+        ('P02222', 200, 0.2, None, 0.4, 10090),
+        ('P03333', 300, 0.8, 0.3, 0.1, 9606),
+    ])
+    conn.commit()
+    return conn
+
+
+def test_column_store_mask(tmp_path):
+    db_path = str(tmp_path / 'pycom.db')
+    conn = _create_db(db_path)
+    store = EntryColumnStore(lambda: conn)
+
+    mask = store.mask({ProteinParams.MIN_LENGTH: '150', ProteinParams.ORGANISM_ID: 9606})
+    assert store.rowids[mask].tolist() == [3]
+
+    assert store.mask({ProteinParams.MIN_HELIX: 0.5}).tolist() == [True, False, True]
+    assert store.mask({ProteinParams.MAX_TURN: 1}).tolist() == [True, False, True]  # NULL never matches
+
+
+def test_column_store_sidecar(tmp_path):
+    db_path = str(tmp_path / 'pycom.db')
+    conn = _create_db(db_path)
+    path = str(tmp_path / 'pycom.columns.npy')
+
+    store = EntryColumnStore(lambda: conn, path=path, db_path=db_path)
+    assert isinstance(store.columns, np.memmap)
+
+    reloaded = EntryColumnStore(lambda: conn, path=path, db_path=db_path)
+    assert reloaded.mask({ProteinParams.MAX_LENGTH: 200}).tolist() == [True, True, False]
+
+
+
+def test_column_store_snapshot(tmp_path):
+    conn = _create_db(str(tmp_path / 'pycom.db'))
+    store = EntryColumnStore(lambda: conn)
+
+    columns, rowids = store.snapshot()
+    store.clear()  # e.g. the database changed, a snapshot that was taken before stays usable
+    assert rowids[store.mask({ProteinParams.MIN_LENGTH: 150}, columns)].tolist() == [2, 3]
+    assert store.snapshot()[0] is not columns  # reloaded
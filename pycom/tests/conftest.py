@@ -0,0 +1,71 @@
+import sqlite3
+
+# noinspection PyPackageRequirements
+import pytest
+
+_ORGANISMS = [
+    (9606, 'Homo sapiens', 'Human', 'cellular organisms:Eukaryota:Metazoa:Chordata:Mammalia:Primates:Homo sapiens'),
+    (10090, 'Mus musculus', 'Mouse', 'cellular organisms:Eukaryota:Metazoa:Chordata:Mammalia:Rodentia:Mus musculus'),
+    (562, 'Escherichia coli', 'E. coli', 'cellular organisms:Bacteria:Proteobacteria:Escherichia coli'),
+]
+_DISEASES = [('DI-00001', 'Breast cancer'), ('DI-00002', 'Lung Cancer'), ('DI-00003', 'Epilepsy'),
+             ('DI-00004', 'Ulcer')]
+_COFACTORS = [('CHEBI:29105', 'Zn(2+)'), ('CHEBI:57692', 'FAD'), ('CHEBI:18420', 'Mg(2+)')]
+_KEYWORDS = [('Apoptosis', 'Biological process'), ('Nucleus', 'Cellular component'), ('Zinc-finger', 'Domain'),
+             ('Zinc', 'Ligand'), ('Kinase', 'Molecular function'), ('Phosphoprotein', 'PTM'),
+             ('Acetylation', 'PTM'), ('Early protein', 'Developmental stage')]
+
+
+def create_pycom_db(path: str, entries: int = 60):
+    """A small pycom.db with every table, filled deterministically"""
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE entry (entryId TEXT PRIMARY KEY, neff REAL, sequenceLength INTEGER, sequence TEXT,
+                            organismId INTEGER, structHelix REAL, structTurn REAL, structStrand REAL,
+                            hasPTM INTEGER, hasPDB INTEGER, hasSubstrate INTEGER);
+        CREATE TABLE organism (organismId INTEGER PRIMARY KEY, nameScientific TEXT, nameCommon TEXT, taxonomy TEXT,
+                               taxonomyFull TEXT);
+        CREATE TABLE disease (diseaseId TEXT PRIMARY KEY, diseaseName TEXT);
+        CREATE TABLE disease_entry (entryId TEXT, diseaseId TEXT);
+        CREATE TABLE cofactor (cofactorId TEXT PRIMARY KEY, cofactorName TEXT);
+        CREATE TABLE cofactor_entry (entryId TEXT, cofactorId TEXT);
+        CREATE TABLE keyword (keywordName TEXT, keywordCategory TEXT);
+        CREATE TABLE keyword_entry (entryId TEXT, keywordName TEXT, keywordCategory TEXT);
+        CREATE TABLE cath_class (entryId TEXT, cath_1 INTEGER, cath_2 INTEGER, cath_3 INTEGER, cath_4 INTEGER);
+        CREATE TABLE enzyme_class (entryId TEXT, enzyme_1 INTEGER, enzyme_2 INTEGER, enzyme_3 INTEGER,
+                                   enzyme_4 INTEGER);
+        CREATE TABLE experimentPDB (entryId TEXT, pdbId TEXT);
+        CREATE TABLE substrate (entryId TEXT, substrateName TEXT);
+    ''')
+    conn.executemany('INSERT INTO organism VALUES (?, ?, ?, ?, ?)',
+                     [(i, scientific, common, lineage.split(':', 1)[1], lineage)
+                      for i, scientific, common, lineage in _ORGANISMS])
+    conn.executemany('INSERT INTO disease VALUES (?, ?)', _DISEASES)
+    conn.executemany('INSERT INTO cofactor VALUES (?, ?)', _COFACTORS)
+    conn.executemany('INSERT INTO keyword VALUES (?, ?)', _KEYWORDS)
+
+    for i in range(entries):
+        entry_id = f'P{i:05d}'
+        sequence = 'MTTDD' + 'ACDEFGHIKLMNPQRSTVWY'[i % 20] * (i % 7 + 1)
+        conn.execute('INSERT INTO entry VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                     (entry_id, i * 1.5, len(sequence), sequence, _ORGANISMS[i % 3][0],
+                      (i % 10) / 10, (i % 4) / 10, (i % 5) / 10, i % 2, i % 3 == 0, i % 5 == 0))
+        if i % 4 == 0:
+            conn.execute('INSERT INTO disease_entry VALUES (?, ?)', (entry_id, _DISEASES[i % 3][0]))
+        if i % 6 == 0:
+            conn.execute('INSERT INTO disease_entry VALUES (?, ?)', (entry_id, _DISEASES[3][0]))
+        if i % 3 == 1:
+            conn.execute('INSERT INTO cofactor_entry VALUES (?, ?)', (entry_id, _COFACTORS[i % 2][0]))
+        for keyword, category in _KEYWORDS[i % 5:i % 5 + 3]:
+            conn.execute('INSERT INTO keyword_entry VALUES (?, ?, ?)', (entry_id, keyword, category))
+        conn.execute('INSERT INTO cath_class VALUES (?, ?, ?, ?, ?)', (entry_id, i % 3 + 1, 10, i % 4, i))
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def pycom_db(tmp_path) -> str:
+    """Path to a small pycom.db, see create_pycom_db()"""
+    path = str(tmp_path / 'pycom.db')
+    create_pycom_db(path)
+    return path
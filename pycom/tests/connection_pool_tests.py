@@ -0,0 +1,87 @@
+import sqlite3
+import threading
+
+# noinspection PyPackageRequirements
+import pytest
+
+from pycom.interface.connection_pool import DEFAULT_PROFILE, PyComConnectionPool, get_valid_profile, profile_from_env
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'pycom.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE entry (entryId TEXT PRIMARY KEY)')
+    conn.execute("INSERT INTO entry VALUES ('P01111')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_connection_per_thread(db_path):
+    pool = PyComConnectionPool(db_path)
+    main_conn = pool.connection()
+    assert pool.connection() is main_conn
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(pool.connection()))
+    thread.start()
+    thread.join()
+
+    assert other[0] is not main_conn
+    assert other[0].execute('SELECT COUNT(*) FROM entry').fetchone()[0] == 1
+
+    pool.close()
+
+
+def test_read_only(db_path):
+    pool = PyComConnectionPool(db_path)
+    with pytest.raises(sqlite3.OperationalError):
+        pool.connection().execute("INSERT INTO entry VALUES ('P02222')")
+    pool.close()
+
+
+def test_reconnect_after_close(db_path):
+    pool = PyComConnectionPool(db_path)
+    conn = pool.connection()
+    pool.close()
+
+    assert pool.connection() is not conn
+    assert pool.connection().execute('SELECT entryId FROM entry').fetchone()[0] == 'P01111'
+    pool.close()
+
+
+def test_valid_profile():
+    assert get_valid_profile() == DEFAULT_PROFILE
+    assert get_valid_profile({'temp_store': 'file', 'mmap_size': '0'}) == \
+        {**DEFAULT_PROFILE, 'temp_store': 'FILE', 'mmap_size': 0}
+
+    for invalid in [{'page_size': 4096}, {'temp_store': 'disk'}, {'mmap_size': -1}, {'cache_size': 'large'}]:
+        with pytest.raises(AssertionError):
+            get_valid_profile(invalid)
+
+
+def test_profile_from_env():
+    assert profile_from_env({}) == DEFAULT_PROFILE
+    assert profile_from_env({'PYCOM_DB_IMMUTABLE': 'yes', 'PYCOM_DB_MMAP_SIZE': '0', 'PYCOM_DB_CACHE_SIZE': '-1024',
+                             'PYCOM_DB_TEMP_STORE': 'memory', 'UNRELATED': 'x'}) == \
+        {'immutable': True, 'mmap_size': 0, 'cache_size': -1024, 'temp_store': 'MEMORY'}
+
+    for invalid in [{'PYCOM_DB_TEMP_STORE': 'ram'}, {'PYCOM_DB_IMMUTABLE': 'maybe'}, {'PYCOM_DB_MMAP_SIZE': '1GB'}]:
+        with pytest.raises(AssertionError):
+            profile_from_env(invalid)
+
+
+def test_profile_applied(db_path):
+    pool = PyComConnectionPool(db_path, profile={'immutable': True, 'cache_size': -1024, 'temp_store': 'FILE'})
+    conn = pool.connection()
+
+    assert conn.execute('PRAGMA cache_size').fetchone()[0] == -1024
+    assert conn.execute('PRAGMA temp_store').fetchone()[0] == 1  # 0 = DEFAULT, 1 = FILE, 2 = MEMORY
+    assert conn.execute('SELECT COUNT(*) FROM entry').fetchone()[0] == 1
+    pool.close()
+
+    pool = PyComConnectionPool(db_path, profile={'mmap_size': 0})
+    assert pool.connection().execute('PRAGMA mmap_size').fetchone()[0] == 0
+    assert pool.connection().execute('PRAGMA temp_store').fetchone()[0] == 2
+    pool.close()
@@ -0,0 +1,41 @@
+import shutil
+import sqlite3
+
+from pycom import ProteinParams
+from pycom.interface import PyComLocal
+from pycom.sql import PyComSQLQueryBuilder
+from pycom.sql.features import FTS5
+from pycom.sql.fts_index import create_fts_indexes
+
+_QUERIES = [
+    (ProteinParams.DISEASE, 'cancer'), (ProteinParams.DISEASE, 'CANCER'), (ProteinParams.DISEASE, 'c'),
+    (ProteinParams.DISEASE, 'ul'), (ProteinParams.DISEASE, 'no such disease'), (ProteinParams.COFACTOR, 'zn(2'),
+    (ProteinParams.COFACTOR, 'Mg'), (ProteinParams.ORGANISM, 'MAMMALIA'), (ProteinParams.ORGANISM, 'co'),
+    (ProteinParams.PTM, 'ph'), (ProteinParams.PTM, 'PHOSPHO'), (ProteinParams.DOMAIN, 'Zinc'),
+    (ProteinParams.LIGAND, 'zinc'), (ProteinParams.BIOLOGICAL_PROCESS, 'a'),
+]
+
+
+def test_fts_same_results(pycom_db, tmp_path):
+    fts_db = str(tmp_path / 'pycom_fts.db')
+    shutil.copy(pycom_db, fts_db)
+    conn = sqlite3.connect(fts_db)
+    create_fts_indexes(conn)
+
+    for constraint, value in _QUERIES:  # the indexed constraints, without resolving them first
+        results = []
+        for features in [frozenset(), frozenset({FTS5})]:
+            builder = PyComSQLQueryBuilder(features=features)
+            builder.add_constraint(constraint, value)
+            builder.add_column('uniprot_id')
+            results.append(conn.execute(*builder.build()).fetchall())
+        assert results[0] == results[1], (constraint, value)
+    conn.close()
+
+    with PyComLocal(db_path=pycom_db) as plain, PyComLocal(db_path=fts_db) as indexed:
+        assert FTS5 not in plain.features and FTS5 in indexed.features
+
+        for constraint, value in _QUERIES:
+            expected = plain.find({constraint: value}, columns=['uniprot_id'])['uniprot_id'].tolist()
+            assert indexed.find({constraint: value}, columns=['uniprot_id'])['uniprot_id'].tolist() == expected
+        assert len(plain.find(disease='cancer')) > 0
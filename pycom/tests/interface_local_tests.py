@@ -0,0 +1,84 @@
+import h5py
+import numpy as np
+import pandas as pd
+
+from pycom.interface import PyComLocal
+from pycom.util.format_util import md5_hash
+
+
+def test_find_many(pycom_db):
+    with PyComLocal(db_path=pycom_db) as pyc:
+        queries = [{'disease_id': 'DI-00001'}, {'has_pdb': True}, {'disease': 'no such disease'}, {'cofactor': 'FAD'}]
+        df = pyc.find_many(queries, columns=['uniprot_id'])
+
+        assert list(df.columns) == ['query_idx', 'uniprot_id']
+        for query_idx, query in enumerate(queries):
+            expected = pyc.find(query, columns=['uniprot_id'])['uniprot_id'].tolist()
+            assert df[df['query_idx'] == query_idx]['uniprot_id'].tolist() == expected
+        assert 2 not in df['query_idx'].tolist()  # no results
+
+        limited = pyc.find_many(queries, per_page=3, columns=['uniprot_id'])
+        assert limited.groupby('query_idx').size().to_dict() == {0: 3, 1: 3, 3: 3}
+
+        empty = pyc.find_many([{'disease': 'no such disease'}], columns=['uniprot_id'])
+        assert len(empty) == 0 and 'query_idx' in empty
+        assert len(pyc.find_many([])) == 0
+
+
+def test_iter_find(pycom_db):
+    with PyComLocal(db_path=pycom_db) as pyc:
+        expected = pyc.find(has_pdb=True)  # 20 entries
+
+        chunks = list(pyc.iter_find(has_pdb=True, chunk_size=7))
+        assert [len(chunk) for chunk in chunks] == [7, 7, 6]
+
+        combined = pd.concat(chunks, ignore_index=True)
+        assert combined.drop(columns=['matrix']).equals(expected.drop(columns=['matrix']))
+        assert list(combined.columns) == list(expected.columns)
+
+        assert list(pyc.iter_find(disease='no such disease')) == []
+
+
+def test_get_many(pycom_db, tmp_path):
+    mat_path = str(tmp_path / 'pycom.mat')
+    with PyComLocal(db_path=pycom_db) as pyc:
+        sequence = pyc.get('P00003')['sequence']
+    with h5py.File(mat_path, 'w') as f:
+        f.create_dataset(md5_hash(sequence), data=np.eye(len(sequence), dtype=np.float32))
+
+    with PyComLocal(db_path=pycom_db, mat_path=mat_path, compact_dtypes=False) as pyc:
+        ids = ['P00010', 'P99999', 'P00003', 'P00010']
+        records = pyc.get_many(ids)
+
+        assert [record and record['uniprot_id'] for record in records] == ['P00010', None, 'P00003', 'P00010']
+        assert records[0] == records[3]  # duplicate IDs
+        assert records[2] == pyc.find(uniprot_id='P00003').drop(columns=['matrix']).to_dict(orient='records')[0]
+        assert (records[2]['has_ptm'], records[2]['has_pdb'], records[2]['has_substrate']) == (True, True, False)
+        assert all(type(records[2][flag]) is bool for flag in ['has_ptm', 'has_pdb', 'has_substrate'])
+        assert pyc.get('P99999') is None
+        assert pyc.get_many([]) == []
+
+        with_matrix = pyc.get_many(['P00003', 'P00010', 'P00003'], matrix=True)
+        assert with_matrix[0]['matrix'].shape == (len(sequence), len(sequence))
+        assert with_matrix[1]['matrix'] is None
+        assert (with_matrix[2]['matrix'] == with_matrix[0]['matrix']).all()
+
+
+def test_in_memory_indexes(pycom_db):
+    queries = [{'has_pdb': True, 'min_length': 8}, {'cath': '2.*', 'organism_id': 9606, 'disease': 'cancer'},
+               {'has_ptm': False, 'max_helix': 0.3}, {'ptm': 'phospho', 'min_length': 1}]
+
+    with PyComLocal(db_path=pycom_db) as plain, PyComLocal(db_path=pycom_db, index='bitmap', columnar=True) as pyc:
+        for query in queries:
+            expected = plain.find(query, columns=['uniprot_id'])['uniprot_id'].tolist()
+            assert pyc.find(query, columns=['uniprot_id'])['uniprot_id'].tolist() == expected
+            assert pyc.count(query) == plain.count(query) == len(expected)
+
+
+def test_count_in_memory_fraction(pycom_db):
+    with PyComLocal(db_path=pycom_db, index='bitmap') as pyc:
+        # has_ptm=False matches half of the entries: counted from the bitmap alone, but not bound as rowids
+        assert pyc._apply_indexes({'has_ptm': False}, count=True)[1] is not None
+        assert pyc._apply_indexes({'has_ptm': False, 'disease': 'cancer'}, count=True) == \
+            ({'has_ptm': False, 'disease': 'cancer'}, None)
+        assert pyc.count(has_ptm=False, disease='cancer') == len(pyc.find(has_ptm=False, disease='cancer'))
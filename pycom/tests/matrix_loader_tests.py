@@ -0,0 +1,108 @@
+import h5py
+import numpy as np
+
+from pycom.interface._find_helper import CoevolutionMatrixLoader, _storage_offset, matrix_cache
+from pycom.selector import MatrixFormat
+from pycom.util.format_util import md5_hash
+
+
+def test_matrix_loader_reuses_file(tmp_path):
+    mat_path = str(tmp_path / 'pycom.mat')
+    with h5py.File(mat_path, 'w') as f:
+        f.create_dataset(md5_hash('MTTDD'), data=np.eye(5, dtype=np.float32))
+
+    with CoevolutionMatrixLoader(mat_path, rdcc_nbytes=1 << 20, rdcc_nslots=521) as cml:
+        assert cml.load_coevolution_matrix('MTTDD').shape == (5, 5)
+        assert cml.load_coevolution_matrix('MAAAA') is None
+
+        mat_db = cml.mat_db
+        assert cml.load_coevolution_matrix('MTTDD', MatrixFormat.PANDAS).shape == (5, 5)
+        assert cml.mat_db is mat_db  # opened once
+
+    assert not mat_db  # closed on exit
+    assert cml.load_coevolution_matrix('MTTDD').shape == (5, 5)  # reopened
+    cml.close()
+
+
+def test_matrix_loader_cache(tmp_path):
+    mat_path = str(tmp_path / 'pycom.mat')
+    with h5py.File(mat_path, 'w') as f:
+        f.create_dataset(md5_hash('MTTDD'), data=np.eye(5, dtype=np.float32))
+        f.create_dataset(md5_hash('MAAAA'), data=np.ones((10, 10), dtype=np.float32))
+
+    cache = matrix_cache(max_bytes=450)
+    with CoevolutionMatrixLoader(mat_path, cache=cache) as cml:
+        matrix = cml.load_coevolution_matrix('MTTDD')
+        matrix[0, 0] = 2  # callers get a copy, the cached matrix is not modified
+        assert cml.load_coevolution_matrix('MTTDD')[0, 0] == 1
+        assert cache.stats()['hits'] == 1
+
+        cml.load_coevolution_matrix('MAAAA')  # 400 bytes, evicts the 100 bytes of MTTDD
+        assert cache.stats()['evictions'] == 1
+        assert cache.stats()['bytes'] == 400
+
+
+def test_matrix_loader_workers(tmp_path):
+    mat_path = str(tmp_path / 'pycom.mat')
+    sequences = [f'M{"A" * i}' for i in range(1, 21)]
+    with h5py.File(mat_path, 'w') as f:
+        for i, sequence in enumerate(sequences[::2]):
+            f.create_dataset(md5_hash(sequence), data=np.full((3, 3), i, dtype=np.float32))
+
+    with CoevolutionMatrixLoader(mat_path, cache=matrix_cache(1 << 20)) as cml:
+        expected = [cml.load_coevolution_matrix(sequence) for sequence in sequences]
+
+    for executor in ['thread', 'process']:
+        with CoevolutionMatrixLoader(mat_path, cache=matrix_cache(1 << 20)) as cml:
+            matrices = cml.load_coevolution_matrices(sequences + sequences, workers=2, executor=executor)
+
+        for matrix, expected_matrix in zip(matrices, expected + expected):
+            assert (matrix is None and expected_matrix is None) or (matrix == expected_matrix).all()
+
+
+def test_matrix_loader_storage_order(tmp_path):
+    mat_path = str(tmp_path / 'pycom.mat')
+    sequences = [f'M{"T" * i}' for i in range(1, 31)]
+    with h5py.File(mat_path, 'w') as f:
+        for i, sequence in enumerate(sequences):
+            chunks = (2, 2) if i % 2 else None  # the file mixes chunked and contiguous datasets
+            f.create_dataset(md5_hash(sequence), data=np.full((4, 4), i, dtype=np.float32), chunks=chunks)
+
+    shuffled = sequences[::-1][::3] + ['MAAAA'] + sequences[1::4]
+    with CoevolutionMatrixLoader(mat_path) as cml:
+        datasets = cml._storage_order([md5_hash(sequence) for sequence in shuffled])
+        offsets = [dataset.id.get_offset() or dataset.id.get_chunk_info(0).byte_offset
+                   for _, dataset in datasets if dataset is not None]
+        assert offsets == sorted(offsets)
+        assert datasets[0][1] is None  # not found
+
+        matrices = cml.load_coevolution_matrices(shuffled)
+        for sequence, matrix in zip(shuffled, matrices):
+            expected = cml.load_coevolution_matrix(sequence)
+            assert (matrix is None and expected is None) or (matrix == expected).all()
+
+
+def test_matrix_loader_executors_kept(tmp_path):
+    mat_path = str(tmp_path / 'pycom.mat')
+    with h5py.File(mat_path, 'w') as f:
+        f.create_dataset(md5_hash('MTTDD'), data=np.eye(5, dtype=np.float32))
+
+    with CoevolutionMatrixLoader(mat_path) as cml:
+        pool = cml._get_executor('thread', 2)
+        cml.load_coevolution_matrices(['MTTDD'], workers=3)  # other settings, e.g. from another thread
+
+        assert cml._get_executor('thread', 2) is pool  # not shut down while it may still be in use
+        assert pool.submit(len, 'MTTDD').result() == 5
+    assert cml._executors == {}
+
+
+def test_storage_offset_unavailable():
+    class _OldDatasetID:  # h5py < 2.10, or built against HDF5 < 1.10.5: no get_chunk_info() / get_num_chunks()
+        pass
+
+    class _Dataset:
+        chunks = (2, 2)
+        id = _OldDatasetID()
+
+    assert _storage_offset(_Dataset()) == -1
+    assert _storage_offset(None) == -1
@@ -0,0 +1,30 @@
+import sqlite3
+
+from pycom import ProteinParams
+from pycom.sql.optimize import _FULL_SCAN, _INDEXES, _index_name, check_query_plans, create_indexes
+
+
+def test_full_scan_pattern():
+    assert _FULL_SCAN.match('SCAN entry')
+    assert _FULL_SCAN.match('SCAN TABLE entry')  # SQLite < 3.36
+    assert _FULL_SCAN.match('SCAN organism USING COVERING INDEX pycom_idx_organism_taxonomyFull_organismId')
+    assert _FULL_SCAN.match('SCAN TABLE entry USING INDEX pycom_idx_entry_hasPDB')
+    assert not _FULL_SCAN.match('SEARCH entry USING INDEX pycom_idx_entry_sequenceLength (sequenceLength>?)')
+
+
+def test_create_indexes(pycom_db):
+    conn = sqlite3.connect(pycom_db)
+    before = check_query_plans(conn)
+    assert before[ProteinParams.MIN_LENGTH] == ['SCAN entry']
+    assert before[ProteinParams.PTM] == ['SCAN keyword_entry']
+
+    create_indexes(conn)
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {_index_name(table, columns) for table, columns in _INDEXES} <= indexes
+
+    after = check_query_plans(conn)
+    for constraint in [ProteinParams.MIN_LENGTH, ProteinParams.HAS_PDB, ProteinParams.ORGANISM_ID]:
+        assert constraint not in after
+    assert 'SCAN keyword_entry' not in after.get(ProteinParams.PTM, [])
+    assert after[ProteinParams.ORGANISM][-1].startswith('SCAN organism USING COVERING INDEX')  # LIKE '%term%'
+    conn.close()
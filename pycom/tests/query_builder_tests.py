@@ -0,0 +1,220 @@
+import json
+import sqlite3
+
+import pandas as pd
+# noinspection PyPackageRequirements
+import pytest
+
+from pycom import ProteinParams
+from pycom.interface._find_helper import get_next_cursor, get_page_bounds, rows_to_df
+from pycom.sql.features import FTS5
+from pycom.sql.fts_index import create_fts_indexes
+from pycom.sql.query_builder import PyComSQLQueryBuilder
+from pycom.sql.vocabulary import VocabularyResolver
+from pycom.util.format_util import encode_cursor, decode_cursor
+
+
+def test_build_limit():
+    builder = PyComSQLQueryBuilder()
+    builder.add_constraint(ProteinParams.MIN_LENGTH, 100)
+    builder.set_limit(10, 20)
+    query, params = builder.build()
+
+    assert 'LIMIT ? OFFSET ?' in query
+    assert params == [100, 10, 20]
+
+
+def test_build_count():
+    builder = PyComSQLQueryBuilder()
+    builder.add_constraint(ProteinParams.CATH, '1.2.*.*')
+    query, params = builder.build_count()
+
+    assert 'COUNT(*)' in query
+    assert 'LIMIT' not in query
+    assert params == [1, 2]
+
+
+def test_page_bounds():
+    assert get_page_bounds(None, None) == (None, 0)
+    assert get_page_bounds(1, 10) == (10, 0)
+    assert get_page_bounds(3, 10) == (10, 20)
+    assert get_page_bounds(2, None) == (100, 100)
+    assert get_page_bounds(None, 5) == (5, 0)
+
+    with pytest.raises(ValueError):
+        get_page_bounds(0, 10)
+    with pytest.raises(ValueError):
+        get_page_bounds(1, 0)
+
+
+def test_build_after():
+    builder = PyComSQLQueryBuilder()
+    builder.add_constraint(ProteinParams.HAS_PDB, True)
+    builder.set_limit(10)
+    builder.set_after('P01111')
+    query, params = builder.build()
+
+    assert 'entry.entryId > ?' in query
+    assert params == [True, 'P01111', 10, 0]
+
+
+def test_cursor():
+    assert decode_cursor(encode_cursor('P01111')) == 'P01111'
+
+    with pytest.raises(AssertionError):
+        decode_cursor('not a cursor')
+
+
+def test_next_cursor():
+    df = pd.DataFrame({'uniprot_id': ['P01111', 'P02222', 'P03333']})
+
+    page, cursor = get_next_cursor(df, limit=2)  # selected with limit + 1 rows
+    assert page['uniprot_id'].tolist() == ['P01111', 'P02222']
+    assert decode_cursor(cursor) == 'P02222'
+
+    page, cursor = get_next_cursor(df, limit=3)  # ends exactly on the page boundary, no empty next page
+    assert len(page) == 3 and cursor is None
+
+
+def test_build_columns():
+    builder = PyComSQLQueryBuilder()
+    builder.add_columns(['uniprot_id', 'sequence_length', 'uniprot_id'])
+    query, _ = builder.build()
+
+    assert 'entryId, sequenceLength' in query
+    assert 'sequence,' not in query
+
+    with pytest.raises(AssertionError):
+        builder.add_column('entryId')  # database column names are not valid, only DataFrame columns
+
+
+def test_build_indexed_variant():
+    builder = PyComSQLQueryBuilder()
+    builder.add_constraint(ProteinParams.DISEASE, 'cancer')
+    assert 'pycom_fts_disease' not in builder.build()[0]
+
+    builder = PyComSQLQueryBuilder(features=frozenset({FTS5}))
+    builder.add_constraint(ProteinParams.DISEASE, 'cancer')
+    query, params = builder.build()
+    assert 'pycom_fts_disease' in query
+    assert params == ['%cancer%']
+
+
+class _StaticResolver:
+    def __init__(self, ids):
+        self.ids = ids
+
+    def resolve(self, *_, **__):
+        return self.ids
+
+
+def test_build_two_phase():
+    builder = PyComSQLQueryBuilder(resolver=_StaticResolver(('DI-00001', 'DI-00002')))
+    builder.add_constraint(ProteinParams.DISEASE, 'cancer')
+    query, params = builder.build()
+
+    assert 'disease_entry.diseaseId IN (?, ?)' in query
+    assert 'LIKE' not in query
+    assert params == ['DI-00001', 'DI-00002']
+
+    builder = PyComSQLQueryBuilder(resolver=_StaticResolver(()))
+    builder.add_constraint(ProteinParams.HAS_PDB, True)
+    builder.add_constraint(ProteinParams.DISEASE, 'no such disease')
+    query, params = builder.build()
+
+    assert query.index('0=1') < query.index('entry.hasPDB')
+    assert params == [True]
+
+
+def test_build_selectivity_order():
+    builder = PyComSQLQueryBuilder()
+    builder.add_constraint(ProteinParams.HAS_PDB, True)
+    builder.add_constraint(ProteinParams.ID, 'P01111')
+    query, params = builder.build()
+
+    assert query.index('entry.entryId = ?') < query.index('entry.hasPDB = ?')
+    assert params == ['P01111', True]
+
+
+def test_build_same_shape():
+    builder = PyComSQLQueryBuilder()
+    builder.add_constraints({ProteinParams.MIN_LENGTH: 100, ProteinParams.ORGANISM_ID: 9606})
+    query, params = builder.build()
+
+    other = PyComSQLQueryBuilder()
+    other.add_constraints({ProteinParams.ORGANISM_ID: 10090, ProteinParams.MIN_LENGTH: 50})
+    other_query, other_params = other.build()
+
+    assert query is other_query  # compiled once, reused for the same shape
+    assert params == [9606, 100]
+    assert other_params == [10090, 50]
+
+    deeper = PyComSQLQueryBuilder()
+    deeper.add_constraints({ProteinParams.CATH: '1.2.3.*', ProteinParams.HAS_DISEASE: False})
+    assert deeper.build()[0] != query
+
+
+def test_build_id_list():
+    builder = PyComSQLQueryBuilder()
+    builder.add_constraint(ProteinParams.ID, ['P02222', 'P01111', 'P02222'])
+    builder.add_constraint(ProteinParams.MIN_LENGTH, 100)
+    query, params = builder.build()
+
+    assert 'entry.entryId IN (?, ?)' in query
+    assert params == ['P01111', 'P02222', 100]
+
+    bulk = PyComSQLQueryBuilder()
+    bulk.add_constraint(ProteinParams.SEQUENCE, (f'mtt{i}' for i in range(1000)))
+    query, params = bulk.build()
+
+    assert 'json_each(?)' in query
+    assert len(params) == 1 and json.loads(params[0])[0] == 'MTT0'
+
+
+def test_rows_to_df_compact():
+    rows = [('P01111', 10.5, 120, 9606, 1), ('P02222', None, None, 10090, 0)]
+    columns = ['uniprot_id', 'neff', 'sequence_length', 'organism_id', 'has_pdb']
+    df = rows_to_df(rows, columns, compact_dtypes=True)
+
+    assert str(df['neff'].dtype) == 'float32'
+    assert str(df['sequence_length'].dtype) == 'Int32'  # contains NULL, nullable instead of int32
+    assert str(df['organism_id'].dtype) == 'category'
+    assert df['has_pdb'].tolist() == [True, False]
+
+    assert list(rows_to_df([], columns, compact_dtypes=True).columns) == columns
+
+
+def test_build_rowids():
+    builder = PyComSQLQueryBuilder()
+    builder.add_constraint(ProteinParams.MIN_LENGTH, 100)
+    builder.set_rowids([3, 1, 2])
+    query, params = builder.build()
+
+    assert 'entry.rowid IN (SELECT value FROM json_each(?))' in query
+    assert params == ['[3, 1, 2]', 100]
+
+    query, params = PyComSQLQueryBuilder().build_rowids()
+    assert 'SELECT\n    entry.rowid' in query
+    assert params == []
+
+
+def test_keyword_resolve_vocabulary():
+    conn = sqlite3.connect(':memory:')
+    conn.executescript('CREATE TABLE organism (organismId INTEGER PRIMARY KEY, taxonomyFull TEXT);'
+                       'CREATE TABLE disease (diseaseId TEXT PRIMARY KEY, diseaseName TEXT);'
+                       'CREATE TABLE cofactor (cofactorId TEXT PRIMARY KEY, cofactorName TEXT);'
+                       'CREATE TABLE keyword (keywordName TEXT, keywordCategory TEXT);')
+    conn.executemany('INSERT INTO keyword VALUES (?, ?)',
+                     [('Phosphoprotein', 'PTM'), ('Acetylation', 'PTM'), ('Phosphate', 'Ligand')])
+    resolver = VocabularyResolver(lambda: conn)  # keywords resolve against the keyword table, not keyword_entry
+
+    for features in [frozenset(), frozenset({FTS5})]:
+        if FTS5 in features:
+            create_fts_indexes(conn)
+        builder = PyComSQLQueryBuilder(features=features, resolver=resolver)
+        builder.add_constraint(ProteinParams.PTM, 'PHOSPHO')
+        query, params = builder.build()
+
+        assert 'keyword_entry.keywordName IN (?)' in query
+        assert params == ['Phosphoprotein']
+        resolver.clear()
@@ -0,0 +1,44 @@
+import pandas as pd
+
+from pycom import ProteinParams
+from pycom.interface._find_helper import get_canonical_constraints
+from pycom.util.lru_cache import ByteLRUCache, sizeof
+
+
+def test_canonical_constraints():
+    assert get_canonical_constraints({'cath': '1.*'}) == get_canonical_constraints({'cath': '1.*.*.*'})
+    assert get_canonical_constraints({'disease': 'Cancer', 'min_length': '100'}) == \
+        get_canonical_constraints({ProteinParams.MIN_LENGTH: 100, ProteinParams.DISEASE: 'cancer'})
+    assert get_canonical_constraints({'cath': '1.*'}) != get_canonical_constraints({'cath': '1.2.*.*'})
+
+
+def test_lru_eviction():
+    cache = ByteLRUCache(max_bytes=300, size_function=lambda _: 100)
+    for key in 'abc':
+        cache.put(key, key)
+
+    assert cache.get('a') == 'a'  # a is now the most recently used
+    cache.put('d', 'd')
+
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in 'acd'] == ['a', 'c', 'd']
+    assert cache.stats() == {'hits': 4, 'misses': 1, 'evictions': 1, 'entries': 3, 'bytes': 300, 'max_bytes': 300}
+
+
+def test_lru_too_large():
+    cache = ByteLRUCache(max_bytes=100)
+    cache.put('df', pd.DataFrame({'sequence': ['MTTDD' * 100] * 10}))
+    assert len(cache) == 0
+
+    disabled = ByteLRUCache(max_bytes=0)
+    disabled.put('count', 1)
+    assert disabled.get('count') is None
+
+
+def test_sizeof_estimate():
+    df = pd.DataFrame({'sequence': ['MTTDD' * 100] * 100, 'length': range(100), 'matrix': [None] * 100})
+    for dtype in [object, 'string']:
+        df['sequence'] = df['sequence'].astype(dtype)
+        deep = df.memory_usage(index=True, deep=True).sum()
+        assert abs(sizeof(df) - deep) < deep * 0.05
+        assert sizeof(df, limit=1) < deep * 0.1  # stops after the shallow memory use
@@ -0,0 +1,23 @@
+import sqlite3
+
+from pycom import ProteinParams
+from pycom.sql import PyComSQLQueryBuilder
+from pycom.sql.features import SEQUENCE_MD5
+from pycom.sql.sequence_index import create_sequence_index
+
+
+def test_sequence_md5_constraint():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE entry (entryId TEXT PRIMARY KEY, sequence TEXT)')
+    conn.executemany('INSERT INTO entry VALUES (?, ?)', [(f'P{i:05d}', 'MA' + 'K' * (i % 700)) for i in range(1000)])
+    create_sequence_index(conn)
+
+    sequences = ['MAKK', 'mak', 'MTTDD', ['MAK', 'MAKKK', 'MTTDD'], ['MA' + 'K' * i for i in range(600)]]
+    for sequence in sequences:
+        results = []
+        for features in [frozenset(), frozenset({SEQUENCE_MD5})]:
+            builder = PyComSQLQueryBuilder(features=features)
+            builder.add_constraint(ProteinParams.SEQUENCE, sequence)
+            builder.add_column('uniprot_id')
+            results.append(conn.execute(*builder.build()).fetchall())
+        assert results[0] == results[1]
@@ -0,0 +1,78 @@
+import importlib
+import os
+import sys
+
+# noinspection PyPackageRequirements
+import pytest
+
+pytest.importorskip('flask_caching')
+pytest.importorskip('flask_parameter_validation')
+
+_SERVER_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'server')
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    from pycom.interface import _find_helper
+    from pycom.tests.conftest import create_pycom_db
+
+    tmp_path = tmp_path_factory.mktemp('server')
+    create_pycom_db(str(tmp_path / 'pycom.db'))
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv('PYCOM_DB_PATH', str(tmp_path / 'pycom.db'))
+        monkeypatch.setenv('PYCOM_MAT_PATH', str(tmp_path / 'pycom.mat'))
+        monkeypatch.setenv('PYCOM_SIMILARITY_PATH', str(tmp_path / 'pycom.minhash.npz'))
+        monkeypatch.syspath_prepend(_SERVER_DIR)
+        for name in ['query_db', 'count_db']:  # memoized by the server, restored afterwards
+            monkeypatch.setattr(_find_helper, name, getattr(_find_helper, name))
+        back_end = importlib.import_module('back_end')
+
+        yield back_end.app.test_client()
+
+        back_end.pyc.close()
+        sys.modules.pop('back_end')
+
+
+def test_find_batch(client):
+    response = client.post('/api/find/batch', json={
+        'queries': [{'disease_id': 'DI-00001'}, {'disease': 'no such disease'}, {'has_pdb': 'true'}],
+        'per_page': 2,
+        'columns': ['sequence_length'],
+    })
+    assert response.status_code == 200
+
+    data = response.get_json()
+    assert data['result_counts'][1] == 0
+    assert [r['query_idx'] for r in data['results']] == [0, 0, 2, 2]
+    assert set(data['results'][0]) == {'query_idx', 'uniprot_id', 'sequence_length'}
+
+    assert client.post('/api/find/batch', json={'queries': []}).status_code == 400
+    assert client.post('/api/find/batch', json={'queries': [{'no_such_param': 1}]}).status_code == 400
+
+
+def test_find_cursor(client):
+    # 20 entries with a PDB structure, the last page ends exactly on the page boundary
+    response = client.get('/api/find?has_pdb=true&per_page=10&columns=uniprot_id').get_json()
+    assert response['result_count'] == 20 and response['next_cursor'] is not None
+
+    uniprot_ids = [r['uniprot_id'] for r in response['results']]
+    response = client.get(f'/api/find?has_pdb=true&per_page=10&cursor={response["next_cursor"]}').get_json()
+    uniprot_ids += [r['uniprot_id'] for r in response['results']]
+
+    assert len(response['results']) == 10 and response['next_cursor'] is None
+    assert len(set(uniprot_ids)) == 20
+
+    response = client.get('/api/find?has_pdb=true&per_page=10&page=2').get_json()
+    assert response['next_cursor'] is None
+
+    response = client.get('/api/find?has_pdb=true&per_page=7&columns=uniprot_id').get_json()
+    response = client.get(f'/api/find?has_pdb=true&per_page=7&cursor={response["next_cursor"]}').get_json()
+    assert len(response['results']) == 7 and response['next_cursor'] is not None
+
+
+def test_find_invalid_body(client):
+    for body in [b'[1, 2]', b'"x"', b'1']:  # valid JSON, but not an object of parameters
+        response = client.post('/api/find', data=body, content_type='application/json')
+        assert response.status_code == 400
+        assert response.get_json()['message'] == 'Invalid JSON body'
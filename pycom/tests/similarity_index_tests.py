@@ -0,0 +1,35 @@
+import random
+import sqlite3
+
+from pycom.sql.similarity_index import MinHashIndex
+
+_AMINO_ACIDS = 'ACDEFGHIKLMNPQRSTVWY'
+
+
+def _mutate(sequence, fraction, rng):
+    sequence = list(sequence)
+    for i in rng.sample(range(len(sequence)), int(len(sequence) * fraction)):
+        sequence[i] = rng.choice(_AMINO_ACIDS)
+    return ''.join(sequence)
+
+
+def test_minhash_index(tmp_path):
+    rng = random.Random(0)
+    sequences = [''.join(rng.choice(_AMINO_ACIDS) for _ in range(300)) for _ in range(200)]
+
+    db_path = str(tmp_path / 'pycom.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE entry (entryId TEXT PRIMARY KEY, sequence TEXT)')
+    conn.executemany('INSERT INTO entry VALUES (?, ?)', [(f'P{i:05d}', s) for i, s in enumerate(sequences)])
+    conn.commit()
+
+    index = MinHashIndex(lambda: conn, path=str(tmp_path / 'pycom.minhash.npz'), db_path=db_path)
+
+    assert index.query(sequences[42].lower(), top_k=1) == [('P00042', 1.0)]
+
+    similar = index.query(_mutate(sequences[7], 0.1, rng), top_k=3, min_similarity=0.3)
+    assert similar[0][0] == 'P00007'
+    assert all(similarity >= 0.3 for _, similarity in similar)
+
+    reloaded = MinHashIndex(lambda: conn, path=str(tmp_path / 'pycom.minhash.npz'), db_path=db_path)
+    assert reloaded.query(sequences[42], top_k=1) == [('P00042', 1.0)]
@@ -0,0 +1,45 @@
+import sqlite3
+
+from pycom.sql.taxonomy import TaxonomyIndex
+
+
+def test_taxonomy_index():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE organism (organismId INTEGER PRIMARY KEY, taxonomy TEXT, taxonomyFull TEXT)')
+    conn.executemany('INSERT INTO organism VALUES (?, ?, ?)', [
+        (9606, ':Eukaryota:Metazoa:Mammalia:', ':Eukaryota:Metazoa:Mammalia:Primates:Hominidae:Homo:'),
+        (10090, ':Eukaryota:Metazoa:Mammalia:', ':Eukaryota:Metazoa:Mammalia:Rodentia:Muridae:Mus:'),
+        (562, ':Bacteria:Proteobacteria:', ':Bacteria:Proteobacteria:Enterobacterales:Escherichia:'),
+    ])
+
+    taxonomy = TaxonomyIndex(lambda: conn)
+
+    for pattern in ['%mammalia%', '%bacter%', '%Homo%', '%xyz%']:
+        expected = [row[0] for row in conn.execute(
+            'SELECT organismId FROM organism WHERE taxonomyFull LIKE ? ORDER BY organismId', [pattern])]
+        assert list(taxonomy.resolve(pattern)) == expected
+
+    assert taxonomy.resolve('%Mammalia:Primates%') is None  # spans two taxa, left to SQL
+    assert taxonomy.resolve('%h_mo%') is None
+
+    assert taxonomy.lineage(9606) == ['Eukaryota', 'Metazoa', 'Mammalia']
+    assert taxonomy.lineage(1) is None
+
+
+
+def test_taxonomy_index_cleared_while_resolving():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE organism (organismId INTEGER PRIMARY KEY, taxonomy TEXT, taxonomyFull TEXT)')
+    conn.execute("INSERT INTO organism VALUES (9606, ':Eukaryota:Mammalia:', ':Eukaryota:Mammalia:Homo:')")
+
+    taxonomy = TaxonomyIndex(lambda: conn)
+    load = taxonomy._load
+
+    def load_then_clear():  # another thread clears the index (the database changed) right after it was loaded
+        index = load()
+        taxonomy.clear()
+        return index
+
+    taxonomy._load = load_then_clear
+    assert taxonomy.resolve('%mammalia%') == (9606,)
+    assert taxonomy.lineage(9606) == ['Eukaryota', 'Mammalia']
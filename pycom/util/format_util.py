@@ -1,4 +1,6 @@
+import base64
 import hashlib
+import json
 import os
 from typing import Optional
 import random
@@ -49,3 +51,16 @@ def user_path(s: str) -> Optional[str]:
     if s.startswith('~'):
         return os.path.expanduser(s)
     return s
+
+
+def encode_cursor(entry_id: str) -> str:
+    """Encodes the last UniProt ID of a page into an opaque cursor token."""
+    return base64.urlsafe_b64encode(json.dumps({'after': entry_id}).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> str:
+    """Decodes a cursor token created by encode_cursor, and returns the UniProt ID it points to."""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))['after']
+    except (ValueError, TypeError, KeyError):
+        assert False, 'Invalid cursor'
@@ -0,0 +1,117 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+import pandas as pd
+
+_STR_OVERHEAD = sys.getsizeof('')  # size of an empty (ASCII) string object, added to the length of every string
+
+
+def sizeof(value, limit: Optional[int] = None) -> int:
+    """
+    Estimated memory use of a cached value in bytes
+
+    DataFrames are estimated from their shallow memory use plus the lengths of the strings of text columns, which is
+    much faster than memory_usage(deep=True). Stops adding columns once the estimate exceeds limit (if set).
+    """
+    if not isinstance(value, pd.DataFrame):
+        return sys.getsizeof(value)
+
+    size = int(value.memory_usage(index=True, deep=False).sum())
+    for name, column in value.items():
+        if limit is not None and size > limit:
+            break
+        python_strings = isinstance(column.dtype, pd.StringDtype) and column.dtype.storage == 'python'
+        if column.dtype != object and not python_strings:
+            continue  # the shallow memory use is exact for other dtypes
+        try:
+            size += int(column.str.len().sum()) + _STR_OVERHEAD * int(column.notna().sum())
+        except AttributeError:  # objects other than strings
+            size += int(column.memory_usage(index=False, deep=True))
+    return size
+
+
+class ByteLRUCache:
+    """A thread-safe LRU cache, bounded by the estimated memory use of its values instead of their number
+
+    When a new value does not fit into max_bytes, the least recently used values are evicted until it does.
+    Values larger than max_bytes are not cached at all.
+
+    Usage:
+        >>> cache = ByteLRUCache(max_bytes=64 << 20)
+        >>> cache.put('key', df)
+        >>> cache.get('key')
+        >>> cache.stats()
+        {'hits': 1, 'misses': 0, 'evictions': 0, 'entries': 1, 'bytes': 1234, 'max_bytes': 67108864}
+    """
+
+    def __init__(self, max_bytes: int, size_function: Optional[Callable[[object], int]] = None):
+        """
+        :param max_bytes: Maximum estimated size of all cached values in bytes, 0 disables the cache
+        :param size_function: Returns the estimated size of a value in bytes (default sizeof())
+        """
+        assert max_bytes >= 0, 'max_bytes cannot be negative'
+        self.max_bytes = max_bytes
+        self.size_function = size_function or (lambda value: sizeof(value, limit=max_bytes))
+
+        self._cache = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default=None) -> Optional[object]:
+        """Returns the cached value of key, or default if it is not cached"""
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value) -> bool:
+        """Cache a value, evicting the least recently used values if necessary. Returns whether it was cached."""
+        if self.max_bytes == 0:
+            return False
+
+        size = self.size_function(value)
+        if size > self.max_bytes:
+            return False
+
+        with self._lock:
+            if key in self._cache:
+                self._bytes -= self._cache.pop(key)[1]
+
+            while self._bytes + size > self.max_bytes:
+                _, (_, evicted_size) = self._cache.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+            self._cache[key] = (value, size)
+            self._bytes += size
+        return True
+
+    def clear(self):
+        """Remove all cached values, the statistics are kept"""
+        with self._lock:
+            self._cache.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """Hit, miss and eviction counts, and the current number and estimated size of the cached values"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._cache),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def __len__(self):
+        return len(self._cache)
@@ -6,8 +6,10 @@ from flask_parameter_validation import ValidateParameters, Query
 
 from pycom import PyCom, ProteinParams
 from pycom.interface import _find_helper  # noqa
+from pycom.interface.connection_pool import profile_from_env
 from pycom.selector import MatrixFormat
-from pycom.sql.constraints_utils import to_bool, to_int
+from pycom.sql.constraints_utils import to_bool, to_float, to_int
+from pycom.util.format_util import encode_cursor
 
 config = {
     "CACHE_TYPE": "SimpleCache",
@@ -23,26 +25,42 @@ app.json.compact = False
 # set up caching
 cache = Cache(app)
 _find_helper.query_db = cache.memoize(cache_none=True)(_find_helper.query_db)
+_find_helper.count_db = cache.memoize(cache_none=True)(_find_helper.count_db)
 
 pycom_db_path = os.environ.get('PYCOM_DB_PATH', '~/docs/pycom.db')
 pycom_mat_path = os.environ.get('PYCOM_MAT_PATH', '~/docs/pycom.mat')
 
+# sidecar file of the sequence similarity index (/api/find-similar), built on first use if it does not exist
+pycom_similarity_path = os.environ.get('PYCOM_SIMILARITY_PATH', '~/docs/pycom.minhash.npz')
+
+# memory budget in bytes of the decoded matrices cached for /api/find?matrix=true, shared by all requests of a worker
+pycom_matrix_cache_size = int(os.environ.get('PYCOM_MATRIX_CACHE_SIZE', 512 << 20))
+
 # @deprecated
 # pycom_aln_path = os.environ.get('PYCOM_ALN_PATH', '~/docs/aln')
 
-pyc = PyCom(db_path=pycom_db_path, mat_path=pycom_mat_path)
+# SQLite settings (PYCOM_DB_IMMUTABLE, PYCOM_DB_MMAP_SIZE, PYCOM_DB_CACHE_SIZE, PYCOM_DB_TEMP_STORE)
+pycom_db_profile = profile_from_env()
+
+# default dtypes, float32 fractions would be serialised with rounding noise (0.3 -> 0.30000001192092896)
+pyc = PyCom(db_path=pycom_db_path, mat_path=pycom_mat_path, db_profile=pycom_db_profile, compact_dtypes=False,
+            similarity_path=pycom_similarity_path, matrix_cache_size=pycom_matrix_cache_size)
 valid_protein_params = set(ProteinParams)
 
+MAX_BATCH_QUERIES = 100  # queries per /api/find/batch request
+MAX_SIMILAR = 100  # results per /api/find-similar request
+
 
 @app.route('/api/', methods=['GET'])
 def landing():
-    raise AssertionError('/api is not an endpoint. Try /api/find, /api/get-disease-list, '
-                         '/api/get-cofactor-list, /api/get-organism-list, /api/get-biological-process-list, '
-                         '/api/get-cellular-component-list, /api/get-development-stage-list, /api/get-domain-list, '
-                         '/api/get-ligand-list, /api/get-molecular-function-list, /api/get-ptm-list')
+    raise AssertionError('/api is not an endpoint. Try /api/find, /api/find/batch, /api/find-similar, '
+                         '/api/get-disease-list, /api/get-cofactor-list, /api/get-organism-list, '
+                         '/api/get-biological-process-list, /api/get-cellular-component-list, '
+                         '/api/get-development-stage-list, /api/get-domain-list, /api/get-ligand-list, '
+                         '/api/get-molecular-function-list, /api/get-ptm-list')
 
 
-@app.route('/api/find', methods=['GET'])
+@app.route('/api/find', methods=['GET', 'POST'])
 @ValidateParameters()
 def find(
         # Search parameters:
@@ -52,7 +70,7 @@ def find(
         # developmental_stage, domain, ligand, molecular_function, ptm
 
         # Output parameters:
-        # matrix, page, per_page
+        # matrix, page, per_page, cursor, columns
         page: int = Query(1),
         per_page: int = Query(default=10, min_int=1, max_int=100)
 ):
@@ -60,40 +78,64 @@ def find(
 
     if flask.request.data not in {b'', None}:
         data_json = flask.request.get_json(force=True, silent=True)
-        assert data_json is not None, 'Invalid JSON body'
+        assert isinstance(data_json, dict), 'Invalid JSON body'
         data.update(data_json)
 
     # parse parameters
     load_matrices = to_bool(data.pop('matrix', False), entry='matrix parameter')
+    cursor = data.pop('cursor', None)
+    assert cursor is None or 'page' not in data, 'Use either page or cursor, not both'
     page = to_int(data.pop('page', page), entry='page parameter')
     per_page = to_int(data.pop('per_page', per_page), entry='per_page parameter')
+    columns = _find_helper.get_valid_columns(data.pop('columns', None))
 
     # validate that no invalid parameters are passed
     invalid_params = set(data) - valid_protein_params
     assert not invalid_params, f'Invalid parameters: {", ".join(invalid_params)}'
 
+    assert page >= 1, 'page must be at least 1'
+
     if load_matrices:
         assert per_page <= 10, 'per_page cannot be larger than 10 when loading matrices'
 
+    if columns is not None:  # the cursor needs uniprot_id, and matrices need the sequence
+        required_columns = ['uniprot_id', 'sequence'] if load_matrices else ['uniprot_id']
+        columns = [c for c in required_columns if c not in columns] + columns
+
     # Request validated, now build the response #
 
-    entries = pyc.find(data)  # find entries matching the constraints
-    selection = pyc.paginate(entries, page=page, per_page=per_page)
+    # only the requested page is selected, the total is counted separately
+    result_count = pyc.count(data)
+    if cursor is not None:  # with one extra row, which tells whether there is a page after this one
+        selection = pyc.find(data, per_page=per_page + 1, cursor=cursor, columns=columns)
+        selection, next_cursor = _find_helper.get_next_cursor(selection, limit=per_page)
+    else:
+        selection = pyc.find(data, page=page, per_page=per_page, columns=columns)
+        has_next_page = page * per_page < result_count
+        next_cursor = encode_cursor(selection['uniprot_id'].iloc[-1]) if has_next_page else None
 
     if load_matrices:
         selection = pyc.load_matrices(selection, mat_format=MatrixFormat.JSON)
-    else:
+    elif 'matrix' in selection:
         selection = selection.drop(columns=['matrix'])
 
     if load_matrices:
         app.json.compact = True
 
+    if cursor is not None:  # page numbers are unknown when following a cursor
+        page_info = {'result_count': result_count}
+    else:
+        page_info = {
+            'page': page,
+            'total_pages': result_count // per_page + 1,
+            'result_count': result_count,
+            'showing': f'{(page - 1) * per_page + 1}-{min(page * per_page, result_count)}'
+        }
+
     response = flask.jsonify({
         'results': selection.to_dict(orient='records'),
-        'page': page,
-        'total_pages': len(entries) // per_page + 1,
-        'result_count': len(entries),
-        'showing': f'{(page - 1) * per_page + 1}-{min(page * per_page, len(entries))}'
+        **page_info,
+        'next_cursor': next_cursor,
     })
 
     if load_matrices:
@@ -102,6 +144,78 @@ def find(
     return response
 
 
+@app.route('/api/find/batch', methods=['POST'])
+def find_batch():
+    """
+    Run a batch of find queries, passed as a JSON body: {"queries": [{...}, ...], "per_page": 10, "columns": [...]}
+
+    Returns the first per_page results of every query, labelled with the position of the query (query_idx),
+    and the total number of results of every query.
+    """
+    data = flask.request.get_json(force=True, silent=True)
+    assert isinstance(data, dict), 'Invalid JSON body, expected {"queries": [...]}'
+
+    queries = data.pop('queries', None)
+    per_page = to_int(data.pop('per_page', 10), entry='per_page parameter')
+    columns = _find_helper.get_valid_columns(data.pop('columns', None))
+
+    assert not data, f'Invalid parameters: {", ".join(data)}'
+    assert isinstance(queries, list) and all(isinstance(q, dict) for q in queries), \
+        'queries must be a list of parameter objects'
+    assert 1 <= len(queries) <= MAX_BATCH_QUERIES, f'queries must contain 1-{MAX_BATCH_QUERIES} queries'
+    assert 1 <= per_page <= 100, 'per_page must be between 1 and 100'
+
+    for query in queries:
+        invalid_params = set(query) - valid_protein_params
+        assert not invalid_params, f'Invalid parameters: {", ".join(invalid_params)}'
+
+    if columns is not None:
+        columns = ['uniprot_id'] + [c for c in columns if c != 'uniprot_id']
+
+    selection = pyc.find_many(queries, per_page=per_page, columns=columns)
+    if 'matrix' in selection:
+        selection = selection.drop(columns=['matrix'])
+
+    return flask.jsonify({
+        'results': selection.to_dict(orient='records'),
+        'result_counts': [pyc.count(query) for query in queries],
+    })
+
+
+@app.route('/api/find-similar', methods=['GET', 'POST'])
+def find_similar():
+    """
+    Find the entries with the sequences most similar to a sequence: sequence, top_k (default 10), min_similarity,
+    columns, passed as query parameters or as a JSON body (for long sequences)
+
+    Returns the entries, most similar first, with their estimated k-mer similarity (see PyComLocal.find_similar()).
+    """
+    data = flask.request.args.to_dict()
+
+    if flask.request.data not in {b'', None}:
+        data_json = flask.request.get_json(force=True, silent=True)
+        assert isinstance(data_json, dict), 'Invalid JSON body'
+        data.update(data_json)
+
+    sequence = data.pop('sequence', None)
+    top_k = to_int(data.pop('top_k', 10), entry='top_k parameter')
+    min_similarity = to_float(data.pop('min_similarity', 0.0), entry='min_similarity parameter')
+    columns = _find_helper.get_valid_columns(data.pop('columns', None))
+
+    assert not data, f'Invalid parameters: {", ".join(data)}'
+    assert isinstance(sequence, str) and sequence, 'sequence is required'
+    assert 1 <= top_k <= MAX_SIMILAR, f'top_k must be between 1 and {MAX_SIMILAR}'
+
+    selection = pyc.find_similar(sequence, top_k=top_k, min_similarity=min_similarity, columns=columns)
+    if 'matrix' in selection:
+        selection = selection.drop(columns=['matrix'])
+
+    return flask.jsonify({
+        'results': selection.to_dict(orient='records'),
+        'result_count': len(selection),
+    })
+
+
 @app.route('/api/get-disease-list', methods=['GET'])
 def get_disease_list():
     """